@@ -3,24 +3,33 @@ from sqlalchemy import create_engine
 from sqlalchemy.orm import sessionmaker, declarative_base
 from dotenv import load_dotenv
 
+from app.services.metricas import QueuePoolMedido, instrumentar_engine
+
 load_dotenv()
 
-DATABASE_URL = os.getenv("DATABASE_URL")
 
-if DATABASE_URL:
-    if DATABASE_URL.startswith("postgres://"):
-        DATABASE_URL = DATABASE_URL.replace("postgres://", "postgresql://", 1)
+def normalizar_url(url: str) -> str:
+    # postgres:// (Heroku/Neon) -> postgresql+psycopg:// (driver psycopg 3)
+    if url.startswith("postgres://"):
+        url = url.replace("postgres://", "postgresql://", 1)
 
-    DATABASE_URL = DATABASE_URL.replace(
+    return url.replace(
         "postgresql://",
         "postgresql+psycopg://",
         1
     )
 
+
+DATABASE_URL = os.getenv("DATABASE_URL")
+
+if DATABASE_URL:
+    DATABASE_URL = normalizar_url(DATABASE_URL)
+
     connect_args = {}
 else:
     raise ValueError("¡Falta la variable de entorno DATABASE_URL! Asegúrate de tener el archivo .env configurado con la conexión a Neon.")
 
+# Fuera de SQLite el pool mide la espera por conexión (ver app/services/metricas.py)
 engine = create_engine(
     DATABASE_URL,
     pool_pre_ping=True,
@@ -28,14 +37,54 @@ engine = create_engine(
     max_overflow=20,
     pool_recycle=300,
     connect_args=connect_args,
+    **({} if DATABASE_URL.startswith("sqlite") else {"poolclass": QueuePoolMedido}),
 )
+instrumentar_engine(engine)
 
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 Base = declarative_base()
 
+# =========================================================
+# ⚡ MODO ASYNC (opcional, ASYNC_DB=1)
+# =========================================================
+# Los endpoints de lectura más usados pasan a ser `async def` sobre un AsyncEngine
+# (psycopg en modo async): una petición esperando a la base no ocupa un hilo del
+# threadpool. El resto de endpoints y los jobs del scheduler siguen con el engine sync.
+ASYNC_DB = os.getenv("ASYNC_DB", "0").lower() in ("1", "true", "si")
+
+async_engine = None
+AsyncSessionLocal = None
+
+if ASYNC_DB:
+    from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker
+
+    # psycopg sirve para sync y async con la misma URL; SQLite necesita aiosqlite
+    ASYNC_DATABASE_URL = DATABASE_URL.replace("sqlite://", "sqlite+aiosqlite://", 1)
+
+    pool_kwargs = {}
+    if not ASYNC_DATABASE_URL.startswith("sqlite"):
+        pool_kwargs = {
+            "pool_size": int(os.getenv("ASYNC_DB_POOL_SIZE", "10")),
+            "max_overflow": int(os.getenv("ASYNC_DB_MAX_OVERFLOW", "20")),
+        }
+
+    async_engine = create_async_engine(
+        ASYNC_DATABASE_URL,
+        pool_pre_ping=True,
+        pool_recycle=300,
+        connect_args=connect_args,
+        **pool_kwargs,
+    )
+    AsyncSessionLocal = async_sessionmaker(async_engine, autoflush=False, expire_on_commit=False)
+    instrumentar_engine(async_engine.sync_engine)
+
 def get_db():
     db = SessionLocal()
     try:
         yield db
     finally:
         db.close()
+
+async def get_async_db():
+    async with AsyncSessionLocal() as db:
+        yield db
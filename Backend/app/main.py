@@ -1,21 +1,44 @@
-from fastapi import FastAPI, Response
+import os
+import sys
+from fastapi import FastAPI, Depends, HTTPException, Request, Response
+from fastapi.responses import JSONResponse
 from fastapi.middleware.cors import CORSMiddleware
-from apscheduler.schedulers.background import BackgroundScheduler
-from apscheduler.triggers.cron import CronTrigger
 
-from app.database import SessionLocal, engine, Base
-from app.services.polla_scheduler import sync_medellin_if_last_friday
+from app.database import SessionLocal, engine, async_engine, Base
+from app.security.hash_pool import HashPoolSaturado, HASH_RETRY_AFTER, metricas_hash
+from app.services.metricas import MetricasMiddleware, acceso_permitido, texto_prometheus
+from app.services.registro_sql import SQL_DEBUG, RegistroSQLMiddleware
+from app.services.perfilador import PERFILADOR
+from app.services.estado_jobs import leer_estados_prefijo, PREFIJO_METRICAS_JOB
 from app.routers.crear_usuario import router as crear_usuario_router
 from app.routers.auth import router as auth_router
-from app.routers.Finanzas import aplicar_interes_mensual_automatico, router as finanzas_router
+from app.routers.Finanzas import router as finanzas_router
 from app.routers.dashboard import router as dashboard_router
 from app.routers.prestamos import router as prestamos_router
 from app.routers.polla import router as polla_router
+from app.routers.exportar import router as exportar_router
 
-Base.metadata.create_all(bind=engine)
+# =========================================================
+# ⚙️ MODO DE ARRANQUE
+# =========================================================
+# Por defecto la API hace todo, como siempre. Con el worker aparte (python -m app.worker):
+#   WEB_SCHEDULER=0  -> la API no carga APScheduler ni corre jobs
+#   DB_CREATE_ALL=0  -> la API no revisa/crea tablas al arrancar (lo hace el worker)
+WEB_SCHEDULER = os.getenv("WEB_SCHEDULER", "1").lower() in ("1", "true", "si")
+DB_CREATE_ALL = os.getenv("DB_CREATE_ALL", "1").lower() in ("1", "true", "si")
+
+if DB_CREATE_ALL:
+    Base.metadata.create_all(bind=engine)
 
 app = FastAPI(title="API Natillera")
 
+# Latencia, estados y tiempo de BD por ruta (ver GET /metrics)
+app.add_middleware(MetricasMiddleware)
+
+# Modo desarrollo: consultas por petición y sospechas de N+1 en consola
+if SQL_DEBUG:
+    app.add_middleware(RegistroSQLMiddleware)
+
 app.add_middleware(
     CORSMiddleware,
     allow_origins=[
@@ -39,6 +62,17 @@ app.include_router(finanzas_router)
 app.include_router(dashboard_router)
 app.include_router(prestamos_router)
 app.include_router(polla_router)
+app.include_router(exportar_router)
+
+# Perfil (cProfile) de peticiones puntuales a pedido de un admin o por muestreo.
+# Apagado no se instala nada (ver app/services/perfilador.py)
+if PERFILADOR:
+    from app.services.perfilador import PerfiladorMiddleware, envolver_endpoints
+    from app.routers.perfiles import router as perfiles_router
+
+    envolver_endpoints(app)
+    app.include_router(perfiles_router)
+    app.add_middleware(PerfiladorMiddleware)
 
 
 @app.get("/")
@@ -46,70 +80,89 @@ def root():
     return {"status": "ok", "service": "API Natillera"}
 
 
-# =========================================================
-# 🔥 SCHEDULER GLOBAL
-# =========================================================
-scheduler = BackgroundScheduler(timezone="America/Bogota")
+@app.exception_handler(HashPoolSaturado)
+def hash_pool_saturado(request: Request, exc: HashPoolSaturado):
+    # Login / crear usuario / recuperar contraseña cuando el pool de argon2 está lleno
+    return JSONResponse(
+        status_code=503,
+        content={"detail": "Hay muchas solicitudes en este momento, intenta de nuevo en unos segundos"},
+        headers={"Retry-After": str(HASH_RETRY_AFTER)},
+    )
 
 
-# -------------------------
-# JOB 1: Interés mensual
-# -------------------------
-scheduler.add_job(
-    aplicar_interes_mensual_automatico,
-    CronTrigger(day=1, hour=5, minute=5),
-    id="interes_mensual",
-    replace_existing=True
-)
+def requerir_acceso_metricas(request: Request):
+    # Mismo acceso que /metrics: solo local o con METRICS_TOKEN (ver app/services/metricas.py)
+    if not acceso_permitido(request.client.host if request.client else None, request.headers.get("authorization")):
+        raise HTTPException(status_code=403, detail="No autorizado")
+
+
+@app.get("/metricas/hash", dependencies=[Depends(requerir_acceso_metricas)])
+def metricas_hashing():
+    return metricas_hash()
+
 
+@app.get("/metricas/loteria", dependencies=[Depends(requerir_acceso_metricas)])
+def metricas_loteria():
+    # Import diferido: sin scheduler la API no necesita el cliente (ni requests) al arrancar
+    from app.services.loteria_client import cliente_loteria
+    return cliente_loteria.metricas()
+
+
+@app.get("/metrics", include_in_schema=False, dependencies=[Depends(requerir_acceso_metricas)])
+def metrics():
+    # Formato Prometheus
+    engines = {"sync": engine}
+    if async_engine is not None:
+        engines["async"] = async_engine.sync_engine
 
-# -------------------------
-# JOB 2: Sync Polla
-# -------------------------
-def job_sync_polla():
     db = SessionLocal()
     try:
-        r = sync_medellin_if_last_friday(db)
-        print("[PollaJob]", r)
+        # Los jobs pueden correr en el worker: su resumen está en estado_jobs
+        estados_jobs = leer_estados_prefijo(db, PREFIJO_METRICAS_JOB)
     except Exception as e:
-        print("[PollaJob][ERROR]", str(e))
+        print("[Metricas][ERROR] No se pudo leer el estado de los jobs:", str(e))
+        estados_jobs = {}
     finally:
         db.close()
 
+    otros = {"natillera_hash": metricas_hash()}
+    # Solo si el cliente ya está cargado: /metrics no lo importa por su cuenta
+    if "app.services.loteria_client" in sys.modules:
+        otros["natillera_loteria"] = sys.modules["app.services.loteria_client"].cliente_loteria.metricas()
 
-# Intento principal la noche del sorteo (11:30 PM)
-scheduler.add_job(
-    job_sync_polla,
-    CronTrigger(hour=23, minute=30),
-    id="sync_polla_medellin_2330",
-    replace_existing=True
-)
-
-# Reintentos continuos cada 4 horas durante todo el día por si la API se demora en publicar
-scheduler.add_job(
-    job_sync_polla,
-    CronTrigger(hour="*/4", minute=15),
-    id="sync_polla_medellin_interval",
-    replace_existing=True
-)
-
-
+    return Response(texto_prometheus(engines, estados_jobs, otros), media_type="text/plain; version=0.0.4; charset=utf-8")
 
 
 # =========================================================
 # EVENTOS FASTAPI
 # =========================================================
+# Jobs programados: ver app/scheduler.py. Con WEB_SCHEDULER=0 los corre solo el worker.
+jobs = None
+
+
 @app.on_event("startup")
 def start_scheduler():
-    if not scheduler.running:
-        scheduler.start()
-        print("Scheduler iniciado correctamente")
+    global jobs
+    if not WEB_SCHEDULER:
+        print("Scheduler deshabilitado en la API (WEB_SCHEDULER=0)")
+        return
+    from app.scheduler import SchedulerConLider
+    if jobs is None:
+        jobs = SchedulerConLider(nombre="worker web")
+    jobs.iniciar()
 
 
 @app.on_event("shutdown")
 def shutdown_scheduler():
-    scheduler.shutdown()
-    print("Scheduler detenido")
+    if jobs is not None:
+        jobs.detener()
+
+
+@app.on_event("shutdown")
+async def cerrar_async_engine():
+    # Solo existe con ASYNC_DB=1
+    if async_engine is not None:
+        await async_engine.dispose()
 
 
 @app.api_route("/health", methods=["GET", "HEAD"])
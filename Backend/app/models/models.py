@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, Float, DateTime, ForeignKey, Boolean, UniqueConstraint
+from sqlalchemy import Column, Integer, String, Float, DateTime, ForeignKey, Boolean, UniqueConstraint, Index, JSON, text
 from sqlalchemy.orm import relationship
 from app.database import Base
 from datetime import datetime, date
@@ -23,6 +23,11 @@ class Usuario(Base):
     prestamos = relationship("Prestamo", back_populates="usuario_rel")
     movimientos = relationship("Movimiento", back_populates="usuario_rel")
 
+    __table_args__ = (
+        # Listado de socios paginado por (nombre, id)
+        Index("ix_usuarios_nombre_id", "nombre", "id"),
+    )
+
 
 class Ahorro(Base):
     __tablename__ = "ahorros"
@@ -68,10 +73,28 @@ class Movimiento(Base):
     fecha = Column(DateTime, default=datetime.now)
     categoria = Column(String)  # ingreso, interes, prestamo, premio
     descripcion = Column(String, nullable=True)
+    periodo_anio = Column(Integer, nullable=True)  # año del mes al que corresponde (aporte, polla, ajuste, interés)
+    periodo_mes = Column(Integer, nullable=True)   # 1-12
+    prestamo_id = Column(Integer, ForeignKey("prestamos.id"), nullable=True)  # préstamo al que pertenece (creación y pagos)
     
     # Relación
     usuario_rel = relationship("Usuario", back_populates="movimientos")
 
+    __table_args__ = (
+        Index("ix_movimientos_usuario_periodo", "usuario_id", "periodo_anio", "periodo_mes"),
+        Index("ix_movimientos_periodo_tipo", "periodo_anio", "periodo_mes", "tipo"),
+        Index("ix_movimientos_prestamo_tipo_fecha", "prestamo_id", "tipo", "fecha"),
+        # Historial de un socio paginado por (fecha, id)
+        Index("ix_movimientos_usuario_fecha_id", "usuario_id", "fecha", "id"),
+        # Un solo "Interés Mensual" por socio y mes: hace idempotente el cálculo mensual
+        Index(
+            "uq_movimientos_interes_periodo", "usuario_id", "periodo_anio", "periodo_mes",
+            unique=True,
+            postgresql_where=text("tipo = 'Interés Mensual'"),
+            sqlite_where=text("tipo = 'Interés Mensual'"),
+        ),
+    )
+
 class ResultadoLoteria(Base):
     __tablename__ = "resultados_loteria"
 
@@ -85,4 +108,71 @@ class ResultadoLoteria(Base):
 
     __table_args__ = (
         UniqueConstraint("slug", "date", name="uq_slug_date"),
-    )
\ No newline at end of file
+        # Historial de la polla paginado por (date, id)
+        Index("ix_resultados_slug_date_id", "slug", "date", "id"),
+    )
+
+
+class PozoPolla(Base):
+    __tablename__ = "pozo_polla"
+
+    id = Column(Integer, primary_key=True, index=True)
+    anio = Column(Integer, nullable=False)
+    mes = Column(Integer, nullable=False)                  # 1-12
+    recaudado = Column(Integer, default=0)                 # pagos de polla del mes
+    acumulado = Column(Float, default=0.0)                 # pozo al cierre del mes (0 si se entregó)
+    resultado_2 = Column(String, nullable=True)            # últimas 2 cifras del sorteo del mes
+    ganador_usuario_id = Column(Integer, nullable=True)    # socio que se llevó el pozo
+    reiniciado = Column(Boolean, default=False)            # True si el pozo se entregó este mes
+    actualizado = Column(DateTime, default=datetime.now)
+
+    __table_args__ = (
+        UniqueConstraint("anio", "mes", name="uq_pozo_anio_mes"),
+    )
+
+
+class DashboardSocio(Base):
+    # Respuesta precalculada de /api/dashboard/{usuario_id} (parte propia del socio)
+    __tablename__ = "dashboard_socios"
+
+    usuario_id = Column(Integer, primary_key=True)
+    datos = Column(JSON, nullable=False)
+    actualizado = Column(DateTime, default=datetime.now)
+
+
+class EstadisticasGlobales(Base):
+    # Una sola fila (id=1) con los datos del dashboard que son iguales para todos los socios
+    __tablename__ = "estadisticas_globales"
+
+    id = Column(Integer, primary_key=True)
+    socios_total = Column(Integer, default=0)
+    total_ahorrado_global = Column(Integer, default=0)
+    polla_acumulado = Column(Float, default=0.0)
+    anio = Column(Integer)                       # mes para el que se calculó el pozo
+    mes = Column(Integer)
+    actualizado = Column(DateTime, default=datetime.now)
+
+
+class EstadoJob(Base):
+    # Estado persistente de los jobs del scheduler (sobrevive a reinicios y deploys)
+    __tablename__ = "estado_jobs"
+
+    nombre = Column(String, primary_key=True)
+    datos = Column(JSON, nullable=False, default=dict)
+    actualizado = Column(DateTime, default=datetime.now)
+
+
+class RefreshToken(Base):
+    # Refresh tokens de sesión. Solo se guarda el sha256 del token, nunca el token.
+    # Cada renovación crea un token nuevo de la misma familia y marca el anterior como usado;
+    # si alguien presenta un token ya usado, se revoca toda la familia (posible robo).
+    __tablename__ = "refresh_tokens"
+
+    id = Column(Integer, primary_key=True, index=True)
+    usuario_id = Column(Integer, ForeignKey("usuarios.id"), nullable=False, index=True)
+    token_hash = Column(String(64), unique=True, nullable=False, index=True)
+    familia = Column(String(32), nullable=False, index=True)   # un login = una familia (un dispositivo)
+    creado = Column(DateTime, default=datetime.now)
+    expira = Column(DateTime, nullable=False)
+    usado = Column(DateTime, nullable=True)                     # cuándo se cambió por uno nuevo
+    revocado = Column(Boolean, default=False)
@@ -1,85 +1,112 @@
 from fastapi import APIRouter, status, Depends, HTTPException
-from sqlalchemy.orm import Session
+from sqlalchemy import func, extract, exists, insert, update, bindparam
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session, aliased
 from datetime import datetime
 from dateutil.relativedelta import relativedelta
 import calendar
-import re
 
 from app.schemas.schemas import PrestamoCreate, AhorroCreate, AporteMensualPayload, AjusteManualPayload
-from app.database import SessionLocal, get_db
+from app.database import SessionLocal, get_db, get_async_db, ASYNC_DB
 from app.models.models import Prestamo, Movimiento, Ahorro, Usuario, ResultadoLoteria
+from app.services.polla_pozo import recalcular_pozo_polla, POLLA_SLUG
+from app.services.periodos import MESES_ES, parse_mes_desde_descripcion, mes_numero, texto_mes
+from app.services.finanzas_service import resumen_pagos_anio, pagos_mes_vacios
+from app.services.dashboard_service import refrescar_dashboard, invalidar_dashboards
+from app.services.paginacion import paginar, pagina
 
 
 router = APIRouter(prefix="/api", tags=["Finanzas"])
 
 
-MESES_ES = [
-    "Enero", "Febrero", "Marzo", "Abril", "Mayo", "Junio",
-    "Julio", "Agosto", "Septiembre", "Octubre", "Noviembre", "Diciembre"
-]
-
-
 # =========================================================
 # 🔥 FUNCIÓN CENTRAL DE CÁLCULO DE INTERÉS (ÚNICA)
 # =========================================================
-def calcular_interes_mes(db: Session, year: int, month: int):
-
+def calcular_interes_mes(db: Session, year: int, month: int) -> int:
+    """
+    Calcula el interés del mes para todos los socios con una sola consulta agregada
+    (interés ponderado por los días que cada aporte estuvo en la natillera), y lo
+    aplica con una inserción y una actualización masivas. No hace commit.
+    Devuelve cuántos socios recibieron interés.
+    """
     dias_del_mes = calendar.monthrange(year, month)[1]
     nombre_mes = MESES_ES[month - 1]
 
-    ahorros = db.query(Ahorro).all()
+    # 🔒 Socios que ya tienen el interés de este mes (además lo garantiza uq_movimientos_interes_periodo)
+    interes_previo = aliased(Movimiento)
+    ya_existe = (
+        exists()
+        .where(
+            interes_previo.usuario_id == Ahorro.usuario_id,
+            interes_previo.tipo == "Interés Mensual",
+            interes_previo.periodo_anio == year,
+            interes_previo.periodo_mes == month
+        )
+    )
 
-    for ahorro in ahorros:
+    # Σ monto * días activos (desde el día del aporte hasta fin de mes)
+    dias_activos = dias_del_mes - extract("day", Movimiento.fecha) + 1
+    aporte_ponderado = func.sum(Movimiento.monto * dias_activos)
+
+    filas = (
+        db.query(Ahorro.id, Ahorro.usuario_id, Ahorro.porcentaje_interes, aporte_ponderado)
+        .join(Movimiento, Movimiento.usuario_id == Ahorro.usuario_id)
+        .filter(
+            Movimiento.tipo == "Aporte Mensual",
+            Movimiento.fecha >= datetime(year, month, 1),
+            Movimiento.fecha <= datetime(year, month, dias_del_mes),
+            ~ya_existe
+        )
+        .group_by(Ahorro.id, Ahorro.usuario_id, Ahorro.porcentaje_interes)
+        .order_by(Ahorro.id)
+        .all()
+    )
 
-        # 🔒 Evitar duplicación mensual
-        ya_existe = db.query(Movimiento).filter(
-            Movimiento.usuario_id == ahorro.usuario_id,
-            Movimiento.tipo == "Interés Mensual",
-            Movimiento.descripcion == f"Interés aplicado ({nombre_mes} {year})"
-        ).first()
+    ahora = datetime.now()
+    movimientos = []
+    incrementos = []
+    usuarios_vistos = set()
 
-        if ya_existe:
+    for ahorro_id, usuario_id, porcentaje, ponderado in filas:
+        if usuario_id in usuarios_vistos:
             continue
+        usuarios_vistos.add(usuario_id)
 
-        tasa_mensual = float(ahorro.porcentaje_interes or 0) / 100.0
-
-        movimientos_mes = (
-            db.query(Movimiento)
-            .filter(
-                Movimiento.usuario_id == ahorro.usuario_id,
-                Movimiento.tipo == "Aporte Mensual",
-                Movimiento.fecha >= datetime(year, month, 1),
-                Movimiento.fecha <= datetime(year, month, dias_del_mes)
-            )
-            .all()
-        )
-
-        interes_total_mes = 0
-
-        for mov in movimientos_mes:
-            dia_aporte = mov.fecha.day
-            dias_activos = dias_del_mes - dia_aporte + 1
-            interes = mov.monto * tasa_mensual * (dias_activos / dias_del_mes)
-            interes_total_mes += interes
+        tasa_mensual = float(porcentaje or 0) / 100.0
+        interes_total_mes = float(ponderado or 0) * tasa_mensual / dias_del_mes
 
         if interes_total_mes > 0:
-
             interes_redondeado = int(round(interes_total_mes))
 
-            ahorro.total_ahorrado = int((ahorro.total_ahorrado or 0) + interes_redondeado)
-            ahorro.interes_ganado = float((ahorro.interes_ganado or 0) + interes_redondeado)
-            ahorro.ultima_actualizacion = datetime.now()
-
-            mov_interes = Movimiento(
-                usuario_id=ahorro.usuario_id,
-                tipo="Interés Mensual",
-                monto=interes_redondeado,
-                fecha=datetime.now(),
-                categoria="ingreso",
-                descripcion=f"Interés aplicado ({nombre_mes} {year})"
-            )
+            movimientos.append({
+                "usuario_id": usuario_id,
+                "tipo": "Interés Mensual",
+                "monto": interes_redondeado,
+                "fecha": ahora,
+                "categoria": "ingreso",
+                "descripcion": f"Interés aplicado ({nombre_mes} {year})",
+                "periodo_anio": year,
+                "periodo_mes": month,
+            })
+            incrementos.append({"b_id": ahorro_id, "b_interes": interes_redondeado, "b_ahora": ahora})
+
+    if movimientos:
+        db.execute(insert(Movimiento), movimientos)
+
+        ahorros = Ahorro.__table__
+        db.execute(
+            update(ahorros)
+            .where(ahorros.c.id == bindparam("b_id"))
+            .values(
+                total_ahorrado=func.coalesce(ahorros.c.total_ahorrado, 0) + bindparam("b_interes"),
+                interes_ganado=func.coalesce(ahorros.c.interes_ganado, 0) + bindparam("b_interes"),
+                ultima_actualizacion=bindparam("b_ahora")
+            ),
+            incrementos
+        )
 
-            db.add(mov_interes)
+    return len(movimientos)
 
 
 # =========================================================
@@ -103,8 +130,14 @@ def aplicar_interes_mensual_automatico():
             mes_anterior.month
         )
 
+        invalidar_dashboards(db)
         db.commit()
 
+    except IntegrityError:
+        # Otro proceso aplicó el interés de este mes al mismo tiempo: no se duplica
+        db.rollback()
+        print("[InteresJob] El interés del mes ya estaba aplicado")
+
     finally:
         db.close()
 
@@ -112,27 +145,10 @@ def aplicar_interes_mensual_automatico():
 # =========================================================
 # UTILIDADES
 # =========================================================
-def parse_mes_desde_descripcion(desc: str):
-    m = re.search(
-        r"(?:^|\(|\s)(Enero|Febrero|Marzo|Abril|Mayo|Junio|Julio|Agosto|Septiembre|Octubre|Noviembre|Diciembre)\s+(\d{4})(?:\)|\s|$)",
-        desc or "",
-        re.I
-    )
-    if not m:
-        return None
-
-    mes_nombre = m.group(1)
-    year = int(m.group(2))
-    mes_index = next((i for i, x in enumerate(MESES_ES) if x.lower() == mes_nombre.lower()), -1)
-
-    if mes_index < 0:
-        return None
-
-    return (mes_index, year)
-
-
 def validar_usuario(db: Session, usuario_id: int) -> Usuario:
-    usuario = db.query(Usuario).filter(Usuario.id == usuario_id).first()
+    # db.get: no consulta la base si el socio ya está cargado en la sesión. Quien luego
+    # llame a refrescar_dashboard le pasa este mismo objeto para no volver a buscarlo.
+    usuario = db.get(Usuario, usuario_id)
     if not usuario:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
@@ -160,39 +176,28 @@ def obtener_o_crear_ahorro(db: Session, usuario_id: int) -> Ahorro:
     return ahorro
 
 
-def siguiente_mes_texto_desde_movimientos(db: Session, usuario_id: int) -> str:
-    movs = (
-        db.query(Movimiento)
-        .filter(Movimiento.usuario_id == usuario_id, Movimiento.tipo == "Aporte Mensual")
-        .all()
+def ultimo_periodo_aporte(db: Session, usuario_id: int):
+    # (anio, mes) del último mes con aporte registrado, o None
+    return (
+        db.query(Movimiento.periodo_anio, Movimiento.periodo_mes)
+        .filter(
+            Movimiento.usuario_id == usuario_id,
+            Movimiento.tipo == "Aporte Mensual",
+            Movimiento.periodo_anio != None
+        )
+        .order_by(Movimiento.periodo_anio.desc(), Movimiento.periodo_mes.desc())
+        .first()
     )
 
-    now = datetime.now()
-    year_actual = now.year
-
-    if not movs:
-        return f"Enero {year_actual}"
-
-    max_mes_index = -1
-    max_year = year_actual
-
-    for mov in movs:
-        parsed = parse_mes_desde_descripcion(mov.descripcion or "")
-        if parsed:
-            mes_index, y = parsed
-            val = y * 12 + mes_index
-            current_max = max_year * 12 + max_mes_index
-            if val > current_max or max_mes_index == -1:
-                max_mes_index = mes_index
-                max_year = y
 
-    if max_mes_index == -1:
-        return f"Enero {year_actual}"
+def siguiente_mes_texto_desde_movimientos(db: Session, usuario_id: int) -> str:
+    ultimo = ultimo_periodo_aporte(db, usuario_id)
 
-    siguiente_mes_idx = (max_mes_index + 1) % 12
-    siguiente_year = max_year + ((max_mes_index + 1) // 12)
+    if not ultimo:
+        return f"Enero {datetime.now().year}"
 
-    return f"{MESES_ES[siguiente_mes_idx]} {siguiente_year}"
+    anio, mes = ultimo
+    return texto_mes(anio + mes // 12, mes % 12 + 1)
 
 
 
@@ -212,13 +217,21 @@ def aplicar_interes_mensual(db: Session = Depends(get_db)):
 
     mes_anterior = hoy - relativedelta(months=1)
 
-    calcular_interes_mes(
-        db,
-        mes_anterior.year,
-        mes_anterior.month
-    )
+    try:
+        calcular_interes_mes(
+            db,
+            mes_anterior.year,
+            mes_anterior.month
+        )
 
-    db.commit()
+        invalidar_dashboards(db)
+        db.commit()
+    except IntegrityError:
+        db.rollback()
+        raise HTTPException(
+            status_code=409,
+            detail="El interés de este mes ya se está aplicando o ya fue aplicado"
+        )
 
     return {"mensaje": "Interés mensual aplicado correctamente"}
 
@@ -245,13 +258,14 @@ def obtener_ahorro(usuario_id: int, db: Session = Depends(get_db)):
 @router.put("/ahorros/{usuario_id}")
 def actualizar_config_ahorro(usuario_id: int, payload: AhorroCreate, db: Session = Depends(get_db)):
 
-    validar_usuario(db, usuario_id)
+    usuario = validar_usuario(db, usuario_id)
     ahorro = obtener_o_crear_ahorro(db, usuario_id)
 
     ahorro.ahorro_mensual = int(payload.ahorro_mensual)
     ahorro.porcentaje_interes = float(payload.porcentaje_interes)
     ahorro.ultima_actualizacion = datetime.now()
 
+    refrescar_dashboard(db, usuario_id, usuario)
     db.commit()
     db.refresh(ahorro)
 
@@ -261,7 +275,7 @@ def actualizar_config_ahorro(usuario_id: int, payload: AhorroCreate, db: Session
 @router.post("/ahorros/{usuario_id}/registrar_aporte")
 def registrar_aporte(usuario_id: int, payload: AporteMensualPayload, db: Session = Depends(get_db)):
 
-    validar_usuario(db, usuario_id)
+    usuario = validar_usuario(db, usuario_id)
     ahorro = obtener_o_crear_ahorro(db, usuario_id)
 
     aporte = int(ahorro.ahorro_mensual or 0)
@@ -276,6 +290,7 @@ def registrar_aporte(usuario_id: int, payload: AporteMensualPayload, db: Session
     ahorro.ultima_actualizacion = datetime.now()
 
     mes_texto = f"{payload.mes} {payload.anio}"
+    mes_num = mes_numero(payload.mes)
 
     mov = Movimiento(
         usuario_id=usuario_id,
@@ -283,21 +298,25 @@ def registrar_aporte(usuario_id: int, payload: AporteMensualPayload, db: Session
         monto=aporte,
         fecha=datetime.now(),
         categoria="ingreso",
-        descripcion=f"Aporte mensual registrado ({mes_texto})"
+        descripcion=f"Aporte mensual registrado ({mes_texto})",
+        periodo_anio=payload.anio if mes_num else None,
+        periodo_mes=mes_num
     )
 
     db.add(mov)
+    refrescar_dashboard(db, usuario_id, usuario)
     db.commit()
 
     return {"mensaje": f"Aporte registrado ({mes_texto})"}
 
 @router.post("/ahorros/{usuario_id}/registrar_polla")
 def registrar_polla(usuario_id: int, payload: AporteMensualPayload, db: Session = Depends(get_db)):
-    validar_usuario(db, usuario_id)
+    usuario = validar_usuario(db, usuario_id)
     
     # Monto fijo de la polla: 10000 COP
     monto_polla = 10000
     mes_texto = f"{payload.mes} {payload.anio}"
+    mes_num = mes_numero(payload.mes)
     
     mov = Movimiento(
         usuario_id=usuario_id,
@@ -305,10 +324,17 @@ def registrar_polla(usuario_id: int, payload: AporteMensualPayload, db: Session
         monto=monto_polla,
         fecha=datetime.now(),
         categoria="ingreso",
-        descripcion=f"Pago de Polla registrado ({mes_texto})"
+        descripcion=f"Pago de Polla registrado ({mes_texto})",
+        periodo_anio=payload.anio if mes_num else None,
+        periodo_mes=mes_num
     )
     
     db.add(mov)
+
+    if mes_num:
+        recalcular_pozo_polla(db, payload.anio, mes_num)
+
+    refrescar_dashboard(db, usuario_id, usuario)
     db.commit()
     
     return {"mensaje": f"Pago de Polla registrado ({mes_texto})"}
@@ -322,46 +348,32 @@ def modificar_pago_mes(payload: dict, db: Session = Depends(get_db)):
     tipo_pago = payload.get("tipo") # "aporte" o "polla"
     accion = payload.get("accion") # "registrar" o "eliminar"
 
-    validar_usuario(db, usuario_id)
+    usuario = validar_usuario(db, usuario_id)
     ahorro = obtener_o_crear_ahorro(db, usuario_id)
 
-    mes_nombre_clean = str(mes_nombre or "").strip()
-    
-    # Buscar todos los movimientos del usuario
-    movs_user = db.query(Movimiento).filter(
-        Movimiento.usuario_id == usuario_id
+    mes_num = mes_numero(mes_nombre)
+    if not mes_num:
+        raise HTTPException(status_code=400, detail="Mes inválido")
+    mes_texto = texto_mes(anio, mes_num)
+
+    # Movimientos del usuario que corresponden a ese mes (aporte, polla, ajustes, interés)
+    movs = db.query(Movimiento).filter(
+        Movimiento.usuario_id == usuario_id,
+        Movimiento.periodo_anio == anio,
+        Movimiento.periodo_mes == mes_num
     ).all()
 
-    # Filtrar por mes_nombre y año en la descripción
-    movs = []
-    for m in movs_user:
-        desc = (m.descripcion or "").lower()
-        if mes_nombre_clean.lower() in desc and str(anio) in desc:
-            movs.append(m)
+    def es_polla(m: Movimiento) -> bool:
+        return "polla" in (m.tipo or "").lower() or "polla" in (m.categoria or "").lower() or "polla" in (m.descripcion or "").lower()
 
     if accion == "eliminar":
         if tipo_pago == "polla":
-            # Buscar cualquier movimiento de polla del usuario que corresponda a este mes
-            movs_a_borrar = []
-            for m in movs_user:
-                t = (m.tipo or "").lower()
-                cat = (m.categoria or "").lower()
-                desc = (m.descripcion or "").lower()
-
-                es_polla = ("polla" in t or "polla" in cat or "polla" in desc)
-                if es_polla:
-                    # Verificar si coincide con el mes seleccionado o su parsed mes_idx
-                    parsed_m = parse_mes_desde_descripcion(m.descripcion or "")
-                    if parsed_m:
-                        mes_i, _ = parsed_m
-                        if mes_nombre_clean.lower() in MESES_ES[mes_i].lower():
-                            movs_a_borrar.append(m)
-                    elif mes_nombre_clean.lower() in desc:
-                        movs_a_borrar.append(m)
-
+            movs_a_borrar = [m for m in movs if es_polla(m)]
             if movs_a_borrar:
                 for m in movs_a_borrar:
                     db.delete(m)
+                recalcular_pozo_polla(db, anio, mes_num)
+                refrescar_dashboard(db, usuario_id, usuario)
                 db.commit()
                 return {"mensaje": f"Pago de Polla de {mes_nombre} eliminado correctamente"}
             return {"mensaje": "No se encontró registro de pago de polla para eliminar en este mes"}
@@ -372,6 +384,7 @@ def modificar_pago_mes(payload: dict, db: Session = Depends(get_db)):
                     if (m.monto or 0) > 0 and ("aporte" in (m.tipo or "").lower() or "aporte" in (m.descripcion or "").lower()):
                         ahorro.total_ahorrado = max(0, int((ahorro.total_ahorrado or 0) - m.monto))
                     db.delete(m)
+                refrescar_dashboard(db, usuario_id, usuario)
                 db.commit()
                 return {"mensaje": f"Cuota Aporte de {mes_nombre} eliminada (se conserva la Polla si existía)"}
             return {"mensaje": "No se encontró registro de cuota aporte para eliminar en este mes"}
@@ -387,7 +400,7 @@ def modificar_pago_mes(payload: dict, db: Session = Depends(get_db)):
             # Si existen movimientos, actualizamos el primero con el monto total deseado y eliminamos los extra
             movs_aporte[0].monto = nuevo_monto
             movs_aporte[0].tipo = "Aporte Mensual"
-            movs_aporte[0].descripcion = f"Aporte mensual registrado ({mes_nombre} {anio})"
+            movs_aporte[0].descripcion = f"Aporte mensual registrado ({mes_texto})"
             for extra in movs_aporte[1:]:
                 db.delete(extra)
         else:
@@ -398,23 +411,28 @@ def modificar_pago_mes(payload: dict, db: Session = Depends(get_db)):
                 monto=nuevo_monto,
                 fecha=datetime.now(),
                 categoria="ingreso",
-                descripcion=f"Aporte mensual registrado ({mes_nombre} {anio})"
+                descripcion=f"Aporte mensual registrado ({mes_texto})",
+                periodo_anio=anio,
+                periodo_mes=mes_num
             )
             db.add(mov)
 
         # Ajustar el total ahorrado acumulado en base a la diferencia de este mes
         ahorro.total_ahorrado = max(0, int((ahorro.total_ahorrado or 0) + diferencia))
         ahorro.ultima_actualizacion = datetime.now()
+        refrescar_dashboard(db, usuario_id, usuario)
         db.commit()
         return {"mensaje": f"Cuota de {mes_nombre} actualizada a ${nuevo_monto:,} COP"}
     else: # registrar
+        tipo_mov = "Aporte Mensual" if tipo_pago == "aporte" else "Pago Polla"
+        mov_encontrado = next((m for m in movs if m.tipo == tipo_mov), None)
+
         if not mov_encontrado:
             monto = int(ahorro.ahorro_mensual or 0) if tipo_pago == "aporte" else 10000
             if tipo_pago == "aporte":
                 ahorro.total_ahorrado = int((ahorro.total_ahorrado or 0) + monto)
             
-            tipo_mov = "Aporte Mensual" if tipo_pago == "aporte" else "Pago Polla"
-            desc = f"Aporte mensual registrado ({mes_nombre} {anio})" if tipo_pago == "aporte" else f"Pago de Polla registrado ({mes_nombre} {anio})"
+            desc = f"Aporte mensual registrado ({mes_texto})" if tipo_pago == "aporte" else f"Pago de Polla registrado ({mes_texto})"
             
             mov = Movimiento(
                 usuario_id=usuario_id,
@@ -422,31 +440,34 @@ def modificar_pago_mes(payload: dict, db: Session = Depends(get_db)):
                 monto=monto,
                 fecha=datetime.now(),
                 categoria="ingreso",
-                descripcion=desc
+                descripcion=desc,
+                periodo_anio=anio,
+                periodo_mes=mes_num
             )
             db.add(mov)
+            if tipo_pago == "polla":
+                recalcular_pozo_polla(db, anio, mes_num)
+            refrescar_dashboard(db, usuario_id, usuario)
             db.commit()
             return {"mensaje": f"Pago de {tipo_pago} de {mes_nombre} registrado"}
         return {"mensaje": "El pago ya estaba registrado"}
 
-
 # =========================================================
 # MOVIMIENTOS
 # =========================================================
-@router.get("/movimientos/{usuario_id}")
-def listar_movimientos(usuario_id: int, limit: int = 50, db: Session = Depends(get_db)):
+def _listar_movimientos(db: Session, usuario_id: int, limit: int, cursor: str | None = None):
 
     validar_usuario(db, usuario_id)
 
-    movs = (
-        db.query(Movimiento)
-        .filter(Movimiento.usuario_id == usuario_id)
-        .order_by(Movimiento.fecha.desc())
-        .limit(limit)
-        .all()
+    # Del más reciente al más antiguo, por páginas (índice ix_movimientos_usuario_fecha_id)
+    movs, next_cursor, has_more = paginar(
+        db.query(Movimiento).filter(Movimiento.usuario_id == usuario_id),
+        (Movimiento.fecha, Movimiento.id),
+        cursor,
+        limit,
     )
 
-    return [
+    return pagina([
         {
             "id": m.id,
             "tipo": m.tipo,
@@ -456,7 +477,16 @@ def listar_movimientos(usuario_id: int, limit: int = 50, db: Session = Depends(g
             "fecha": m.fecha.isoformat() if m.fecha else None
         }
         for m in movs
-    ]
+    ], next_cursor, has_more)
+
+if ASYNC_DB:
+    @router.get("/movimientos/{usuario_id}")
+    async def listar_movimientos(usuario_id: int, limit: int = 50, cursor: str | None = None, db: AsyncSession = Depends(get_async_db)):
+        return await db.run_sync(_listar_movimientos, usuario_id, limit, cursor)
+else:
+    @router.get("/movimientos/{usuario_id}")
+    def listar_movimientos(usuario_id: int, limit: int = 50, cursor: str | None = None, db: Session = Depends(get_db)):
+        return _listar_movimientos(db, usuario_id, limit, cursor)
 
 
 # =========================================================
@@ -465,7 +495,7 @@ def listar_movimientos(usuario_id: int, limit: int = 50, db: Session = Depends(g
 @router.post("/crear_prestamo", status_code=status.HTTP_201_CREATED)
 def crear_prestamo(payload: PrestamoCreate, db: Session = Depends(get_db)):
 
-    validar_usuario(db, payload.usuario_id)
+    usuario = validar_usuario(db, payload.usuario_id)
 
     nuevo_prestamo = Prestamo(
         usuario_id=payload.usuario_id,
@@ -489,10 +519,12 @@ def crear_prestamo(payload: PrestamoCreate, db: Session = Depends(get_db)):
         monto=int(payload.monto),
         fecha=datetime.now(),
         categoria="prestamo",
-        descripcion=f"Préstamo creado (plazo {payload.plazo} meses)"
+        descripcion=f"Préstamo creado (plazo {payload.plazo} meses)",
+        prestamo_id=nuevo_prestamo.id
     )
 
     db.add(mov)
+    refrescar_dashboard(db, payload.usuario_id, usuario)
     db.commit()
 
     return {"mensaje": "Préstamo creado correctamente"}
@@ -506,8 +538,9 @@ def resetear_usuario(usuario_id: int, db: Session = Depends(get_db)):
 
     user = validar_usuario(db, usuario_id)
 
-    db.query(Prestamo).filter(Prestamo.usuario_id == usuario_id).delete()
+    # Primero los movimientos: los pagos referencian al préstamo
     db.query(Movimiento).filter(Movimiento.usuario_id == usuario_id).delete()
+    db.query(Prestamo).filter(Prestamo.usuario_id == usuario_id).delete()
 
     ahorro = db.query(Ahorro).filter(Ahorro.usuario_id == usuario_id).first()
     if ahorro:
@@ -515,41 +548,21 @@ def resetear_usuario(usuario_id: int, db: Session = Depends(get_db)):
         ahorro.interes_ganado = 0.0
         ahorro.ultima_actualizacion = datetime.now()
 
+    # Se borraron sus pagos de polla: el pozo se rehace completo
+    recalcular_pozo_polla(db)
+    refrescar_dashboard(db, usuario_id, user)
     db.commit()
 
     return {"mensaje": f"Usuario reseteado: {user.usuario} (rol: {user.rol})"}
 
 
 def ultimo_mes_pagado_texto_desde_movimientos(db: Session, usuario_id: int) -> str:
-    movs = (
-        db.query(Movimiento)
-        .filter(Movimiento.usuario_id == usuario_id, Movimiento.tipo == "Aporte Mensual")
-        .all()
-    )
-
-    now = datetime.now()
-    year_actual = now.year
-
-    if not movs:
-        return f"Enero {year_actual}"
+    ultimo = ultimo_periodo_aporte(db, usuario_id)
 
-    max_mes_index = -1
-    max_year = year_actual
+    if not ultimo:
+        return f"Enero {datetime.now().year}"
 
-    for mov in movs:
-        parsed = parse_mes_desde_descripcion(mov.descripcion or "")
-        if parsed:
-            mes_index, y = parsed
-            val = y * 12 + mes_index
-            current_max = max_year * 12 + max_mes_index
-            if val > current_max or max_mes_index == -1:
-                max_mes_index = mes_index
-                max_year = y
-
-    if max_mes_index == -1:
-        return f"Enero {year_actual}"
-
-    return f"{MESES_ES[max_mes_index]} {max_year}"
+    return texto_mes(*ultimo)
 
 
 # =========================================================
@@ -557,7 +570,7 @@ def ultimo_mes_pagado_texto_desde_movimientos(db: Session, usuario_id: int) -> s
 # =========================================================
 @router.post("/ahorros/{usuario_id}/registrar_ajuste")
 def registrar_ajuste_manual(usuario_id: int, payload: AjusteManualPayload, db: Session = Depends(get_db)):
-    validar_usuario(db, usuario_id)
+    usuario = validar_usuario(db, usuario_id)
     ahorro = obtener_o_crear_ahorro(db, usuario_id)
 
     monto = int(payload.monto)
@@ -573,9 +586,12 @@ def registrar_ajuste_manual(usuario_id: int, payload: AjusteManualPayload, db: S
     # Detectar el último mes que efectivamente tiene pago el socio para asociar el descuento
     mes_patron = ""
     parsed = parse_mes_desde_descripcion(payload.descripcion or "")
-    if not parsed:
-        mes_texto = ultimo_mes_pagado_texto_desde_movimientos(db, usuario_id)
-        mes_patron = f" ({mes_texto})"
+    if parsed:
+        mes_index, periodo_anio = parsed
+        periodo_mes = mes_index + 1
+    else:
+        periodo_anio, periodo_mes = ultimo_periodo_aporte(db, usuario_id) or (datetime.now().year, 1)
+        mes_patron = f" ({texto_mes(periodo_anio, periodo_mes)})"
     
     descripcion = f"{payload.descripcion or 'Ajuste manual'}{mes_patron}"
 
@@ -585,10 +601,13 @@ def registrar_ajuste_manual(usuario_id: int, payload: AjusteManualPayload, db: S
         monto=monto,
         fecha=datetime.now(),
         categoria=categoria,
-        descripcion=descripcion
+        descripcion=descripcion,
+        periodo_anio=periodo_anio,
+        periodo_mes=periodo_mes
     )
 
     db.add(mov)
+    refrescar_dashboard(db, usuario_id, usuario)
     db.commit()
 
     return {"mensaje": f"Ajuste registrado correctamente ({tipo})"}
@@ -597,15 +616,11 @@ def registrar_ajuste_manual(usuario_id: int, payload: AjusteManualPayload, db: S
 # =========================================================
 # MATRIZ GENERAL DE PAGOS POR MESES (ADMIN)
 # =========================================================
-@router.get("/admin/matriz_pagos")
-def obtener_matriz_pagos(anio: int = 2026, db: Session = Depends(get_db)):
+def _obtener_matriz_pagos(db: Session, anio: int):
     usuarios = db.query(Usuario).order_by(Usuario.nombre.asc()).all()
     ahorros_map = {a.usuario_id: a for a in db.query(Ahorro).all()}
-    movimientos_todos = db.query(Movimiento).all()
-
-    movs_por_usuario = {}
-    for m in movimientos_todos:
-        movs_por_usuario.setdefault(m.usuario_id, []).append(m)
+    # Sumas por socio/mes/clase calculadas en la base de datos (solo se traen filas agrupadas)
+    resumen = resumen_pagos_anio(db, anio)
 
     matriz = []
     totales_por_mes = {m: 0 for m in range(12)}
@@ -613,40 +628,7 @@ def obtener_matriz_pagos(anio: int = 2026, db: Session = Depends(get_db)):
 
     for u in usuarios:
         ahorro = ahorros_map.get(u.id)
-        movs = movs_por_usuario.get(u.id, [])
-
-        pagos_meses = {}
-        for m in range(12):
-            pagos_meses[m] = {
-                "aporte": False,
-                "monto_aporte": 0,
-                "polla": False,
-                "monto_polla": 0,
-                "total_mes": 0,
-                "tiene_ajuste": False,
-                "motivo_ajuste": ""
-            }
-
-        for mov in movs:
-            parsed = parse_mes_desde_descripcion(mov.descripcion or "")
-            if parsed:
-                mes_idx, y = parsed
-                if y == anio and 0 <= mes_idx <= 11:
-                    tipo_lower = (mov.tipo or "").lower()
-                    desc_lower = (mov.descripcion or "").lower()
-
-                    if "descuento" in tipo_lower or "penalizac" in tipo_lower or "ajuste" in tipo_lower or "descuento" in desc_lower or "penalizac" in desc_lower or "mora" in desc_lower:
-                        pagos_meses[mes_idx]["tiene_ajuste"] = True
-                        pagos_meses[mes_idx]["motivo_ajuste"] = mov.descripcion or mov.tipo
-                        pagos_meses[mes_idx]["monto_aporte"] += int(mov.monto or 0)
-                        pagos_meses[mes_idx]["total_mes"] += int(mov.monto or 0)
-                    elif "aporte" in tipo_lower:
-                        pagos_meses[mes_idx]["aporte"] = True
-                        pagos_meses[mes_idx]["monto_aporte"] += int(mov.monto or 0)
-                        pagos_meses[mes_idx]["total_mes"] += int(mov.monto or 0)
-                    elif "polla" in tipo_lower:
-                        pagos_meses[mes_idx]["polla"] = True
-                        pagos_meses[mes_idx]["monto_polla"] += int(mov.monto or 0)
+        pagos_meses = resumen.get(u.id) or pagos_mes_vacios()
 
         for m_idx in range(12):
             totales_por_mes[m_idx] += pagos_meses[m_idx]["total_mes"]
@@ -667,7 +649,16 @@ def obtener_matriz_pagos(anio: int = 2026, db: Session = Depends(get_db)):
         })
 
     # Calcular pozo acumulado de polla mes a mes (considerando ganadores de lotería)
-    resultados = db.query(ResultadoLoteria).filter(ResultadoLoteria.slug == "medellin").order_by(ResultadoLoteria.date.asc()).all()
+    resultados = (
+        db.query(ResultadoLoteria)
+        .filter(
+            ResultadoLoteria.slug == POLLA_SLUG,
+            ResultadoLoteria.date >= datetime(anio, 1, 1),
+            ResultadoLoteria.date < datetime(anio + 1, 1, 1)
+        )
+        .order_by(ResultadoLoteria.date.asc())
+        .all()
+    )
     res_por_mes = {(r.date.year, r.date.month - 1): r for r in resultados}
 
     pozo_por_mes = {}
@@ -702,4 +693,12 @@ def obtener_matriz_pagos(anio: int = 2026, db: Session = Depends(get_db)):
         "pozo_polla_por_mes": [pozo_por_mes[i] for i in range(12)],
         "gran_total_acumulado": gran_total_acumulado
     }
-
\ No newline at end of file
+
+if ASYNC_DB:
+    @router.get("/admin/matriz_pagos")
+    async def obtener_matriz_pagos(anio: int = 2026, db: AsyncSession = Depends(get_async_db)):
+        return await db.run_sync(_obtener_matriz_pagos, anio)
+else:
+    @router.get("/admin/matriz_pagos")
+    def obtener_matriz_pagos(anio: int = 2026, db: Session = Depends(get_db)):
+        return _obtener_matriz_pagos(db, anio)
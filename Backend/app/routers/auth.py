@@ -3,8 +3,9 @@ from sqlalchemy.orm import Session
 
 from app.database import get_db
 from app.models.models import Usuario
-from app.schemas.schemas import UsuarioLogin, RecuperarPassword
-from app.security.security import verify_password, create_access_token, hash_password
+from app.schemas.schemas import UsuarioLogin, RecuperarPassword, RefreshTokenPayload
+from app.security.security import verify_and_update_password, create_access_token, hash_password
+from app.services.sesiones_service import emitir_refresh_token, rotar_refresh_token, cerrar_sesion, revocar_tokens_usuario
 import logging
 
 router = APIRouter(prefix="/api", tags=["Auth"])
@@ -26,7 +27,7 @@ def login(payload: UsuarioLogin, db: Session = Depends(get_db)):
             detail="Usuario inactivo"
         )
 
-    is_valid = verify_password(payload.password, user.password)
+    is_valid, nuevo_hash = verify_and_update_password(payload.password, user.password)
     
     if not is_valid:
         raise HTTPException(
@@ -34,10 +35,18 @@ def login(payload: UsuarioLogin, db: Session = Depends(get_db)):
             detail="Credenciales inválidas"
         )
 
+    # Cambiaron los costos de argon2 (ARGON2_*): se guarda el hash con los nuevos
+    if nuevo_hash:
+        user.password = nuevo_hash
+
     token = create_access_token(user.id, user.rol)
+    # Con el refresh token el navegador renueva el access token sin volver a pasar por argon2
+    refresh_token = emitir_refresh_token(db, user.id)
+    db.commit()
 
     return {
         "access_token": token,
+        "refresh_token": refresh_token,
         "usuario": {
             "id": user.id,
             "usuario": user.usuario,
@@ -66,6 +75,32 @@ def recuperar_password(payload: RecuperarPassword, db: Session = Depends(get_db)
         
     # Encriptar y actualizar la contraseña
     user.password = hash_password(payload.nueva_password)
+    # Las sesiones abiertas con la contraseña anterior dejan de servir
+    revocar_tokens_usuario(db, user.id)
     db.commit()
     
     return {"message": "Contraseña actualizada exitosamente"}
+
+@router.post("/token/refresh")
+def refrescar_token(payload: RefreshTokenPayload, db: Session = Depends(get_db)):
+    rotado = rotar_refresh_token(db, payload.refresh_token)
+    # Se hace commit también cuando falla: la revocación por reuso debe quedar guardada
+    db.commit()
+
+    if rotado is None:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Sesión expirada, inicia sesión de nuevo"
+        )
+
+    user, refresh_token = rotado
+    return {
+        "access_token": create_access_token(user.id, user.rol),
+        "refresh_token": refresh_token,
+    }
+
+@router.post("/logout")
+def logout(payload: RefreshTokenPayload, db: Session = Depends(get_db)):
+    cerrar_sesion(db, payload.refresh_token)
+    db.commit()
+    return {"message": "Sesión cerrada"}
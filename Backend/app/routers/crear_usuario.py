@@ -5,6 +5,9 @@ from app.database import get_db
 from app.models.models import Usuario, Ahorro
 from app.security.security import hash_password
 from app.services.finanzas_service import crear_ahorro_inicial
+from app.services.polla_pozo import recalcular_pozo_polla
+from app.services.dashboard_service import refrescar_dashboard, refrescar_estadisticas_globales, invalidar_dashboards
+from app.services.paginacion import paginar, pagina
 
 router = APIRouter(prefix="/api", tags=["Usuarios"])
 
@@ -39,6 +42,7 @@ def crear_usuario(payload: UsuarioCreate, db: Session = Depends(get_db)):
             porcentaje_interes=payload.porcentaje_interes
         )
 
+        refrescar_estadisticas_globales(db)
         db.commit()
         db.refresh(nuevo_usuario)
         db.refresh(ahorro)
@@ -52,9 +56,12 @@ def crear_usuario(payload: UsuarioCreate, db: Session = Depends(get_db)):
 from app.schemas.schemas import UsuarioCreate, UsuarioObservacionesUpdate
 
 @router.get("/usuarios")
-def listar_usuarios(db: Session = Depends(get_db)):
-    usuarios = db.query(Usuario).order_by(Usuario.nombre.asc()).all()
-    return [
+def listar_usuarios(limit: int = 100, cursor: str | None = None, db: Session = Depends(get_db)):
+    # Por nombre, por páginas (índice ix_usuarios_nombre_id)
+    usuarios, next_cursor, has_more = paginar(
+        db.query(Usuario), (Usuario.nombre, Usuario.id), cursor, limit, descendente=False
+    )
+    return pagina([
         {
             "id": u.id,
             "usuario": u.usuario,
@@ -66,7 +73,7 @@ def listar_usuarios(db: Session = Depends(get_db)):
             "observaciones": u.observaciones
         }
         for u in usuarios
-    ]
+    ], next_cursor, has_more)
 
 @router.delete("/usuarios/{usuario_id}")
 def eliminar_usuario(usuario_id: int, db: Session = Depends(get_db)):
@@ -74,12 +81,18 @@ def eliminar_usuario(usuario_id: int, db: Session = Depends(get_db)):
     if not usuario:
         raise HTTPException(status_code=404, detail="Usuario no encontrado")
 
-    from app.models.models import Prestamo, Movimiento
-    db.query(Prestamo).filter(Prestamo.usuario_id == usuario_id).delete()
+    from app.models.models import Prestamo, Movimiento, RefreshToken
+    db.query(RefreshToken).filter(RefreshToken.usuario_id == usuario_id).delete()
     db.query(Movimiento).filter(Movimiento.usuario_id == usuario_id).delete()
+    db.query(Prestamo).filter(Prestamo.usuario_id == usuario_id).delete()
     db.query(Ahorro).filter(Ahorro.usuario_id == usuario_id).delete()
     
     db.delete(usuario)
+
+    # Sus pagos y su número de polla ya no cuentan para el pozo
+    recalcular_pozo_polla(db)
+    invalidar_dashboards(db, usuario_id)
+    refrescar_estadisticas_globales(db)
     db.commit()
     return {"mensaje": f"Usuario {usuario.nombre} eliminado correctamente"}
 
@@ -93,6 +106,7 @@ def actualizar_observaciones(usuario_id: int, payload: UsuarioObservacionesUpdat
         )
     
     usuario.observaciones = payload.observaciones
+    refrescar_dashboard(db, usuario_id, usuario)
     db.commit()
     db.refresh(usuario)
     return {"mensaje": "Observaciones actualizadas correctamente", "observaciones": usuario.observaciones}
@@ -0,0 +1,239 @@
+import csv
+import io
+import json
+from datetime import datetime, date
+
+from fastapi import APIRouter, Depends, HTTPException
+from fastapi.responses import StreamingResponse
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+
+from app.database import SessionLocal, get_db
+from app.models.models import Movimiento, Usuario, Ahorro
+from app.routers.Finanzas import validar_usuario
+from app.services.finanzas_service import resumen_pagos_anio, pagos_mes_vacios
+from app.services.periodos import MESES_ES
+
+router = APIRouter(prefix="/api", tags=["Exportar"])
+
+# =========================================================
+# 📤 EXPORTACIÓN EN STREAMING (CSV / NDJSON)
+# =========================================================
+# Las filas se leen por tandas con un cursor del lado del servidor (yield_per) y se
+# envían al cliente a medida que salen: la memoria no crece con el tamaño de la
+# exportación y el primer byte sale de inmediato. El generador abre su propia sesión
+# porque la de Depends(get_db) se cierra antes de que termine de enviarse la respuesta.
+LOTE_EXPORTACION = 1000   # filas por ida a la BD y por envío
+LOTE_MATRIZ = 500         # socios por tanda en la matriz (tamaño del IN del resumen)
+
+FORMATOS = {
+    "csv": "text/csv; charset=utf-8",
+    "ndjson": "application/x-ndjson",
+}
+
+COLUMNAS_MOVIMIENTOS = [
+    "id", "usuario_id", "nombre", "fecha", "tipo", "categoria", "monto",
+    "descripcion", "periodo_anio", "periodo_mes", "prestamo_id",
+]
+
+
+def _validar_formato(formato: str):
+    if formato not in FORMATOS:
+        raise HTTPException(status_code=400, detail="Formato no soportado (csv o ndjson)")
+
+
+def _serializar(valor):
+    return valor.isoformat() if isinstance(valor, (datetime, date)) else valor
+
+
+def _respuesta(generador, formato: str, nombre: str) -> StreamingResponse:
+    return StreamingResponse(
+        generador,
+        media_type=FORMATOS[formato],
+        headers={"Content-Disposition": f'attachment; filename="{nombre}.{formato}"'},
+    )
+
+
+class _Escritor:
+    """Pasa filas (dicts) a texto CSV o NDJSON y las entrega por tandas."""
+
+    def __init__(self, formato: str, columnas: list, aplanar=None):
+        self.formato = formato
+        self.columnas = columnas
+        self.aplanar = aplanar   # para CSV, si la fila tiene datos anidados
+        self.buffer = io.StringIO()
+        self.csv = csv.writer(self.buffer) if formato == "csv" else None
+
+    def encabezado(self) -> str:
+        if self.csv is None:
+            return ""
+        self.csv.writerow(self.columnas)
+        return "﻿" + self.vaciar()   # BOM: Excel abre bien las tildes
+
+    def fila(self, fila: dict):
+        if self.csv is None:
+            self.buffer.write(json.dumps(fila, default=_serializar, ensure_ascii=False) + "\n")
+            return
+        plana = self.aplanar(fila) if self.aplanar else fila
+        self.csv.writerow([_serializar(plana.get(c)) for c in self.columnas])
+
+    def vaciar(self) -> str:
+        texto = self.buffer.getvalue()
+        self.buffer.seek(0)
+        self.buffer.truncate()
+        return texto
+
+
+# =========================================================
+# MOVIMIENTOS
+# =========================================================
+def _generar_movimientos(formato: str, filtros: list):
+    escritor = _Escritor(formato, COLUMNAS_MOVIMIENTOS)
+    encabezado = escritor.encabezado()
+    if encabezado:
+        yield encabezado
+
+    db = SessionLocal()
+    try:
+        consulta = (
+            select(
+                Movimiento.id, Movimiento.usuario_id, Usuario.nombre, Movimiento.fecha,
+                Movimiento.tipo, Movimiento.categoria, Movimiento.monto, Movimiento.descripcion,
+                Movimiento.periodo_anio, Movimiento.periodo_mes, Movimiento.prestamo_id,
+            )
+            .outerjoin(Usuario, Usuario.id == Movimiento.usuario_id)
+            .where(*filtros)
+            .order_by(Movimiento.fecha, Movimiento.id)
+            .execution_options(yield_per=LOTE_EXPORTACION)
+        )
+        for tanda in db.execute(consulta).mappings().partitions():
+            for fila in tanda:
+                escritor.fila(dict(fila))
+            yield escritor.vaciar()
+    finally:
+        db.close()
+
+
+@router.get("/admin/exportar/movimientos")
+def exportar_movimientos(
+    formato: str = "csv",
+    usuario_id: int | None = None,
+    anio: int | None = None,
+    mes: int | None = None,
+    tipo: str | None = None,
+    categoria: str | None = None,
+    db: Session = Depends(get_db),
+):
+    # Las validaciones van antes de empezar a enviar: después ya no se puede cambiar el status
+    _validar_formato(formato)
+    if mes is not None and not 1 <= mes <= 12:
+        raise HTTPException(status_code=400, detail="Mes inválido (1-12)")
+
+    filtros = []
+    nombre = "movimientos"
+    if usuario_id is not None:
+        validar_usuario(db, usuario_id)
+        filtros.append(Movimiento.usuario_id == usuario_id)
+        nombre += f"_socio{usuario_id}"
+    if anio is not None:
+        filtros.append(Movimiento.periodo_anio == anio)
+        nombre += f"_{anio}"
+    if mes is not None:
+        filtros.append(Movimiento.periodo_mes == mes)
+        nombre += f"_{mes:02d}"
+    if tipo:
+        filtros.append(Movimiento.tipo == tipo)
+    if categoria:
+        filtros.append(Movimiento.categoria == categoria)
+
+    return _respuesta(_generar_movimientos(formato, filtros), formato, nombre)
+
+
+# =========================================================
+# MATRIZ DE PAGOS DEL AÑO
+# =========================================================
+# Mismas filas que /api/admin/matriz_pagos (usuarios[]); al final una fila TOTAL (CSV)
+# o una línea con los totales (NDJSON). El pozo de la polla no va: está en la matriz JSON.
+def _columnas_matriz() -> list:
+    columnas = ["usuario_id", "nombre", "usuario", "telefono", "polla_numero", "ahorro_mensual"]
+    for mes in MESES_ES:
+        columnas += [f"{mes} aporte", f"{mes} polla", f"{mes} total", f"{mes} ajuste"]
+    return columnas + ["total_ahorrado", "observaciones"]
+
+
+def _aplanar_matriz(fila: dict) -> dict:
+    plana = dict(fila)
+    for m_idx, mes in enumerate(MESES_ES):
+        pago = fila["pagos_meses"][m_idx]
+        plana[f"{mes} aporte"] = pago["monto_aporte"]
+        plana[f"{mes} polla"] = pago["monto_polla"]
+        plana[f"{mes} total"] = pago["total_mes"]
+        plana[f"{mes} ajuste"] = pago["motivo_ajuste"] if pago["tiene_ajuste"] else ""
+    return plana
+
+
+def _generar_matriz(formato: str, anio: int):
+    escritor = _Escritor(formato, _columnas_matriz(), aplanar=_aplanar_matriz)
+    encabezado = escritor.encabezado()
+    if encabezado:
+        yield encabezado
+
+    totales_por_mes = [0] * 12
+    gran_total_acumulado = 0
+
+    db = SessionLocal()
+    try:
+        consulta = (
+            select(Usuario.id, Usuario.nombre, Usuario.usuario, Usuario.telefono, Usuario.polla, Usuario.observaciones)
+            .order_by(Usuario.nombre, Usuario.id)
+            .execution_options(yield_per=LOTE_MATRIZ)
+        )
+        for tanda in db.execute(consulta).partitions():
+            ids = [u.id for u in tanda]
+            ahorros_map = {
+                a.usuario_id: a
+                for a in db.execute(
+                    select(Ahorro.usuario_id, Ahorro.ahorro_mensual, Ahorro.total_ahorrado)
+                    .where(Ahorro.usuario_id.in_(ids))
+                )
+            }
+            resumen = resumen_pagos_anio(db, anio, ids)
+
+            for u in tanda:
+                ahorro = ahorros_map.get(u.id)
+                pagos_meses = resumen.get(u.id) or pagos_mes_vacios()
+                total_usuario = int(ahorro.total_ahorrado) if (ahorro and ahorro.total_ahorrado) else 0
+
+                for m_idx in range(12):
+                    totales_por_mes[m_idx] += pagos_meses[m_idx]["total_mes"]
+                gran_total_acumulado += total_usuario
+
+                escritor.fila({
+                    "usuario_id": u.id,
+                    "nombre": u.nombre,
+                    "usuario": u.usuario,
+                    "telefono": u.telefono,
+                    "polla_numero": u.polla,
+                    "ahorro_mensual": ahorro.ahorro_mensual if ahorro else 0,
+                    "pagos_meses": pagos_meses,
+                    "total_ahorrado": total_usuario,
+                    "observaciones": u.observaciones,
+                })
+            yield escritor.vaciar()
+    finally:
+        db.close()
+
+    if formato == "csv":
+        total = {"nombre": "TOTAL", "total_ahorrado": gran_total_acumulado}
+        for m_idx, mes in enumerate(MESES_ES):
+            total[f"{mes} total"] = totales_por_mes[m_idx]
+        escritor.csv.writerow([total.get(c, "") for c in escritor.columnas])
+    else:
+        escritor.fila({"anio": anio, "totales_por_mes": totales_por_mes, "gran_total_acumulado": gran_total_acumulado})
+    yield escritor.vaciar()
+
+
+@router.get("/admin/exportar/matriz_pagos")
+def exportar_matriz_pagos(anio: int = 2026, formato: str = "csv"):
+    _validar_formato(formato)
+    return _respuesta(_generar_matriz(formato, anio), formato, f"matriz_pagos_{anio}")
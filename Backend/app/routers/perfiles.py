@@ -0,0 +1,37 @@
+import json
+
+from fastapi import APIRouter, Depends, Header, HTTPException
+from fastapi.responses import FileResponse
+
+from app.security.security import es_admin
+from app.services.perfilador import listar_perfiles, ruta_perfil
+
+# Solo se incluye con PERFILADOR=1 (ver app/main.py y app/services/perfilador.py)
+router = APIRouter(prefix="/api/admin/perfiles", tags=["Perfiles"])
+
+
+def requerir_admin(authorization: str | None = Header(None)):
+    if not es_admin(authorization):
+        raise HTTPException(status_code=403, detail="Solo para administradores")
+
+
+@router.get("", dependencies=[Depends(requerir_admin)])
+def perfiles():
+    return listar_perfiles()
+
+
+@router.get("/{perfil_id}", dependencies=[Depends(requerir_admin)])
+def detalle_perfil(perfil_id: str):
+    ruta = ruta_perfil(perfil_id, ".json")
+    if ruta is None:
+        raise HTTPException(status_code=404, detail="Perfil no encontrado")
+    with open(ruta, encoding="utf-8") as f:
+        return json.load(f)
+
+
+@router.get("/{perfil_id}/descargar", dependencies=[Depends(requerir_admin)])
+def descargar_perfil(perfil_id: str):
+    ruta = ruta_perfil(perfil_id, ".prof")
+    if ruta is None:
+        raise HTTPException(status_code=404, detail="Perfil no encontrado")
+    return FileResponse(ruta, media_type="application/octet-stream", filename=f"{perfil_id}.prof")
@@ -1,45 +1,25 @@
-from datetime import date, timedelta, datetime
-import requests
 from fastapi import APIRouter, Depends, HTTPException, BackgroundTasks
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
 
-from app.database import get_db, SessionLocal
-from app.models.models import Usuario, ResultadoLoteria
+from app.database import get_db, get_async_db, ASYNC_DB
+from app.models.models import Usuario
 
 router = APIRouter(prefix="/api", tags=["Polla"])
 
 
-from app.services.polla_scheduler import last_friday_of_month, sync_medellin_if_last_friday, fetch_medellin_result
+from app.services.polla_sync import programar_sync_polla
+from app.services.resultados_cache import ultimo_resultado, historial_resultados
 
-def task_sync_today_lottery():
-    """
-    Tarea asíncrona de segundo plano (Background Task) para no bloquear la respuesta HTTP del usuario.
-    """
-    db = SessionLocal()
-    try:
-        r = sync_medellin_if_last_friday(db)
-        print("[PollaBackgroundTask]", r)
-    except Exception as e:
-        print(f"[Segundo Plano] Error al sincronizar lotería: {e}")
-    finally:
-        db.close()
 
+def get_or_fetch_last_result(db: Session, background_tasks: BackgroundTasks | None = None) -> dict | None:
+    # Sincronización en segundo plano, una sola a la vez y solo si no se intentó hace poco
+    programar_sync_polla(background_tasks)
 
+    # Desde la caché en memoria (app/services/resultados_cache.py)
+    return ultimo_resultado(db)
 
-
-def get_or_fetch_last_result(db: Session, background_tasks: BackgroundTasks | None = None) -> ResultadoLoteria | None:
-    if background_tasks:
-        background_tasks.add_task(task_sync_today_lottery)
-
-    return (
-        db.query(ResultadoLoteria)
-        .filter(ResultadoLoteria.slug == "medellin")
-        .order_by(ResultadoLoteria.date.desc())
-        .first()
-    )
-
-@router.get("/polla/estado/{usuario_id}")
-def estado_polla(usuario_id: int, background_tasks: BackgroundTasks, db: Session = Depends(get_db)):
+def _estado_polla(db: Session, usuario_id: int, background_tasks: BackgroundTasks):
     user = db.query(Usuario).filter(Usuario.id == usuario_id).first()
     if not user:
         raise HTTPException(status_code=404, detail="Usuario no encontrado")
@@ -55,7 +35,7 @@ def estado_polla(usuario_id: int, background_tasks: BackgroundTasks, db: Session
             "mensaje": "No hay resultado disponible todavía."
         }
 
-    res2 = str(ultimo.result)[-2:].zfill(2)
+    res2 = str(ultimo["result"])[-2:].zfill(2)
     polla2 = str(user.polla)[-2:].zfill(2)
     gano = (res2 == polla2)
 
@@ -63,9 +43,9 @@ def estado_polla(usuario_id: int, background_tasks: BackgroundTasks, db: Session
         "usuario_id": user.id,
         "polla": user.polla,
         "hay_resultado": True,
-        "fecha_sorteo": ultimo.date.isoformat(),
-        "resultado": ultimo.result,
-        "serie": ultimo.series,
+        "fecha_sorteo": ultimo["date"].isoformat(),
+        "resultado": ultimo["result"],
+        "serie": ultimo["series"],
         "gano": gano,
         "comparacion": {"resultado_2": res2, "polla_2": polla2},
         "mensaje": (f"Número ganador del mes pasado: {res2}. ¡Ganaste!"
@@ -73,19 +53,17 @@ def estado_polla(usuario_id: int, background_tasks: BackgroundTasks, db: Session
                     else f"Número ganador del mes pasado: {res2}. No ganaste.")
     }
 
+if ASYNC_DB:
+    @router.get("/polla/estado/{usuario_id}")
+    async def estado_polla(usuario_id: int, background_tasks: BackgroundTasks, db: AsyncSession = Depends(get_async_db)):
+        return await db.run_sync(_estado_polla, usuario_id, background_tasks)
+else:
+    @router.get("/polla/estado/{usuario_id}")
+    def estado_polla(usuario_id: int, background_tasks: BackgroundTasks, db: Session = Depends(get_db)):
+        return _estado_polla(db, usuario_id, background_tasks)
+
 @router.get("/polla/historial")
-def historial_polla(background_tasks: BackgroundTasks, db: Session = Depends(get_db)):
-    background_tasks.add_task(task_sync_today_lottery)
+def historial_polla(background_tasks: BackgroundTasks, limit: int = 24, cursor: str | None = None, db: Session = Depends(get_db)):
+    programar_sync_polla(background_tasks)
     
-    resultados = db.query(ResultadoLoteria).order_by(ResultadoLoteria.date.desc()).all()
-    return [
-        {
-            "id": r.id,
-            "lottery": r.lottery,
-            "date": r.date.isoformat(),
-            "result": r.result,
-            "series": r.series,
-            "ganador": str(r.result)[-2:].zfill(2) if r.result else ""
-        }
-        for r in resultados
-    ]
+    return historial_resultados(db, cursor, limit)
@@ -1,10 +1,13 @@
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, BackgroundTasks
+from sqlalchemy import func, or_
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
 from datetime import datetime
 from dateutil.relativedelta import relativedelta
 
-from app.database import get_db
+from app.database import get_db, get_async_db, SessionLocal, ASYNC_DB
 from app.models.models import Prestamo, Usuario, Movimiento
+from app.services.dashboard_service import refrescar_dashboard
 
 router = APIRouter(prefix="/api", tags=["prestamos"])
 
@@ -12,35 +15,62 @@ router = APIRouter(prefix="/api", tags=["prestamos"])
 # Helpers
 # -----------------------
 def _tag_prestamo(prestamo_id: int) -> str:
-    # Tag para encontrar pagos asociados al préstamo en movimientos
+    # Tag legible en la descripción; la relación real es Movimiento.prestamo_id
     return f"[prestamo_id:{prestamo_id}]"
 
-def _sum_pagos_prestamo(db: Session, usuario_id: int, prestamo_id: int) -> float:
-    tag = _tag_prestamo(prestamo_id)
-    pagos = (
-        db.query(Movimiento)
+def _sum_pagos_prestamo(db: Session, prestamo_id: int) -> float:
+    total = (
+        db.query(func.coalesce(func.sum(Movimiento.monto), 0))
         .filter(
-            Movimiento.usuario_id == usuario_id,
-            Movimiento.tipo == "Pago Préstamo",
-            Movimiento.descripcion.ilike(f"%{tag}%")
+            Movimiento.prestamo_id == prestamo_id,
+            Movimiento.tipo == "Pago Préstamo"
         )
-        .all()
+        .scalar()
     )
-    return float(sum((m.monto or 0) for m in pagos))
+    return float(total or 0)
+
+def _pagos_por_prestamo(db: Session, prestamo_ids: list[int]) -> dict:
+    # Todos los pagos de varios préstamos en una sola consulta, agrupados por préstamo
+    if not prestamo_ids:
+        return {}
 
-def _list_pagos_prestamo(db: Session, usuario_id: int, prestamo_id: int):
-    tag = _tag_prestamo(prestamo_id)
-    return (
+    pagos = (
         db.query(Movimiento)
         .filter(
-            Movimiento.usuario_id == usuario_id,
-            Movimiento.tipo == "Pago Préstamo",
-            Movimiento.descripcion.ilike(f"%{tag}%")
+            Movimiento.prestamo_id.in_(prestamo_ids),
+            Movimiento.tipo == "Pago Préstamo"
         )
-        .order_by(Movimiento.fecha.asc())
+        .order_by(Movimiento.prestamo_id, Movimiento.fecha.asc())
         .all()
     )
 
+    agrupados = {}
+    for m in pagos:
+        agrupados.setdefault(m.prestamo_id, []).append(m)
+    return agrupados
+
+def task_marcar_prestamos_pagados(prestamo_ids: list[int]):
+    """
+    Tarea de segundo plano: marca como pagados, en una sola escritura, los préstamos
+    que el GET encontró saldados pero con otro estado (datos viejos).
+    """
+    db = SessionLocal()
+    try:
+        (
+            db.query(Prestamo)
+            .filter(
+                Prestamo.id.in_(prestamo_ids),
+                or_(Prestamo.estado == None, func.lower(Prestamo.estado) != "pagado")
+            )
+            .update({Prestamo.estado: "pagado"}, synchronize_session=False)
+        )
+        db.commit()
+    except Exception as e:
+        db.rollback()
+        print(f"[Segundo Plano] Error al actualizar estado de préstamos {prestamo_ids}: {e}")
+    finally:
+        db.close()
+
 def calcular_plan_pagos(monto: float, interes_total: float, plazo: int, fecha_inicio: datetime, pagos_movs):
     if not plazo or plazo <= 0:
         return None
@@ -96,8 +126,7 @@ def calcular_plan_pagos(monto: float, interes_total: float, plazo: int, fecha_in
 # -----------------------
 # GET préstamos (con saldo y cuotas pagadas)
 # -----------------------
-@router.get("/prestamos/{usuario_id}")
-def listar_prestamos(usuario_id: int, db: Session = Depends(get_db)):
+def _listar_prestamos(db: Session, usuario_id: int, background_tasks: BackgroundTasks):
     usuario = db.query(Usuario).filter(Usuario.id == usuario_id).first()
     if not usuario:
         raise HTTPException(status_code=404, detail="Usuario no encontrado")
@@ -109,18 +138,22 @@ def listar_prestamos(usuario_id: int, db: Session = Depends(get_db)):
         .all()
     )
 
+    pagos_por_prestamo = _pagos_por_prestamo(db, [p.id for p in prestamos])
+
     respuesta = []
+    saldados = []
     for p in prestamos:
+        pagos_movs = pagos_por_prestamo.get(p.id, [])
+
         total_original = float(p.total if p.total is not None else ((p.monto or 0) + (p.intereses or 0)))
-        total_pagado = _sum_pagos_prestamo(db, usuario_id, p.id)
+        total_pagado = float(sum((m.monto or 0) for m in pagos_movs))
         saldo_pendiente = max(0.0, total_original - total_pagado)
 
-        # Auto-actualizar estado si ya pagó todo
+        # Si ya pagó todo se responde como pagado; la corrección en BD va en segundo plano
+        estado = p.estado
         if saldo_pendiente <= 0.0 and (p.estado or "").lower() != "pagado":
-            p.estado = "pagado"
-            db.commit()
-
-        pagos_movs = _list_pagos_prestamo(db, usuario_id, p.id)
+            estado = "pagado"
+            saldados.append(p.id)
 
         plan = None
         if p.fecha_prestamo and p.plazo and p.plazo > 0:
@@ -141,13 +174,25 @@ def listar_prestamos(usuario_id: int, db: Session = Depends(get_db)):
             "total": total_original,
             "total_pagado": round(total_pagado, 2),
             "saldo_pendiente": round(saldo_pendiente, 2),
-            "estado": p.estado,
+            "estado": estado,
             "plazo": p.plazo,
             "plan_pagos": plan,
         })
 
+    if saldados:
+        background_tasks.add_task(task_marcar_prestamos_pagados, saldados)
+
     return respuesta
 
+if ASYNC_DB:
+    @router.get("/prestamos/{usuario_id}")
+    async def listar_prestamos(usuario_id: int, background_tasks: BackgroundTasks, db: AsyncSession = Depends(get_async_db)):
+        return await db.run_sync(_listar_prestamos, usuario_id, background_tasks)
+else:
+    @router.get("/prestamos/{usuario_id}")
+    def listar_prestamos(usuario_id: int, background_tasks: BackgroundTasks, db: Session = Depends(get_db)):
+        return _listar_prestamos(db, usuario_id, background_tasks)
+
 # -----------------------
 # POST registrar pago (para admin)
 # -----------------------
@@ -161,7 +206,7 @@ def registrar_pago(prestamo_id: int, monto: int = 0, db: Session = Depends(get_d
         raise HTTPException(status_code=400, detail="Este préstamo ya está pagado")
 
     total_original = float(prestamo.total if prestamo.total is not None else ((prestamo.monto or 0) + (prestamo.intereses or 0)))
-    total_pagado = _sum_pagos_prestamo(db, prestamo.usuario_id, prestamo.id)
+    total_pagado = _sum_pagos_prestamo(db, prestamo.id)
     saldo = max(0.0, total_original - total_pagado)
 
     if saldo <= 0:
@@ -188,7 +233,8 @@ def registrar_pago(prestamo_id: int, monto: int = 0, db: Session = Depends(get_d
         monto=int(monto),
         fecha=datetime.now(),
         categoria="prestamo",
-        descripcion=f"Pago de préstamo {tag}"
+        descripcion=f"Pago de préstamo {tag}",
+        prestamo_id=prestamo.id
     )
     db.add(mov)
 
@@ -198,6 +244,7 @@ def registrar_pago(prestamo_id: int, monto: int = 0, db: Session = Depends(get_d
     if nuevo_saldo <= 0:
         prestamo.estado = "pagado"
 
+    refrescar_dashboard(db, prestamo.usuario_id)
     db.commit()
 
     return {
@@ -226,7 +273,7 @@ def pagar_total(prestamo_id: int, db: Session = Depends(get_db)):
         prestamo.total if prestamo.total is not None
         else ((prestamo.monto or 0) + (prestamo.intereses or 0))
     )
-    total_pagado = _sum_pagos_prestamo(db, prestamo.usuario_id, prestamo.id)
+    total_pagado = _sum_pagos_prestamo(db, prestamo.id)
     saldo = max(0.0, total_original - total_pagado)
 
     if saldo <= 0:
@@ -242,11 +289,13 @@ def pagar_total(prestamo_id: int, db: Session = Depends(get_db)):
         monto=int(round(saldo)),
         fecha=datetime.now(),
         categoria="prestamo",
-        descripcion=f"Pago total de préstamo {tag}"
+        descripcion=f"Pago total de préstamo {tag}",
+        prestamo_id=prestamo.id
     )
     db.add(mov)
 
     prestamo.estado = "pagado"
+    refrescar_dashboard(db, prestamo.usuario_id)
     db.commit()
 
     return {
@@ -0,0 +1,135 @@
+# app/scheduler.py
+import time
+import threading
+from datetime import datetime
+
+from apscheduler.events import EVENT_JOB_SUBMITTED, EVENT_JOB_EXECUTED, EVENT_JOB_ERROR, EVENT_JOB_MISSED
+from apscheduler.schedulers.background import BackgroundScheduler
+from apscheduler.triggers.cron import CronTrigger
+
+from app.database import SessionLocal
+from app.routers.Finanzas import aplicar_interes_mensual_automatico
+from app.services.estado_jobs import leer_estado_job, guardar_estado_job, PREFIJO_METRICAS_JOB
+from app.services.polla_agenda import programar_agenda_polla
+from app.services.liderazgo import EleccionLider
+from app.services.sesiones_service import limpiar_refresh_tokens_vencidos
+
+# =========================================================
+# 🔥 SCHEDULER DE JOBS
+# =========================================================
+# Lo usa el worker (python -m app.worker) y, si WEB_SCHEDULER=1, también la API.
+# Con varios procesos solo el líder corre los jobs (ver app/services/liderazgo.py).
+
+
+# -------------------------
+# Métricas de los jobs
+# -------------------------
+# Cada ejecución deja su resumen en estado_jobs ("job:<id>"): así /metrics de cualquier
+# proceso de la API lo muestra aunque los jobs corran en el worker.
+_inicios = {}   # (job_id, hora programada) -> (datetime de inicio, perf_counter)
+_inicios_lock = threading.Lock()
+
+
+def _registrar_evento_job(evento):
+    clave = (evento.job_id, evento.scheduled_run_times[0] if evento.code == EVENT_JOB_SUBMITTED else evento.scheduled_run_time)
+    if evento.code == EVENT_JOB_SUBMITTED:
+        with _inicios_lock:
+            _inicios[clave] = (datetime.now(), time.perf_counter())
+        return
+
+    with _inicios_lock:
+        inicio = _inicios.pop(clave, None)
+
+    db = SessionLocal()
+    try:
+        nombre = PREFIJO_METRICAS_JOB + evento.job_id
+        datos = leer_estado_job(db, nombre)
+        if evento.code == EVENT_JOB_MISSED:
+            datos["perdidas"] = datos.get("perdidas", 0) + 1
+        else:
+            datos["ejecuciones"] = datos.get("ejecuciones", 0) + 1
+            datos["resultado"] = "ok" if evento.code == EVENT_JOB_EXECUTED else "error"
+            if evento.code == EVENT_JOB_ERROR:
+                datos["errores"] = datos.get("errores", 0) + 1
+                datos["ultimo_error"] = str(evento.exception)
+            if inicio is not None:
+                datos["ultima_ejecucion"] = inicio[0].isoformat()
+                datos["duracion_s"] = round(time.perf_counter() - inicio[1], 3)
+        guardar_estado_job(db, nombre, datos)
+        db.commit()
+    except Exception as e:
+        db.rollback()
+        print("[Scheduler][ERROR] No se pudo guardar la métrica del job:", str(e))
+    finally:
+        db.close()
+
+
+def crear_scheduler() -> BackgroundScheduler:
+    scheduler = BackgroundScheduler(timezone="America/Bogota")
+    scheduler.add_listener(
+        _registrar_evento_job,
+        EVENT_JOB_SUBMITTED | EVENT_JOB_EXECUTED | EVENT_JOB_ERROR | EVENT_JOB_MISSED,
+    )
+
+    # -------------------------
+    # JOB 1: Interés mensual
+    # -------------------------
+    scheduler.add_job(
+        aplicar_interes_mensual_automatico,
+        CronTrigger(day=1, hour=5, minute=5),
+        id="interes_mensual",
+        replace_existing=True,
+        # Si el líder cambia justo a esa hora, el nuevo líder lo corre al tomar el relevo
+        misfire_grace_time=6 * 3600,
+        coalesce=True,
+    )
+
+    # -------------------------
+    # JOB 2: Limpieza de refresh tokens vencidos
+    # -------------------------
+    scheduler.add_job(
+        limpiar_refresh_tokens_vencidos,
+        CronTrigger(hour=3, minute=30),
+        id="limpiar_refresh_tokens",
+        replace_existing=True,
+        misfire_grace_time=6 * 3600,
+        coalesce=True,
+    )
+
+    # -------------------------
+    # JOB 3: Sync Polla
+    # -------------------------
+    # Se programa al ganar la elección: el job se reprograma solo según el calendario
+    # de sorteos, ver app/services/polla_agenda.py
+    return scheduler
+
+
+class SchedulerConLider:
+    """Scheduler que arranca en pausa y solo corre sus jobs mientras este proceso sea líder."""
+
+    def __init__(self, nombre: str = "proceso"):
+        self.nombre = nombre
+        self.scheduler = crear_scheduler()
+        self.eleccion = EleccionLider(self._al_ser_lider, self._al_dejar_de_ser_lider)
+
+    def _al_ser_lider(self):
+        programar_agenda_polla(self.scheduler)
+        self.scheduler.resume()
+        print(f"Scheduler activo en este {self.nombre}")
+
+    def _al_dejar_de_ser_lider(self):
+        self.scheduler.pause()
+        print(f"Scheduler en pausa en este {self.nombre}")
+
+    def iniciar(self):
+        if not self.scheduler.running:
+            # Arranca en pausa: se activa cuando este proceso gana la elección
+            self.scheduler.start(paused=True)
+            self.eleccion.iniciar()
+            print("Scheduler iniciado correctamente")
+
+    def detener(self):
+        if self.scheduler.running:
+            self.eleccion.detener()
+            self.scheduler.shutdown()
+            print("Scheduler detenido")
@@ -24,6 +24,9 @@ class UsuarioLogin(BaseModel):
     usuario: str
     password: str
 
+class RefreshTokenPayload(BaseModel):
+    refresh_token: str
+
 class RecuperarPassword(BaseModel):
     email: str
     celular: str
@@ -0,0 +1,92 @@
+# app/security/hash_pool.py
+import os
+import time
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+# =========================================================
+# 🔐 POOL ACOTADO PARA ARGON2
+# =========================================================
+# argon2 es lento y gasta mucha memoria a propósito. Si cada login lo corre en su
+# propio hilo del threadpool, una ráfaga de logins al inicio de una reunión deja sin
+# CPU al resto de endpoints. Aquí se corren como máximo HASH_WORKERS hashes a la vez
+# (argon2-cffi suelta el GIL, así que basta con hilos) y se aceptan a lo sumo
+# HASH_MAX_PENDIENTES en espera; el resto se rechaza de inmediato con 503.
+HASH_WORKERS = int(os.getenv("HASH_WORKERS", "2"))
+HASH_MAX_PENDIENTES = int(os.getenv("HASH_MAX_PENDIENTES", "16"))
+HASH_RETRY_AFTER = int(os.getenv("HASH_RETRY_AFTER", "2"))  # segundos, para el header Retry-After
+
+
+class HashPoolSaturado(Exception):
+    """El pool de hashing ya tiene HASH_MAX_PENDIENTES tareas en espera."""
+
+
+_executor = ThreadPoolExecutor(max_workers=HASH_WORKERS, thread_name_prefix="argon2")
+_lock = threading.Lock()
+
+_metricas = {
+    "en_cola": 0,          # aceptadas que aún no empiezan
+    "en_proceso": 0,       # corriendo argon2 en este momento
+    "completados": 0,
+    "rechazados": 0,
+    "errores": 0,
+    "espera_total_s": 0.0,
+    "latencia_total_s": 0.0,
+    "latencia_max_s": 0.0,
+}
+
+
+def _correr(fn, args, encolado: float):
+    inicio = time.perf_counter()
+    with _lock:
+        _metricas["en_cola"] -= 1
+        _metricas["en_proceso"] += 1
+        _metricas["espera_total_s"] += inicio - encolado
+
+    error = False
+    try:
+        return fn(*args)
+    except Exception:
+        error = True
+        raise
+    finally:
+        duracion = time.perf_counter() - inicio
+        with _lock:
+            _metricas["en_proceso"] -= 1
+            _metricas["completados"] += 1
+            _metricas["errores"] += int(error)
+            _metricas["latencia_total_s"] += duracion
+            _metricas["latencia_max_s"] = max(_metricas["latencia_max_s"], duracion)
+
+
+def ejecutar_hash(fn, *args):
+    """
+    Corre fn(*args) en el pool de hashing y espera el resultado.
+    Lanza HashPoolSaturado si ya hay demasiadas tareas esperando.
+    """
+    with _lock:
+        if _metricas["en_cola"] + _metricas["en_proceso"] >= HASH_WORKERS + HASH_MAX_PENDIENTES:
+            _metricas["rechazados"] += 1
+            raise HashPoolSaturado()
+        _metricas["en_cola"] += 1
+
+    return _executor.submit(_correr, fn, args, time.perf_counter()).result()
+
+
+def metricas_hash() -> dict:
+    with _lock:
+        m = dict(_metricas)
+
+    completados = m["completados"] or 1
+    return {
+        "workers": HASH_WORKERS,
+        "max_pendientes": HASH_MAX_PENDIENTES,
+        "en_cola": m["en_cola"],
+        "en_proceso": m["en_proceso"],
+        "completados": m["completados"],
+        "rechazados": m["rechazados"],
+        "errores": m["errores"],
+        "espera_promedio_ms": round(m["espera_total_s"] / completados * 1000, 2),
+        "latencia_promedio_ms": round(m["latencia_total_s"] / completados * 1000, 2),
+        "latencia_max_ms": round(m["latencia_max_s"] * 1000, 2),
+    }
@@ -1,11 +1,18 @@
+import os
+import re
+import hashlib
+import secrets
 from datetime import datetime, timedelta, timezone
-from jose import jwt
+from jose import jwt, JWTError
 from passlib.context import CryptContext
 
+from app.security.hash_pool import ejecutar_hash
+
 # OJO: en producción esto va en variables de entorno (.env)
 SECRET_KEY = "CLAVESECRETADELANATILLERAFAMILIAOSPINAYOTROS"
 ALGORITHM = "HS256"
 ACCESS_TOKEN_EXPIRE_MINUTES = 60
+REFRESH_TOKEN_EXPIRE_DAYS = int(os.getenv("REFRESH_TOKEN_EXPIRE_DAYS", "30"))
 
 
 def create_access_token(user_id: int, rol: str, expires_minutes: int = ACCESS_TOKEN_EXPIRE_MINUTES) -> str:
@@ -19,10 +26,65 @@ def create_access_token(user_id: int, rol: str, expires_minutes: int = ACCESS_TO
 
     return jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
 
-pwd_context = CryptContext(schemes=["argon2"], deprecated="auto")
 
+def decodificar_access_token(token: str) -> dict | None:
+    # Payload del access token (sub, rol, exp) o None si es inválido o ya venció
+    try:
+        return jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
+    except JWTError:
+        return None
+
+
+def es_admin(authorization: str | None) -> bool:
+    """True si el header Authorization trae un access token vigente de un admin."""
+    if not authorization or not authorization.lower().startswith("bearer "):
+        return False
+    payload = decodificar_access_token(authorization[7:].strip())
+    return bool(payload) and payload.get("rol") == "admin"
+
+
+def generar_refresh_token() -> str:
+    # Token opaco y aleatorio: no es un JWT, se valida contra la tabla refresh_tokens
+    return secrets.token_urlsafe(32)
+
+def hash_refresh_token(token: str) -> str:
+    # El token ya tiene 256 bits de azar: basta un sha256, no hace falta argon2
+    return hashlib.sha256(token.encode("utf-8")).hexdigest()
+
+def _argon2_settings() -> dict:
+    # Costos de argon2 desde el entorno; sin variables se usan los valores por defecto de passlib.
+    # Al cambiarlos, los hashes viejos siguen sirviendo y se rehacen en el siguiente login.
+    settings = {}
+    for env, clave in (
+        ("ARGON2_TIME_COST", "argon2__time_cost"),
+        ("ARGON2_MEMORY_COST", "argon2__memory_cost"),  # en KiB
+        ("ARGON2_PARALLELISM", "argon2__parallelism"),
+    ):
+        valor = os.getenv(env)
+        if valor:
+            settings[clave] = int(valor)
+    return settings
+
+pwd_context = CryptContext(schemes=["argon2"], deprecated="auto", **_argon2_settings())
+
+# argon2 corre en el pool acotado de app/security/hash_pool.py (puede lanzar HashPoolSaturado)
 def verify_password(plain_password: str, hashed_password: str) -> bool:
-    return pwd_context.verify(plain_password, hashed_password)
+    return ejecutar_hash(pwd_context.verify, plain_password, hashed_password)
+
+_PARALELISMO_HASH = re.compile(r"[$,]p=(\d+)")
+
+def _verificar_y_actualizar(plain_password: str, hashed_password: str) -> tuple[bool, str | None]:
+    valida, nuevo_hash = pwd_context.verify_and_update(plain_password, hashed_password)
+    # needs_update de passlib no compara el parallelism: se revisa el p= del hash a mano
+    if valida and nuevo_hash is None:
+        p = _PARALELISMO_HASH.search(hashed_password)
+        if p and int(p.group(1)) != pwd_context.handler("argon2").parallelism:
+            nuevo_hash = pwd_context.hash(plain_password)
+    return valida, nuevo_hash
+
+def verify_and_update_password(plain_password: str, hashed_password: str) -> tuple[bool, str | None]:
+    # (válida, nuevo_hash): nuevo_hash viene solo si el hash guardado usa otros costos
+    return ejecutar_hash(_verificar_y_actualizar, plain_password, hashed_password)
 
 def hash_password(password: str) -> str:
-    return pwd_context.hash(password)
\ No newline at end of file
+    return ejecutar_hash(pwd_context.hash, password)
\ No newline at end of file
@@ -0,0 +1,94 @@
+# app/services/backfill_resultados.py
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from datetime import date, datetime, time
+from sqlalchemy.orm import Session
+
+from app.models.models import ResultadoLoteria
+from app.services.polla_pozo import recalcular_pozo_polla, POLLA_SLUG
+from app.services.polla_scheduler import last_friday_of_month, fetch_resultados_dia, guardar_resultados
+from app.services.dashboard_service import refrescar_estadisticas_globales
+from app.services.resultados_cache import invalidar_resultados
+
+LOTE_UPSERT = 1000
+
+
+def fechas_sorteo(desde: tuple[int, int], hasta: tuple[int, int]) -> list[date]:
+    """Último viernes de cada mes entre (anio, mes) desde y hasta, sin pasar de hoy."""
+    hoy = date.today()
+    fechas = []
+    anio, mes = desde
+    while (anio, mes) <= hasta:
+        draw_date = last_friday_of_month(anio, mes)
+        if draw_date <= hoy:
+            fechas.append(draw_date)
+        anio, mes = (anio + 1, 1) if mes == 12 else (anio, mes + 1)
+    return fechas
+
+
+def fechas_faltantes(db: Session, desde: tuple[int, int], hasta: tuple[int, int]) -> list[date]:
+    # Una sola consulta: las fechas que ya tienen resultado de la lotería de la polla
+    fechas = fechas_sorteo(desde, hasta)
+    if not fechas:
+        return []
+    guardadas = {
+        d.date() if isinstance(d, datetime) else d
+        for (d,) in db.query(ResultadoLoteria.date).filter(
+            ResultadoLoteria.slug == POLLA_SLUG,
+            ResultadoLoteria.date >= datetime.combine(fechas[0], time.min),
+            ResultadoLoteria.date <= datetime.combine(fechas[-1], time.min),
+        )
+    }
+    return [f for f in fechas if f not in guardadas]
+
+
+def backfill_resultados(
+    db: Session,
+    desde: tuple[int, int],
+    hasta: tuple[int, int],
+    paralelo: int = 4,
+    progreso=print,
+) -> dict:
+    """
+    Trae en paralelo (a lo sumo `paralelo` llamadas a la vez) los sorteos que faltan entre
+    desde y hasta, y los guarda todos con un solo upsert y un solo commit. El pozo de la
+    polla se recalcula una vez, desde el sorteo más antiguo traído.
+    """
+    faltantes = fechas_faltantes(db, desde, hasta)
+    reporte = {"faltantes": len(faltantes), "guardadas": [], "fallidas": {}, "filas": 0}
+    if not faltantes:
+        progreso("No hay sorteos faltantes en el rango.")
+        return reporte
+
+    progreso(f"{len(faltantes)} sorteos faltantes, consultando con {paralelo} en paralelo...")
+    filas = []
+    with ThreadPoolExecutor(max_workers=max(1, paralelo), thread_name_prefix="backfill") as ex:
+        futuros = {ex.submit(fetch_resultados_dia, f): f for f in faltantes}
+        for i, futuro in enumerate(as_completed(futuros), start=1):
+            draw_date = futuros[futuro]
+            try:
+                filas_dia = futuro.result()
+            except Exception as e:
+                reporte["fallidas"][draw_date.isoformat()] = str(e)
+                progreso(f"[{i}/{len(faltantes)}] {draw_date}: ERROR {e}")
+                continue
+
+            if not any(f["slug"] == POLLA_SLUG for f in filas_dia):
+                reporte["fallidas"][draw_date.isoformat()] = f"Sin resultado {POLLA_SLUG}"
+            else:
+                reporte["guardadas"].append(draw_date.isoformat())
+            filas.extend(filas_dia)
+            progreso(f"[{i}/{len(faltantes)}] {draw_date}: {len(filas_dia)} loterías")
+
+    if filas:
+        # Un solo commit; en tandas para no pasar el límite de parámetros por sentencia
+        for i in range(0, len(filas), LOTE_UPSERT):
+            reporte["filas"] += guardar_resultados(db, filas[i:i + LOTE_UPSERT])
+        if reporte["guardadas"]:
+            primera = min(reporte["guardadas"])
+            recalcular_pozo_polla(db, int(primera[:4]), int(primera[5:7]))
+            refrescar_estadisticas_globales(db)
+        db.commit()
+        invalidar_resultados()
+
+    reporte["guardadas"].sort()
+    return reporte
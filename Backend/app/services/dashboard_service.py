@@ -0,0 +1,196 @@
+# app/services/dashboard_service.py
+import os
+from datetime import datetime, timedelta
+from sqlalchemy import func, or_
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
+from app.models.models import Usuario, Ahorro, Prestamo, Movimiento, DashboardSocio, EstadisticasGlobales
+from app.services.polla_pozo import obtener_pozo_actual
+
+ESTADISTICAS_ID = 1
+
+# La fila global (socios, total ahorrado, pozo) NO se toca en cada escritura: sería un
+# SUM sobre todos los ahorros y un candado sobre la misma fila en cada transacción, y dos
+# escrituras concurrentes se pisarían el total. Se recalcula al leer cuando tiene más de
+# ESTADISTICAS_TTL segundos (o es de otro mes), siempre desde datos ya confirmados.
+# Solo una petición la recalcula: la toma con FOR UPDATE SKIP LOCKED y las demás
+# responden con la fila vencida en vez de esperar el candado.
+ESTADISTICAS_TTL = int(os.getenv("DASHBOARD_GLOBAL_TTL", "30"))
+
+
+def construir_dashboard_socio(db: Session, usuario: Usuario) -> dict:
+    """Recalcula y guarda la parte del dashboard propia del socio. No hace commit."""
+    ahorro = db.query(Ahorro).filter(Ahorro.usuario_id == usuario.id).first()
+    total_prestado = (
+        db.query(func.coalesce(func.sum(Prestamo.monto), 0))
+        .filter(Prestamo.usuario_id == usuario.id)
+        .scalar()
+    )
+
+    # últimos movimientos
+    movimientos = (
+        db.query(Movimiento)
+        .filter(Movimiento.usuario_id == usuario.id)
+        .order_by(Movimiento.fecha.desc())
+        .limit(6)
+        .all()
+    )
+
+    datos = {
+        "ahorro_mensual": ahorro.ahorro_mensual if ahorro else 0,
+        "total_ahorrado": ahorro.total_ahorrado if ahorro else 0,
+        "porcentaje_interes": float(ahorro.porcentaje_interes) if ahorro else 8.5,
+        "interes_ganado": float(ahorro.interes_ganado) if ahorro else 0.0,
+        "total_prestado": int(total_prestado or 0),
+        "numero_polla": usuario.polla,
+        "observaciones": usuario.observaciones,
+        "historial": [
+            {
+                "id": m.id,
+                "tipo": m.tipo,
+                "monto": float(m.monto),
+                "categoria": m.categoria,
+                "descripcion": m.descripcion,
+                "fecha": m.fecha.isoformat() if m.fecha else None,
+            }
+            for m in movimientos
+        ],
+    }
+
+    fila = db.get(DashboardSocio, usuario.id)
+    if fila is None:
+        fila = DashboardSocio(usuario_id=usuario.id)
+        db.add(fila)
+    fila.datos = datos
+    fila.actualizado = datetime.now()
+    return datos
+
+
+def refrescar_estadisticas_globales(db: Session) -> EstadisticasGlobales:
+    """Recalcula la fila global (socios, total ahorrado, pozo de la polla). No hace commit."""
+    db.flush()
+    hoy = datetime.now()
+
+    stats = db.get(EstadisticasGlobales, ESTADISTICAS_ID)
+    if stats is None:
+        stats = EstadisticasGlobales(id=ESTADISTICAS_ID)
+        db.add(stats)
+
+    stats.socios_total = db.query(func.count(Usuario.id)).scalar() or 0
+    stats.total_ahorrado_global = int(db.query(func.coalesce(func.sum(Ahorro.total_ahorrado), 0)).scalar() or 0)
+    stats.polla_acumulado = obtener_pozo_actual(db)
+    stats.anio = hoy.year
+    stats.mes = hoy.month
+    stats.actualizado = hoy
+    return stats
+
+
+def refrescar_dashboard(db: Session, usuario_id: int, usuario: Usuario | None = None):
+    """
+    Write-through para los endpoints que cambian el dashboard de un socio: rehace su
+    fila dentro de la misma transacción. La fila global se pone al día al leer (ver
+    ESTADISTICAS_TTL). Si quien llama ya tiene el Usuario, lo pasa y no se vuelve a
+    buscar. No hace commit.
+    """
+    db.flush()
+    if usuario is None:
+        usuario = db.get(Usuario, usuario_id)
+    if usuario:
+        construir_dashboard_socio(db, usuario)
+
+
+def _estadisticas_vencidas(stats: EstadisticasGlobales | None, ahora: datetime) -> bool:
+    return (
+        stats is None
+        or (stats.anio, stats.mes) != (ahora.year, ahora.month)
+        or stats.actualizado is None
+        or ahora - stats.actualizado > timedelta(seconds=ESTADISTICAS_TTL)
+    )
+
+
+def _tomar_estadisticas_vencidas(db: Session, ahora: datetime) -> EstadisticasGlobales | None:
+    """La fila global bloqueada, si sigue vencida y ninguna otra petición la tiene tomada."""
+    return (
+        db.query(EstadisticasGlobales)
+        .filter(
+            EstadisticasGlobales.id == ESTADISTICAS_ID,
+            or_(
+                EstadisticasGlobales.actualizado.is_(None),
+                EstadisticasGlobales.actualizado < ahora - timedelta(seconds=ESTADISTICAS_TTL),
+                EstadisticasGlobales.anio != ahora.year,
+                EstadisticasGlobales.mes != ahora.month,
+            ),
+        )
+        .with_for_update(skip_locked=True)
+        .populate_existing()
+        .first()
+    )
+
+
+def invalidar_dashboards(db: Session, usuario_id: int | None = None):
+    """
+    Borra las filas precalculadas (de un socio o de todos); se reconstruyen en la
+    siguiente lectura. Útil para cambios masivos como el interés mensual. No hace commit.
+    """
+    consulta = db.query(DashboardSocio)
+    if usuario_id is not None:
+        consulta = consulta.filter(DashboardSocio.usuario_id == usuario_id)
+    consulta.delete(synchronize_session=False)
+    db.query(EstadisticasGlobales).delete(synchronize_session=False)
+
+
+def leer_dashboard(db: Session, usuario_id: int) -> dict | None:
+    """
+    Lectura del dashboard: una sola consulta (fila del socio + fila global). Solo si
+    falta alguna, o la global está vencida (ESTADISTICAS_TTL o mes anterior), se
+    recalcula y se guarda; la global vencida la recalcula una sola petición a la vez.
+    Devuelve None si el usuario no existe.
+    """
+    fila = (
+        db.query(DashboardSocio, EstadisticasGlobales)
+        .outerjoin(EstadisticasGlobales, EstadisticasGlobales.id == ESTADISTICAS_ID)
+        .filter(DashboardSocio.usuario_id == usuario_id)
+        .first()
+    )
+
+    if fila is None:
+        usuario = db.get(Usuario, usuario_id)
+        if not usuario:
+            return None
+        datos = construir_dashboard_socio(db, usuario)
+        stats = db.get(EstadisticasGlobales, ESTADISTICAS_ID)
+    else:
+        datos = fila[0].datos
+        stats = fila[1]
+
+    ahora = datetime.now()
+    if stats is None:
+        stats = refrescar_estadisticas_globales(db)
+    elif _estadisticas_vencidas(stats, ahora) and _tomar_estadisticas_vencidas(db, ahora) is not None:
+        stats = refrescar_estadisticas_globales(db)
+
+    respuesta = {
+        "ahorro_mensual": datos["ahorro_mensual"],
+        "total_ahorrado": datos["total_ahorrado"],
+        "porcentaje_interes": datos["porcentaje_interes"],
+        "interes_ganado": datos["interes_ganado"],
+
+        "socios_total": stats.socios_total,
+        "total_prestado": datos["total_prestado"],
+        "numero_polla": datos["numero_polla"],
+        "polla_acumulado": float(stats.polla_acumulado or 0),
+        "observaciones": datos["observaciones"],
+        "total_ahorrado_global": stats.total_ahorrado_global,
+
+        "historial": datos["historial"],
+    }
+
+    if db.new or db.dirty:
+        try:
+            db.commit()
+        except IntegrityError:
+            # Otra petición reconstruyó la misma fila al mismo tiempo: se responde igual
+            db.rollback()
+
+    return respuesta
@@ -0,0 +1,29 @@
+# app/services/estado_jobs.py
+from datetime import datetime
+from sqlalchemy.orm import Session
+
+from app.models.models import EstadoJob
+
+# Resumen de ejecuciones de cada job del scheduler, para /metrics ("job:<id>")
+PREFIJO_METRICAS_JOB = "job:"
+
+
+def leer_estado_job(db: Session, nombre: str) -> dict:
+    fila = db.get(EstadoJob, nombre)
+    return dict(fila.datos or {}) if fila else {}
+
+
+def leer_estados_prefijo(db: Session, prefijo: str) -> dict:
+    """{nombre sin el prefijo: datos} de todos los estados cuyo nombre empieza por prefijo."""
+    filas = db.query(EstadoJob).filter(EstadoJob.nombre.startswith(prefijo)).all()
+    return {f.nombre[len(prefijo):]: dict(f.datos or {}) for f in filas}
+
+
+def guardar_estado_job(db: Session, nombre: str, datos: dict):
+    """Guarda (reemplaza) el estado del job. No hace commit."""
+    fila = db.get(EstadoJob, nombre)
+    if fila is None:
+        fila = EstadoJob(nombre=nombre)
+        db.add(fila)
+    fila.datos = dict(datos)  # objeto nuevo: así SQLAlchemy detecta el cambio en la columna JSON
+    fila.actualizado = datetime.now()
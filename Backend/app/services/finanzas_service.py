@@ -1,5 +1,6 @@
+from sqlalchemy import func, case, or_, select
 from sqlalchemy.orm import Session
-from app.models.models import Ahorro
+from app.models.models import Ahorro, Movimiento
 
 def crear_ahorro_inicial(
     db: Session,
@@ -18,3 +19,103 @@ def crear_ahorro_inicial(
     db.flush()  # 👈 importante: genera el ID sin hacer commit todavía
     db.refresh(nuevo_ahorro)
     return nuevo_ahorro
+
+
+def _clase_movimiento():
+    # Misma clasificación que usaba la matriz en Python: ajuste/penalización, aporte o polla
+    tipo_l = func.lower(func.coalesce(Movimiento.tipo, ""))
+    desc_l = func.lower(func.coalesce(Movimiento.descripcion, ""))
+    return case(
+        (
+            or_(
+                tipo_l.contains("descuento"), tipo_l.contains("penalizac"), tipo_l.contains("ajuste"),
+                desc_l.contains("descuento"), desc_l.contains("penalizac"), desc_l.contains("mora"),
+            ),
+            "ajuste"
+        ),
+        (tipo_l.contains("aporte"), "aporte"),
+        (tipo_l.contains("polla"), "polla"),
+        else_=None
+    )
+
+
+def pagos_mes_vacios() -> dict:
+    return {
+        m: {
+            "aporte": False,
+            "monto_aporte": 0,
+            "polla": False,
+            "monto_polla": 0,
+            "total_mes": 0,
+            "tiene_ajuste": False,
+            "motivo_ajuste": ""
+        }
+        for m in range(12)
+    }
+
+
+def resumen_pagos_anio(db: Session, anio: int, usuario_ids: list[int] | None = None) -> dict:
+    """
+    {usuario_id: pagos_meses} del año, agregado en la base de datos: devuelve una fila
+    por (socio, mes, clase) en lugar de todos los movimientos. Con usuario_ids, solo
+    esos socios (la exportación lo pide por tandas).
+    """
+    filtro = [Movimiento.periodo_anio == anio, Movimiento.periodo_mes.between(1, 12)]
+    if usuario_ids is not None:
+        filtro.append(Movimiento.usuario_id.in_(usuario_ids))
+
+    clasificados = (
+        select(
+            Movimiento.id.label("id"),
+            Movimiento.usuario_id.label("usuario_id"),
+            Movimiento.periodo_mes.label("periodo_mes"),
+            Movimiento.monto.label("monto"),
+            _clase_movimiento().label("clase"),
+        )
+        .where(*filtro)
+        .subquery()
+    )
+
+    agrupado = (
+        select(
+            clasificados.c.usuario_id,
+            clasificados.c.periodo_mes,
+            clasificados.c.clase,
+            func.coalesce(func.sum(clasificados.c.monto), 0),
+            func.max(clasificados.c.id),
+        )
+        .where(clasificados.c.clase != None)
+        .group_by(clasificados.c.usuario_id, clasificados.c.periodo_mes, clasificados.c.clase)
+    )
+
+    resumen = {}
+    ultimo_ajuste = {}  # id del último ajuste de cada (socio, mes) -> su descripción es el motivo
+
+    for usuario_id, periodo_mes, clase, total, ultimo_id in db.execute(agrupado):
+        if usuario_id not in resumen:
+            resumen[usuario_id] = pagos_mes_vacios()
+        mes = resumen[usuario_id][periodo_mes - 1]
+        total = int(total or 0)
+
+        if clase == "ajuste":
+            mes["tiene_ajuste"] = True
+            mes["monto_aporte"] += total
+            mes["total_mes"] += total
+            ultimo_ajuste[ultimo_id] = mes
+        elif clase == "aporte":
+            mes["aporte"] = True
+            mes["monto_aporte"] += total
+            mes["total_mes"] += total
+        elif clase == "polla":
+            mes["polla"] = True
+            mes["monto_polla"] += total
+
+    if ultimo_ajuste:
+        motivos = db.execute(
+            select(Movimiento.id, Movimiento.descripcion, Movimiento.tipo)
+            .where(Movimiento.id.in_(list(ultimo_ajuste)))
+        )
+        for mov_id, descripcion, tipo in motivos:
+            ultimo_ajuste[mov_id]["motivo_ajuste"] = descripcion or tipo
+
+    return resumen
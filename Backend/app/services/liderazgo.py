@@ -0,0 +1,184 @@
+# app/services/liderazgo.py
+import os
+import tempfile
+import threading
+from sqlalchemy import create_engine, text
+from sqlalchemy.engine import make_url
+from sqlalchemy.pool import NullPool
+
+from app.database import engine, DATABASE_URL, normalizar_url
+
+# =========================================================
+# 👑 ELECCIÓN DE LÍDER PARA EL SCHEDULER
+# =========================================================
+# Con varios workers (uvicorn/gunicorn --workers N) cada proceso arranca su scheduler.
+# Solo el que tenga el candado corre los jobs; los demás lo dejan en pausa y cada
+# LIDER_INTERVALO segundos intentan tomarlo. Si el líder muere, el candado se suelta
+# solo (Postgres cierra su conexión / el sistema operativo cierra su archivo) y otro
+# worker toma el relevo.
+#   - Postgres: pg_try_advisory_lock en una conexión dedicada y DIRECTA (LIDER_DATABASE_URL).
+#     Con un pooler en modo transacción (la URL "-pooler" de Neon, PgBouncer) el candado
+#     de sesión no queda atado a un cliente y varios workers podrían "ganarlo". Sin
+#     LIDER_DATABASE_URL se usa DATABASE_URL quitándole el "-pooler" al host (el endpoint
+#     directo de Neon); una LIDER_DATABASE_URL que apunte a un pooler se rechaza.
+#   - SQLite / local: candado de archivo (LIDER_LOCK_FILE).
+LIDER_LOCK_ID = int(os.getenv("LIDER_LOCK_ID", "720240601"))
+LIDER_DATABASE_URL = os.getenv("LIDER_DATABASE_URL", "")
+LIDER_LOCK_FILE = os.getenv("LIDER_LOCK_FILE", os.path.join(tempfile.gettempdir(), "natillera-scheduler.lock"))
+LIDER_INTERVALO = float(os.getenv("LIDER_INTERVALO", "15"))
+
+
+def _es_pooler(url) -> bool:
+    return "-pooler" in (url.host or "") or url.port == 6432   # 6432: puerto típico de PgBouncer
+
+
+def url_lider() -> str | None:
+    """URL directa para el candado del líder, o None si solo hay un pooler configurado."""
+    if LIDER_DATABASE_URL:
+        url = make_url(normalizar_url(LIDER_DATABASE_URL))
+        if _es_pooler(url):
+            print("[Lider][ERROR] LIDER_DATABASE_URL apunta a un pooler: ningún worker será líder")
+            return None
+        return url.render_as_string(hide_password=False)
+
+    url = make_url(DATABASE_URL)
+    if "-pooler" in (url.host or ""):
+        # Neon: el endpoint directo es el mismo host sin "-pooler"
+        url = url.set(host=url.host.replace("-pooler", "", 1))
+    if _es_pooler(url):
+        print("[Lider][ERROR] DATABASE_URL es un pooler: define LIDER_DATABASE_URL con una conexión directa")
+        return None
+    return url.render_as_string(hide_password=False)
+
+
+class _CandadoPostgres:
+    def __init__(self, url: str | None):
+        # Engine propio sin pool: la conexión del candado no sale ni vuelve al pool de la app
+        self.engine = create_engine(url, poolclass=NullPool, pool_pre_ping=True) if url else None
+        self.conexion = None
+
+    def tomar(self) -> bool:
+        if self.engine is None:
+            return False
+        try:
+            if self.conexion is None:
+                # AUTOCOMMIT: la conexión queda abierta sin una transacción colgando
+                self.conexion = self.engine.connect().execution_options(isolation_level="AUTOCOMMIT")
+            obtenido = bool(self.conexion.execute(text("SELECT pg_try_advisory_lock(:k)"), {"k": LIDER_LOCK_ID}).scalar())
+        except Exception as e:
+            print("[Lider][ERROR] No se pudo pedir el candado:", str(e))
+            obtenido = False
+        if not obtenido:
+            # Los seguidores no se quedan con una conexión del pool entre intentos
+            self._cerrar()
+        return obtenido
+
+    def sigue_vivo(self) -> bool:
+        # El candado tiene que seguir a nombre de esta sesión (si la conexión se cayó o
+        # se reconectó, Postgres ya lo soltó). Un bigint se guarda en pg_locks partido en
+        # classid (32 bits altos) y objid (32 bits bajos), con objsubid = 1.
+        try:
+            tomado = bool(self.conexion.execute(text(
+                "SELECT EXISTS (SELECT 1 FROM pg_locks WHERE locktype = 'advisory' AND granted"
+                " AND pid = pg_backend_pid() AND classid = CAST(:alto AS oid)"
+                " AND objid = CAST(:bajo AS oid) AND objsubid = 1)"
+            ), {"alto": LIDER_LOCK_ID >> 32, "bajo": LIDER_LOCK_ID & 0xFFFFFFFF}).scalar())
+        except Exception:
+            tomado = False
+        if not tomado:
+            self._cerrar()
+        return tomado
+
+    def soltar(self):
+        if self.conexion is not None:
+            try:
+                self.conexion.execute(text("SELECT pg_advisory_unlock(:k)"), {"k": LIDER_LOCK_ID})
+            except Exception:
+                pass
+        self._cerrar()
+        if self.engine is not None:
+            self.engine.dispose()
+
+    def _cerrar(self):
+        if self.conexion is not None:
+            try:
+                self.conexion.close()
+            except Exception:
+                pass
+            self.conexion = None
+
+
+class _CandadoArchivo:
+    def __init__(self, ruta: str):
+        self.ruta = ruta
+        self.archivo = None
+
+    def tomar(self) -> bool:
+        archivo = open(self.ruta, "a+")
+        try:
+            try:
+                import fcntl
+                fcntl.flock(archivo.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except ImportError:
+                # Windows
+                import msvcrt
+                archivo.seek(0)
+                msvcrt.locking(archivo.fileno(), msvcrt.LK_NBLCK, 1)
+        except OSError:
+            archivo.close()
+            return False
+        self.archivo = archivo
+        return True
+
+    def sigue_vivo(self) -> bool:
+        return self.archivo is not None
+
+    def soltar(self):
+        if self.archivo is not None:
+            self.archivo.close()  # cerrar el archivo suelta el candado
+            self.archivo = None
+
+
+class EleccionLider:
+    """
+    Hilo en segundo plano que intenta ser líder y avisa con al_ganar() / al_perder().
+    """
+
+    def __init__(self, al_ganar, al_perder):
+        self.al_ganar = al_ganar
+        self.al_perder = al_perder
+        self.es_lider = False
+        if engine.dialect.name == "postgresql":
+            self._candado = _CandadoPostgres(url_lider())
+        else:
+            self._candado = _CandadoArchivo(LIDER_LOCK_FILE)
+        self._parar = threading.Event()
+        self._hilo = threading.Thread(target=self._ciclo, name="eleccion-lider", daemon=True)
+
+    def iniciar(self):
+        self._hilo.start()
+
+    def detener(self):
+        self._parar.set()
+        self._hilo.join(timeout=LIDER_INTERVALO + 5)
+        if self.es_lider:
+            self._cambiar(False)
+        self._candado.soltar()
+
+    def _cambiar(self, lider: bool):
+        self.es_lider = lider
+        try:
+            (self.al_ganar if lider else self.al_perder)()
+        except Exception as e:
+            print("[Lider][ERROR]", str(e))
+
+    def _ciclo(self):
+        while not self._parar.is_set():
+            if self.es_lider:
+                if not self._candado.sigue_vivo():
+                    print("[Lider] Se perdió el candado, el scheduler queda en pausa")
+                    self._cambiar(False)
+            elif self._candado.tomar():
+                print(f"[Lider] Este proceso (pid {os.getpid()}) es el líder del scheduler")
+                self._cambiar(True)
+            self._parar.wait(LIDER_INTERVALO)
@@ -0,0 +1,173 @@
+# app/services/loteria_client.py
+import os
+import time
+import random
+import threading
+from datetime import date
+
+import requests
+from requests.adapters import HTTPAdapter
+
+# =========================================================
+# 🌐 CLIENTE HTTP DE LA API DE LOTERÍAS
+# =========================================================
+# Una sola sesión compartida (conexiones keep-alive), reintentos acotados con backoff
+# exponencial y jitter, y un circuit breaker: tras varios errores seguidos se deja de
+# llamar a la API por un rato y se falla de inmediato, en vez de bloquear hilos del
+# scheduler o de las tareas de fondo esperando timeouts.
+# LOTERIA_API_URL permite apuntar a un servidor de prueba (ver stub_api_loteria.py).
+API_EXTERNA = os.getenv("LOTERIA_API_URL", "https://api-resultadosloterias.com/api/results")
+
+CONNECT_TIMEOUT = float(os.getenv("LOTERIA_CONNECT_TIMEOUT", "3"))
+READ_TIMEOUT = float(os.getenv("LOTERIA_READ_TIMEOUT", "8"))
+MAX_INTENTOS = int(os.getenv("LOTERIA_MAX_INTENTOS", "3"))
+BACKOFF_BASE = float(os.getenv("LOTERIA_BACKOFF_BASE", "0.5"))   # segundos
+BACKOFF_MAX = float(os.getenv("LOTERIA_BACKOFF_MAX", "4"))
+BREAKER_UMBRAL = int(os.getenv("LOTERIA_BREAKER_UMBRAL", "5"))   # errores seguidos para abrir
+BREAKER_ESPERA = float(os.getenv("LOTERIA_BREAKER_ESPERA", "300"))  # segundos abierto
+
+# Respuestas que vale la pena reintentar: el proveedor está caído o saturado
+ESTADOS_REINTENTABLES = {429, 500, 502, 503, 504}
+
+
+class LoteriaNoDisponible(RuntimeError):
+    """La API no respondió bien tras los reintentos, o el circuit breaker está abierto."""
+
+
+class ClienteLoteria:
+    def __init__(self, base_url: str = API_EXTERNA):
+        self.base_url = base_url.rstrip("/")
+        self.session = requests.Session()
+        self.session.headers.update({"Accept": "application/json"})
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=int(os.getenv("LOTERIA_POOL_SIZE", "4")))
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+
+        self._lock = threading.Lock()
+        self._errores_seguidos = 0
+        self._abierto_hasta = 0.0
+        self._prueba_en_curso = False   # semiabierto: solo una llamada de prueba a la vez
+        self._metricas = {
+            "llamadas": 0,
+            "ok": 0,
+            "errores": 0,
+            "reintentos": 0,
+            "rechazadas_breaker": 0,
+            "latencia_total_s": 0.0,
+            "latencia_max_s": 0.0,
+            "ultimo_error": None,
+        }
+
+    # -------------------------
+    # Circuit breaker
+    # -------------------------
+    def _permitir(self) -> bool:
+        with self._lock:
+            if self._errores_seguidos < BREAKER_UMBRAL:
+                return True
+            if time.monotonic() < self._abierto_hasta or self._prueba_en_curso:
+                self._metricas["rechazadas_breaker"] += 1
+                return False
+            self._prueba_en_curso = True
+            return True
+
+    def _registrar(self, ok: bool, duracion: float, error: str | None = None):
+        with self._lock:
+            self._prueba_en_curso = False
+            m = self._metricas
+            m["llamadas"] += 1
+            m["latencia_total_s"] += duracion
+            m["latencia_max_s"] = max(m["latencia_max_s"], duracion)
+            if ok:
+                m["ok"] += 1
+                self._errores_seguidos = 0
+            else:
+                m["errores"] += 1
+                m["ultimo_error"] = error
+                self._errores_seguidos += 1
+                if self._errores_seguidos >= BREAKER_UMBRAL:
+                    self._abierto_hasta = time.monotonic() + BREAKER_ESPERA
+
+    def estado_breaker(self) -> str:
+        with self._lock:
+            if self._errores_seguidos < BREAKER_UMBRAL:
+                return "cerrado"
+            return "abierto" if time.monotonic() < self._abierto_hasta else "semiabierto"
+
+    # -------------------------
+    # Llamadas
+    # -------------------------
+    def get_json(self, path: str):
+        """
+        GET base_url/path con reintentos. Los 4xx (salvo 429) no se reintentan ni cuentan
+        como falla del proveedor: se lanzan tal cual (requests.HTTPError).
+        """
+        if not self._permitir():
+            raise LoteriaNoDisponible("API de loterías no disponible (circuit breaker abierto)")
+
+        url = f"{self.base_url}/{path.lstrip('/')}"
+        inicio = time.perf_counter()
+        ultimo_error = None
+
+        for intento in range(MAX_INTENTOS):
+            if intento > 0:
+                with self._lock:
+                    self._metricas["reintentos"] += 1
+                # Backoff exponencial con jitter completo
+                time.sleep(random.uniform(0, min(BACKOFF_MAX, BACKOFF_BASE * 2 ** intento)))
+
+            try:
+                r = self.session.get(url, timeout=(CONNECT_TIMEOUT, READ_TIMEOUT))
+            except requests.RequestException as e:
+                ultimo_error = f"{type(e).__name__}: {e}"
+                continue
+
+            if r.status_code in ESTADOS_REINTENTABLES:
+                ultimo_error = f"HTTP {r.status_code}"
+                continue
+
+            try:
+                r.raise_for_status()
+                datos = r.json()
+            except requests.HTTPError:
+                # El proveedor respondió: no es una caída
+                self._registrar(True, time.perf_counter() - inicio)
+                raise
+            except ValueError as e:
+                ultimo_error = f"JSON inválido: {e}"
+                continue
+
+            self._registrar(True, time.perf_counter() - inicio)
+            return datos
+
+        self._registrar(False, time.perf_counter() - inicio, ultimo_error)
+        raise LoteriaNoDisponible(f"API de loterías sin respuesta válida tras {MAX_INTENTOS} intentos ({ultimo_error})")
+
+    def resultados_del_dia(self, fecha: date) -> list:
+        # Lista de resultados de todas las loterías para esa fecha
+        res_json = self.get_json(fecha.isoformat())
+        data = res_json.get("data", []) if isinstance(res_json, dict) else res_json
+        if not isinstance(data, list):
+            raise RuntimeError("Respuesta inesperada de API externa")
+        return data
+
+    def metricas(self) -> dict:
+        with self._lock:
+            m = dict(self._metricas)
+        llamadas = m["llamadas"] or 1
+        return {
+            "base_url": self.base_url,
+            "breaker": self.estado_breaker(),
+            "llamadas": m["llamadas"],
+            "ok": m["ok"],
+            "errores": m["errores"],
+            "reintentos": m["reintentos"],
+            "rechazadas_breaker": m["rechazadas_breaker"],
+            "latencia_promedio_ms": round(m["latencia_total_s"] / llamadas * 1000, 2),
+            "latencia_max_ms": round(m["latencia_max_s"] * 1000, 2),
+            "ultimo_error": m["ultimo_error"],
+        }
+
+
+# Cliente compartido por todo el proceso
+cliente_loteria = ClienteLoteria()
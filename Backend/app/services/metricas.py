@@ -0,0 +1,323 @@
+# app/services/metricas.py
+import os
+import time
+import threading
+import contextvars
+from datetime import datetime
+
+from sqlalchemy import event
+from sqlalchemy.pool import QueuePool
+
+from app.services.registro_sql import observar_consulta
+
+# =========================================================
+# 📊 MÉTRICAS EN FORMATO PROMETHEUS
+# =========================================================
+# Registro en memoria (por proceso) de:
+#   - latencia por ruta (histograma), respuestas por ruta/estado, peticiones en curso
+#   - tiempo y cantidad de consultas SQL por petición (eventos del engine)
+#   - pool de conexiones: en uso, overflow y espera para obtener una conexión
+# Se expone en GET /metrics (ver app/main.py) junto con los jobs del scheduler (que
+# corren en otro proceso y dejan su estado en estado_jobs), el pool de argon2 y el
+# cliente de la API de loterías. Sin dependencias: el formato de texto es simple.
+# Acceso: solo desde la misma máquina, o con METRICS_TOKEN como Bearer token.
+METRICS_TOKEN = os.getenv("METRICS_TOKEN", "")
+HOSTS_LOCALES = {"127.0.0.1", "::1", "localhost"}
+
+BUCKETS_HTTP = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+BUCKETS_BD = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5)
+BUCKETS_POOL = (0.0001, 0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1, 5, 30)
+
+_lock = threading.Lock()
+
+
+def _escapar(valor) -> str:
+    return str(valor).replace("\\", "\\\\").replace('"', '\\"').replace("\n", " ")
+
+
+def _etiquetas(nombres: tuple, valores: tuple, extra: str = "") -> str:
+    partes = [f'{n}="{_escapar(v)}"' for n, v in zip(nombres, valores)]
+    if extra:
+        partes.append(extra)
+    return "{" + ",".join(partes) + "}" if partes else ""
+
+
+def _numero(valor) -> str:
+    return repr(float(valor)) if isinstance(valor, float) else str(valor)
+
+
+class Contador:
+    def __init__(self, nombre: str, ayuda: str, etiquetas: tuple = (), tipo: str = "counter"):
+        self.nombre, self.ayuda, self.etiquetas, self.tipo = nombre, ayuda, etiquetas, tipo
+        self.valores = {}
+
+    def sumar(self, *valores_etiquetas, n=1):
+        with _lock:
+            self.valores[valores_etiquetas] = self.valores.get(valores_etiquetas, 0) + n
+
+    def exponer(self) -> list:
+        with _lock:
+            valores = dict(self.valores)
+        lineas = [f"# HELP {self.nombre} {self.ayuda}", f"# TYPE {self.nombre} {self.tipo}"]
+        for etq, v in sorted(valores.items()):
+            lineas.append(f"{self.nombre}{_etiquetas(self.etiquetas, etq)} {_numero(v)}")
+        return lineas
+
+
+class Histograma:
+    def __init__(self, nombre: str, ayuda: str, buckets: tuple, etiquetas: tuple = ()):
+        self.nombre, self.ayuda, self.buckets, self.etiquetas = nombre, ayuda, buckets, etiquetas
+        self.series = {}   # etiquetas -> [conteo por bucket (no acumulado)..., +Inf], suma, total
+
+    def observar(self, valor: float, *valores_etiquetas):
+        with _lock:
+            serie = self.series.get(valores_etiquetas)
+            if serie is None:
+                serie = self.series[valores_etiquetas] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            i = 0
+            while i < len(self.buckets) and valor > self.buckets[i]:
+                i += 1
+            serie[0][i] += 1
+            serie[1] += valor
+            serie[2] += 1
+
+    def exponer(self) -> list:
+        with _lock:
+            series = {k: ([*v[0]], v[1], v[2]) for k, v in self.series.items()}
+        lineas = [f"# HELP {self.nombre} {self.ayuda}", f"# TYPE {self.nombre} histogram"]
+        for etq, (conteos, suma, total) in sorted(series.items()):
+            acumulado = 0
+            for limite, n in zip((*self.buckets, "+Inf"), conteos):
+                acumulado += n
+                le = 'le="' + (limite if limite == "+Inf" else _numero(float(limite))) + '"'
+                lineas.append(f"{self.nombre}_bucket{_etiquetas(self.etiquetas, etq, le)} {acumulado}")
+            lineas.append(f"{self.nombre}_sum{_etiquetas(self.etiquetas, etq)} {_numero(suma)}")
+            lineas.append(f"{self.nombre}_count{_etiquetas(self.etiquetas, etq)} {total}")
+        return lineas
+
+
+HTTP_DURACION = Histograma(
+    "natillera_http_request_duration_seconds", "Latencia de las peticiones por ruta",
+    BUCKETS_HTTP, ("method", "route"),
+)
+HTTP_PETICIONES = Contador(
+    "natillera_http_requests_total", "Respuestas por ruta y código de estado",
+    ("method", "route", "status"),
+)
+HTTP_EN_CURSO = Contador(
+    "natillera_http_requests_in_flight", "Peticiones en curso", tipo="gauge",
+)
+BD_POR_PETICION = Histograma(
+    "natillera_db_time_per_request_seconds", "Tiempo en consultas SQL por petición",
+    BUCKETS_BD, ("route",),
+)
+BD_CONSULTAS_RUTA = Contador(
+    "natillera_db_queries_by_route_total", "Consultas SQL hechas por las peticiones de cada ruta",
+    ("route",),
+)
+BD_CONSULTAS = Contador("natillera_db_queries_total", "Consultas SQL del proceso (peticiones y jobs)")
+BD_TIEMPO = Contador("natillera_db_query_seconds_total", "Tiempo total en consultas SQL del proceso")
+POOL_ESPERA = Histograma(
+    "natillera_db_pool_wait_seconds", "Tiempo para obtener una conexión del pool",
+    BUCKETS_POOL,
+)
+
+_REGISTRO = [
+    HTTP_DURACION, HTTP_PETICIONES, HTTP_EN_CURSO,
+    BD_POR_PETICION, BD_CONSULTAS_RUTA, BD_CONSULTAS, BD_TIEMPO, POOL_ESPERA,
+]
+
+
+# =========================================================
+# BASE DE DATOS
+# =========================================================
+class _MedicionBD:
+    __slots__ = ("consultas", "segundos")
+
+    def __init__(self):
+        self.consultas = 0
+        self.segundos = 0.0
+
+
+# Medición de la petición en curso. El threadpool de FastAPI copia el contexto, así que
+# las consultas de un endpoint sync suman sobre el mismo objeto.
+_medicion_actual: contextvars.ContextVar[_MedicionBD | None] = contextvars.ContextVar("medicion_bd", default=None)
+
+
+def _registrar_consulta(sql: str, segundos: float):
+    observar_consulta(sql, segundos)   # N+1 / consultas lentas (app/services/registro_sql.py)
+    BD_CONSULTAS.sumar()
+    BD_TIEMPO.sumar(n=segundos)
+    medicion = _medicion_actual.get()
+    if medicion is not None:
+        medicion.consultas += 1
+        medicion.segundos += segundos
+
+
+def instrumentar_engine(engine):
+    """Mide cada consulta del engine (sync; para uno async, pasar async_engine.sync_engine)."""
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def _antes(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault("metricas_inicio", []).append(time.perf_counter())
+
+    @event.listens_for(engine, "after_cursor_execute")
+    def _despues(conn, cursor, statement, parameters, context, executemany):
+        pila = conn.info.get("metricas_inicio")
+        if pila:
+            _registrar_consulta(statement, time.perf_counter() - pila.pop())
+
+    @event.listens_for(engine, "handle_error")
+    def _error(contexto):
+        pila = contexto.connection.info.get("metricas_inicio") if contexto.connection is not None else None
+        if pila:
+            _registrar_consulta(contexto.statement or "", time.perf_counter() - pila.pop())
+
+
+class QueuePoolMedido(QueuePool):
+    """QueuePool que mide cuánto se espera por una conexión (incluye abrir una nueva)."""
+
+    def _do_get(self):
+        inicio = time.perf_counter()
+        try:
+            return super()._do_get()
+        finally:
+            POOL_ESPERA.observar(time.perf_counter() - inicio)
+
+
+# =========================================================
+# MIDDLEWARE HTTP
+# =========================================================
+class MetricasMiddleware:
+    """
+    Middleware ASGI: la petición se mide hasta que sale el último byte de la respuesta
+    (no incluye las BackgroundTasks que corren después).
+    """
+
+    def __init__(self, app):
+        self.app = app
+        self._rutas = None   # endpoint -> plantilla de la ruta ("/api/dashboard/{usuario_id}")
+
+    def _ruta(self, scope) -> str:
+        # Plantilla y no la URL: una serie por ruta, no por socio
+        endpoint = scope.get("endpoint")
+        if endpoint is None:
+            return "sin_ruta"
+        if self._rutas is None:
+            self._rutas = {
+                getattr(r, "endpoint", None): r.path
+                for r in scope["app"].routes if hasattr(r, "path")
+            }
+        return self._rutas.get(endpoint, "sin_ruta")
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        inicio = time.perf_counter()
+        medicion = _MedicionBD()
+        token = _medicion_actual.set(medicion)
+        estado = {"status": 500, "terminado": False}
+        HTTP_EN_CURSO.sumar()
+
+        def terminar():
+            if estado["terminado"]:
+                return
+            estado["terminado"] = True
+            HTTP_EN_CURSO.sumar(n=-1)
+            ruta = self._ruta(scope)
+            HTTP_DURACION.observar(time.perf_counter() - inicio, scope["method"], ruta)
+            HTTP_PETICIONES.sumar(scope["method"], ruta, str(estado["status"]))
+            BD_POR_PETICION.observar(medicion.segundos, ruta)
+            if medicion.consultas:
+                BD_CONSULTAS_RUTA.sumar(ruta, n=medicion.consultas)
+
+        async def send_medido(mensaje):
+            if mensaje["type"] == "http.response.start":
+                estado["status"] = mensaje["status"]
+            await send(mensaje)
+            if mensaje["type"] == "http.response.body" and not mensaje.get("more_body", False):
+                terminar()
+
+        try:
+            await self.app(scope, receive, send_medido)
+        finally:
+            _medicion_actual.reset(token)
+            terminar()
+
+
+# =========================================================
+# EXPOSICIÓN
+# =========================================================
+def acceso_permitido(host: str | None, authorization: str | None) -> bool:
+    if METRICS_TOKEN and authorization == f"Bearer {METRICS_TOKEN}":
+        return True
+    return host in HOSTS_LOCALES
+
+
+def _pools(engines: dict) -> list:
+    lineas = []
+    for clave, ayuda, metodo in (
+        ("checked_out", "Conexiones del pool en uso", "checkedout"),
+        ("overflow", "Conexiones abiertas por encima de pool_size (negativo: aún no se llena)", "overflow"),
+        ("size", "Tamaño configurado del pool", "size"),
+    ):
+        nombre = f"natillera_db_pool_{clave}"
+        lineas += [f"# HELP {nombre} {ayuda}", f"# TYPE {nombre} gauge"]
+        for motor, eng in engines.items():
+            fn = getattr(eng.pool, metodo, None)
+            if fn is not None:
+                lineas.append(f'{nombre}{{engine="{motor}"}} {fn()}')
+    return lineas
+
+
+_METRICAS_JOBS = [
+    ("natillera_job_last_run_timestamp_seconds", "Inicio de la última ejecución (epoch)", "gauge",
+     lambda d: datetime.fromisoformat(d["ultima_ejecucion"]).timestamp() if d.get("ultima_ejecucion") else None),
+    ("natillera_job_last_duration_seconds", "Duración de la última ejecución", "gauge",
+     lambda d: float(d.get("duracion_s", 0.0))),
+    ("natillera_job_last_success", "1 si la última ejecución terminó bien", "gauge",
+     lambda d: int(d.get("resultado") == "ok")),
+    ("natillera_job_runs_total", "Ejecuciones", "counter", lambda d: d.get("ejecuciones", 0)),
+    ("natillera_job_errors_total", "Ejecuciones con error", "counter", lambda d: d.get("errores", 0)),
+    ("natillera_job_missed_total", "Ejecuciones perdidas (misfire)", "counter", lambda d: d.get("perdidas", 0)),
+]
+
+
+def _jobs(estados: dict) -> list:
+    # estados: {job_id: datos guardados por el listener del scheduler (ver app/scheduler.py)}
+    lineas = []
+    for nombre, ayuda, tipo, valor in _METRICAS_JOBS:
+        lineas += [f"# HELP {nombre} {ayuda}", f"# TYPE {nombre} {tipo}"]
+        for job, datos in sorted(estados.items()):
+            v = valor(datos)
+            if v is not None:
+                lineas.append(f"{nombre}{_etiquetas(('job',), (job,))} {_numero(v)}")
+    return lineas
+
+
+def _dict_como_gauges(prefijo: str, datos: dict) -> list:
+    # Métricas que ya llevaban los módulos como dict (pool de argon2, cliente de loterías)
+    lineas = []
+    for clave, valor in datos.items():
+        if isinstance(valor, bool) or not isinstance(valor, (int, float)):
+            continue
+        nombre = f"{prefijo}_{clave}"
+        lineas += [f"# TYPE {nombre} gauge", f"{nombre} {_numero(valor)}"]
+    return lineas
+
+
+def texto_prometheus(engines: dict, estados_jobs: dict, otros: dict) -> str:
+    """
+    engines: {"sync": engine, ...}; estados_jobs: {job_id: datos};
+    otros: {"natillera_hash": metricas_hash(), ...}
+    """
+    lineas = []
+    for metrica in _REGISTRO:
+        lineas += metrica.exponer()
+    lineas += _pools(engines)
+    lineas += _jobs(estados_jobs)
+    for prefijo, datos in otros.items():
+        lineas += _dict_como_gauges(prefijo, datos)
+    return "\n".join(lineas) + "\n"
@@ -0,0 +1,79 @@
+# app/services/paginacion.py
+import base64
+import json
+from datetime import datetime
+
+from fastapi import HTTPException
+from sqlalchemy import DateTime, Integer, String, tuple_
+
+# =========================================================
+# 📄 PAGINACIÓN POR CURSOR (KEYSET)
+# =========================================================
+# En vez de OFFSET (que recorre y descarta todas las filas anteriores) cada página
+# arranca justo después de la última fila de la anterior: WHERE (fecha, id) < (:f, :i).
+# Con un índice sobre esas columnas cada página cuesta lo mismo, sin importar qué tan
+# atrás se esté. El id desempata filas con el mismo valor, así el orden es estable.
+# El cursor es opaco para el cliente: base64 de los valores de la última fila.
+# Las columnas de orden no deben ser NULL (fecha, nombre y date siempre se llenan).
+LIMITE_MAX = 500
+
+
+def codificar_cursor(valores: list) -> str:
+    crudo = json.dumps([v.isoformat() if isinstance(v, datetime) else v for v in valores])
+    return base64.urlsafe_b64encode(crudo.encode("utf-8")).decode("ascii").rstrip("=")
+
+
+def _valor_cursor(columna, valor):
+    # El cursor viene del cliente: cada valor debe ser del tipo de su columna, si no
+    # Postgres compararía p. ej. integer > varchar y respondería 500 en vez de 400
+    if isinstance(columna.type, DateTime):
+        if not isinstance(valor, str):
+            raise TypeError(columna.key)
+        return datetime.fromisoformat(valor)
+    if isinstance(columna.type, Integer):
+        if not isinstance(valor, int) or isinstance(valor, bool):
+            raise TypeError(columna.key)
+        return valor
+    if isinstance(columna.type, String):
+        if not isinstance(valor, str):
+            raise TypeError(columna.key)
+        return valor
+    raise TypeError(f"tipo de columna sin soporte en cursores: {columna.type}")
+
+
+def decodificar_cursor(cursor: str, columnas: tuple) -> list:
+    try:
+        relleno = "=" * (-len(cursor) % 4)
+        valores = json.loads(base64.urlsafe_b64decode(cursor + relleno))
+        if not isinstance(valores, list) or len(valores) != len(columnas):
+            raise ValueError("cantidad de valores")
+        return [_valor_cursor(col, v) for col, v in zip(columnas, valores)]
+    except (ValueError, TypeError):
+        raise HTTPException(status_code=400, detail="Cursor inválido")
+
+
+def paginar(query, columnas: tuple, cursor: str | None, limit: int, descendente: bool = True):
+    """
+    Aplica el cursor y el orden (todas las columnas en la misma dirección) a la consulta.
+    Devuelve (filas, next_cursor, has_more). `columnas` deben ser atributos del modelo
+    que devuelve la consulta.
+    """
+    limit = max(1, min(limit, LIMITE_MAX))
+
+    if cursor:
+        clave = tuple_(*columnas)
+        ultimo = tuple_(*decodificar_cursor(cursor, columnas))
+        query = query.filter(clave < ultimo if descendente else clave > ultimo)
+
+    orden = [c.desc() if descendente else c.asc() for c in columnas]
+    # Una fila de más para saber si hay otra página sin hacer un COUNT
+    filas = query.order_by(*orden).limit(limit + 1).all()
+
+    has_more = len(filas) > limit
+    filas = filas[:limit]
+    next_cursor = codificar_cursor([getattr(filas[-1], c.key) for c in columnas]) if has_more else None
+    return filas, next_cursor, has_more
+
+
+def pagina(items: list, next_cursor: str | None, has_more: bool) -> dict:
+    return {"items": items, "next_cursor": next_cursor, "has_more": has_more}
@@ -0,0 +1,200 @@
+# app/services/perfilador.py
+import os
+import io
+import json
+import time
+import uuid
+import random
+import pstats
+import asyncio
+import cProfile
+import tempfile
+import functools
+import threading
+import contextvars
+from datetime import datetime
+from urllib.parse import parse_qs
+
+from fastapi.routing import APIRoute
+from starlette.concurrency import run_in_threadpool
+
+from app.security.security import es_admin
+from app.services.registro_sql import grabar_consultas
+
+# =========================================================
+# 🔬 PERFILADOR POR PETICIÓN (OPT-IN)
+# =========================================================
+# Con PERFILADOR=1 se puede perfilar (cProfile) una petición puntual:
+#   - a pedido: header "X-Perfilar: 1" o "?perfilar=1", solo con token de admin
+#   - por muestreo: PERFIL_MUESTREO=0.01 perfila ~1% de las peticiones
+# Cada perfil queda en PERFIL_DIR como <id>.prof (pstats: snakeviz, `python -m pstats`)
+# y <id>.json (ruta, estado, duración, consultas SQL y el top de funciones), y se
+# descarga desde /api/admin/perfiles. Sin PERFILADOR=1 no se instala nada: cero costo.
+#
+# cProfile mide un hilo: se activa dentro de la función del endpoint (ver
+# envolver_endpoints), que en los endpoints sync corre en un hilo del threadpool.
+# En los `async def` el perfil puede incluir trabajo de otras peticiones del mismo
+# event loop. Solo se perfila una petición a la vez; las demás siguen normal.
+PERFILADOR = os.getenv("PERFILADOR", "0").lower() in ("1", "true", "si")
+PERFIL_MUESTREO = float(os.getenv("PERFIL_MUESTREO", "0"))
+PERFIL_DIR = os.getenv("PERFIL_DIR", os.path.join(tempfile.gettempdir(), "natillera-perfiles"))
+PERFIL_MAX = int(os.getenv("PERFIL_MAX", "50"))   # se borran los más viejos
+PERFIL_TOP = 30                                   # funciones en el resumen de texto
+
+HEADER_PERFILAR = b"x-perfilar"
+RUTA_PERFILES = "/api/admin/perfiles"
+
+_en_curso = threading.Lock()
+_perfil_actual: contextvars.ContextVar[cProfile.Profile | None] = contextvars.ContextVar("perfil", default=None)
+
+
+def _motivo(scope) -> str | None:
+    """Por qué perfilar esta petición ("admin" / "muestreo"), o None."""
+    if scope["path"].startswith(RUTA_PERFILES):
+        return None
+    headers = dict(scope["headers"])
+    pedido = headers.get(HEADER_PERFILAR, b"").decode() in ("1", "true", "si")
+    if not pedido and b"perfilar" in scope.get("query_string", b""):
+        pedido = parse_qs(scope["query_string"].decode()).get("perfilar", [""])[0] in ("1", "true", "si")
+    if pedido and es_admin(headers.get(b"authorization", b"").decode()):
+        return "admin"
+    if PERFIL_MUESTREO and random.random() < PERFIL_MUESTREO:
+        return "muestreo"
+    return None
+
+
+def _resumen_texto(perfil: cProfile.Profile) -> str:
+    salida = io.StringIO()
+    pstats.Stats(perfil, stream=salida).strip_dirs().sort_stats("cumulative").print_stats(PERFIL_TOP)
+    return salida.getvalue()
+
+
+def _guardar(perfil: cProfile.Profile, datos: dict):
+    os.makedirs(PERFIL_DIR, exist_ok=True)
+    perfil.dump_stats(os.path.join(PERFIL_DIR, f"{datos['id']}.prof"))
+    datos["resumen"] = _resumen_texto(perfil)
+    with open(os.path.join(PERFIL_DIR, f"{datos['id']}.json"), "w", encoding="utf-8") as f:
+        json.dump(datos, f, ensure_ascii=False, indent=2)
+
+    # Rotación: solo los PERFIL_MAX más recientes (el id empieza por la fecha)
+    ids = sorted(n[:-5] for n in os.listdir(PERFIL_DIR) if n.endswith(".json"))
+    for viejo in ids[:-PERFIL_MAX] if len(ids) > PERFIL_MAX else []:
+        for ext in (".json", ".prof"):
+            try:
+                os.remove(os.path.join(PERFIL_DIR, viejo + ext))
+            except FileNotFoundError:
+                pass
+
+
+class PerfiladorMiddleware:
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        motivo = _motivo(scope)
+        if motivo is None or not _en_curso.acquire(blocking=False):
+            await self.app(scope, receive, send)
+            return
+
+        perfil = cProfile.Profile()
+        estado = {"status": 500}
+
+        async def send_con_estado(mensaje):
+            if mensaje["type"] == "http.response.start":
+                estado["status"] = mensaje["status"]
+            await send(mensaje)
+
+        inicio = time.perf_counter()
+        token = _perfil_actual.set(perfil)
+        try:
+            with grabar_consultas() as grabacion:
+                await self.app(scope, receive, send_con_estado)
+        finally:
+            _perfil_actual.reset(token)
+            duracion = time.perf_counter() - inicio
+            _en_curso.release()
+
+        ahora = datetime.now()
+        datos = {
+            "id": f"{ahora:%Y%m%d-%H%M%S-%f}-{uuid.uuid4().hex[:4]}",
+            "fecha": ahora.isoformat(timespec="seconds"),
+            "motivo": motivo,
+            "metodo": scope["method"],
+            "ruta": scope["path"],
+            "query": scope.get("query_string", b"").decode(),
+            "status": estado["status"],
+            "duracion_ms": round(duracion * 1000, 2),
+            "bd": {
+                "consultas": grabacion.total,
+                "ms": round(grabacion.segundos * 1000, 2),
+                "sentencias": [
+                    {"veces": s[0], "ms": round(s[1] * 1000, 2), "max_ms": round(s[2] * 1000, 2), "sql": h}
+                    for h, s in sorted(grabacion.sentencias.items(), key=lambda kv: kv[1][1], reverse=True)[:20]
+                ],
+            },
+        }
+        try:
+            await run_in_threadpool(_guardar, perfil, datos)
+            print(f"[Perfil] {datos['metodo']} {datos['ruta']} -> {datos['id']} ({datos['duracion_ms']} ms)")
+        except Exception as e:
+            print("[Perfil][ERROR] No se pudo guardar el perfil:", str(e))
+
+
+def _envolver(call):
+    # Mismo tipo (sync/async) que el original: FastAPI decide cómo llamarlo según eso
+    if asyncio.iscoroutinefunction(call):
+        @functools.wraps(call)
+        async def envuelta(*args, **kwargs):
+            perfil = _perfil_actual.get()
+            if perfil is None:
+                return await call(*args, **kwargs)
+            perfil.enable()
+            try:
+                return await call(*args, **kwargs)
+            finally:
+                perfil.disable()
+    else:
+        @functools.wraps(call)
+        def envuelta(*args, **kwargs):
+            perfil = _perfil_actual.get()
+            if perfil is None:
+                return call(*args, **kwargs)
+            perfil.enable()
+            try:
+                return call(*args, **kwargs)
+            finally:
+                perfil.disable()
+    return envuelta
+
+
+def envolver_endpoints(app):
+    """Hace que cada endpoint active el perfil de su petición, en el hilo donde corre."""
+    for ruta in app.routes:
+        if isinstance(ruta, APIRoute):
+            ruta.dependant.call = _envolver(ruta.dependant.call)
+
+
+def listar_perfiles() -> list:
+    if not os.path.isdir(PERFIL_DIR):
+        return []
+    perfiles = []
+    for nombre in sorted(os.listdir(PERFIL_DIR), reverse=True):
+        if nombre.endswith(".json"):
+            with open(os.path.join(PERFIL_DIR, nombre), encoding="utf-8") as f:
+                datos = json.load(f)
+            datos.pop("resumen", None)
+            datos["bd"].pop("sentencias", None)
+            perfiles.append(datos)
+    return perfiles
+
+
+def ruta_perfil(perfil_id: str, extension: str) -> str | None:
+    # El id viene de la URL: solo se aceptan ids con el formato que genera _guardar
+    if not perfil_id.replace("-", "").isalnum():
+        return None
+    ruta = os.path.join(PERFIL_DIR, perfil_id + extension)
+    return ruta if os.path.isfile(ruta) else None
@@ -0,0 +1,37 @@
+# app/services/periodos.py
+import re
+
+MESES_ES = [
+    "Enero", "Febrero", "Marzo", "Abril", "Mayo", "Junio",
+    "Julio", "Agosto", "Septiembre", "Octubre", "Noviembre", "Diciembre"
+]
+
+
+def parse_mes_desde_descripcion(desc: str):
+    m = re.search(
+        r"(?:^|\(|\s)(Enero|Febrero|Marzo|Abril|Mayo|Junio|Julio|Agosto|Septiembre|Octubre|Noviembre|Diciembre)\s+(\d{4})(?:\)|\s|$)",
+        desc or "",
+        re.I
+    )
+    if not m:
+        return None
+
+    mes_nombre = m.group(1)
+    year = int(m.group(2))
+    mes_index = next((i for i, x in enumerate(MESES_ES) if x.lower() == mes_nombre.lower()), -1)
+
+    if mes_index < 0:
+        return None
+
+    return (mes_index, year)
+
+
+def mes_numero(mes_nombre: str):
+    # "Marzo" -> 3 (None si no es un mes válido)
+    nombre = str(mes_nombre or "").strip().lower()
+    return next((i + 1 for i, x in enumerate(MESES_ES) if x.lower() == nombre), None)
+
+
+def texto_mes(anio: int, mes: int) -> str:
+    # (2026, 3) -> "Marzo 2026"
+    return f"{MESES_ES[mes - 1]} {anio}"
@@ -0,0 +1,127 @@
+# app/services/polla_agenda.py
+import os
+from datetime import date, datetime, timedelta
+from zoneinfo import ZoneInfo
+
+from apscheduler.triggers.date import DateTrigger
+
+from app.database import SessionLocal
+from app.services.estado_jobs import leer_estado_job, guardar_estado_job
+from app.services.polla_scheduler import last_friday_of_month, get_most_recent_last_friday
+from app.services.polla_sync import sync_polla_coordinado
+
+# =========================================================
+# 📅 AGENDA DEL JOB DE LA POLLA
+# =========================================================
+# Solo hay resultado nuevo después del último viernes de cada mes. En vez de correr
+# todos los días, el job se reprograma a sí mismo (DateTrigger):
+#   - sorteo del mes ya guardado -> duerme hasta la noche del siguiente último viernes
+#   - sorteo pendiente           -> reintenta con backoff (POLLA_REINTENTO_MIN, doblando
+#                                   hasta POLLA_REINTENTO_MAX_MIN) hasta que aparezca
+# El estado queda en estado_jobs: al reiniciar se respeta la próxima ejecución guardada
+# y no hay ráfaga de llamadas para "ponerse al día".
+ZONA = ZoneInfo("America/Bogota")
+JOB_ID = "sync_polla_agenda"
+ESTADO_NOMBRE = "polla_agenda"
+
+HORA_SORTEO = os.getenv("POLLA_HORA_SORTEO", "23:00")           # hora local del sorteo
+REINTENTO_MIN = int(os.getenv("POLLA_REINTENTO_MIN", "30"))     # minutos
+REINTENTO_MAX_MIN = int(os.getenv("POLLA_REINTENTO_MAX_MIN", "360"))
+REPROGRAMAR_SI_FALLA_MIN = 30
+
+
+def noche_sorteo(sorteo: date) -> datetime:
+    hora, minuto = (int(x) for x in HORA_SORTEO.split(":"))
+    return datetime(sorteo.year, sorteo.month, sorteo.day, hora, minuto, tzinfo=ZONA)
+
+
+def siguiente_sorteo(sorteo: date) -> date:
+    anio, mes = (sorteo.year + 1, 1) if sorteo.month == 12 else (sorteo.year, sorteo.month + 1)
+    return last_friday_of_month(anio, mes)
+
+
+def calcular_proxima(estado: dict, ahora: datetime) -> datetime:
+    """Cuándo debe correr el job de nuevo, según el estado guardado."""
+    sorteo = get_most_recent_last_friday(ahora.date())
+    noche = noche_sorteo(sorteo)
+
+    # Es el día del sorteo pero aún no se juega
+    if ahora < noche:
+        return noche
+
+    # Ya se tiene el resultado: hasta la noche del próximo sorteo no hay nada que hacer
+    if estado.get("sorteo_ok") == sorteo.isoformat():
+        return noche_sorteo(siguiente_sorteo(sorteo))
+
+    # Pendiente: backoff según los intentos sobre este mismo sorteo
+    intentos = estado.get("intentos", 0) if estado.get("sorteo") == sorteo.isoformat() else 0
+    if intentos == 0 or not estado.get("ultimo_intento"):
+        return ahora
+    espera = min(REINTENTO_MIN * 2 ** (intentos - 1), REINTENTO_MAX_MIN)
+    return max(ahora, datetime.fromisoformat(estado["ultimo_intento"]) + timedelta(minutes=espera))
+
+
+def _programar(scheduler, cuando: datetime):
+    scheduler.add_job(
+        job_agenda_polla,
+        DateTrigger(run_date=cuando),
+        args=[scheduler],
+        id=JOB_ID,
+        replace_existing=True,
+    )
+
+
+def job_agenda_polla(scheduler):
+    ahora = datetime.now(ZONA)
+    proxima = ahora + timedelta(minutes=REPROGRAMAR_SI_FALLA_MIN)
+
+    db = SessionLocal()
+    try:
+        estado = leer_estado_job(db, ESTADO_NOMBRE)
+        sorteo = get_most_recent_last_friday(ahora.date()).isoformat()
+
+        if calcular_proxima(estado, ahora) <= ahora:
+            r = sync_polla_coordinado(forzar=True)
+            print("[PollaAgenda]", r)
+
+            if estado.get("sorteo") != sorteo:
+                estado["sorteo"] = sorteo
+                estado["intentos"] = 0
+            if r.get("ran"):
+                estado["sorteo_ok"] = sorteo
+                estado["intentos"] = 0
+            else:
+                estado["intentos"] = estado.get("intentos", 0) + 1
+            estado["ultimo_intento"] = ahora.isoformat()
+            estado["ultimo_mensaje"] = r.get("mensaje")
+
+        proxima = calcular_proxima(estado, datetime.now(ZONA))
+        estado["proxima"] = proxima.isoformat()
+        guardar_estado_job(db, ESTADO_NOMBRE, estado)
+        db.commit()
+    except Exception as e:
+        db.rollback()
+        print("[PollaAgenda][ERROR]", str(e))
+    finally:
+        db.close()
+        _programar(scheduler, proxima)
+
+
+def programar_agenda_polla(scheduler):
+    """
+    Al arrancar: programa el job en la próxima ejecución guardada (o ya mismo, si
+    quedó en el pasado mientras el servidor estaba apagado).
+    """
+    ahora = datetime.now(ZONA)
+    db = SessionLocal()
+    try:
+        estado = leer_estado_job(db, ESTADO_NOMBRE)
+    except Exception as e:
+        print("[PollaAgenda][ERROR] No se pudo leer el estado:", str(e))
+        estado = {}
+    finally:
+        db.close()
+
+    proxima = datetime.fromisoformat(estado["proxima"]) if estado.get("proxima") else calcular_proxima(estado, ahora)
+    _programar(scheduler, max(proxima, ahora))
+    print(f"[PollaAgenda] Próxima sincronización: {max(proxima, ahora).isoformat()}")
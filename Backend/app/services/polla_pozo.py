@@ -0,0 +1,159 @@
+# app/services/polla_pozo.py
+import os
+from datetime import datetime
+from sqlalchemy import func, or_, and_
+from sqlalchemy.orm import Session
+
+from app.models.models import Movimiento, PozoPolla, ResultadoLoteria, Usuario
+
+# La polla empezó a llevarse en Enero 2026: antes de eso no hay pozo
+POLLA_INICIO = (2026, 1)
+
+# Lotería cuyo número gana la polla (slug de la API de resultados)
+POLLA_SLUG = os.getenv("POLLA_SLUG", "medellin")
+
+def _periodo(anio: int, mes: int) -> int:
+    # (anio, mes 1-12) -> entero consecutivo para comparar y recorrer meses
+    return anio * 12 + (mes - 1)
+
+
+def _desde_periodo(periodo: int) -> tuple[int, int]:
+    return periodo // 12, periodo % 12 + 1
+
+
+def _inicio_mes(periodo: int) -> datetime:
+    anio, mes = _desde_periodo(periodo)
+    return datetime(anio, mes, 1)
+
+
+def _recaudado_por_periodo(db: Session, desde: int, fin: int) -> dict:
+    # Suma de pagos de polla por mes en [desde, fin], en una sola consulta agrupada
+    anio_desde, mes_desde = _desde_periodo(desde)
+    anio_fin, _ = _desde_periodo(fin)
+    filas = (
+        db.query(Movimiento.periodo_anio, Movimiento.periodo_mes, func.sum(Movimiento.monto))
+        .filter(
+            Movimiento.tipo == "Pago Polla",
+            Movimiento.periodo_anio <= anio_fin,
+            or_(
+                Movimiento.periodo_anio > anio_desde,
+                and_(Movimiento.periodo_anio == anio_desde, Movimiento.periodo_mes >= mes_desde),
+            ),
+        )
+        .group_by(Movimiento.periodo_anio, Movimiento.periodo_mes)
+        .all()
+    )
+    return {_periodo(anio, mes): int(total or 0) for anio, mes, total in filas}
+
+
+def recalcular_pozo_polla(db: Session, desde_anio: int | None = None, desde_mes: int | None = None) -> float:
+    """
+    Recalcula el libro del pozo desde (desde_anio, desde_mes) hasta el mes actual,
+    partiendo del acumulado guardado del mes anterior. Sin argumentos rehace todo
+    el libro desde POLLA_INICIO (útil tras borrar un socio o resetearlo).
+    No hace commit: lo hace quien llama, junto con el cambio que originó el recálculo.
+    """
+    db.flush()  # los pagos recién agregados deben contar en las sumas
+
+    hoy = datetime.now()
+    inicio = _periodo(*POLLA_INICIO)
+    fin = _periodo(hoy.year, hoy.month)
+
+    desde = inicio if desde_anio is None else max(inicio, _periodo(desde_anio, desde_mes or 1))
+    if desde > fin:
+        # Pago adelantado de un mes futuro: cuenta cuando llegue ese mes
+        actual = db.query(PozoPolla).filter(PozoPolla.anio == hoy.year, PozoPolla.mes == hoy.month).first()
+        return float(actual.acumulado or 0) if actual else 0.0
+
+    acumulado = 0.0
+    if desde > inicio:
+        previo_anio, previo_mes = _desde_periodo(desde - 1)
+        previo = (
+            db.query(PozoPolla)
+            .filter(or_(
+                PozoPolla.anio < previo_anio,
+                and_(PozoPolla.anio == previo_anio, PozoPolla.mes <= previo_mes),
+            ))
+            .order_by(PozoPolla.anio.desc(), PozoPolla.mes.desc())
+            .first()
+        )
+        if previo is None:
+            desde = inicio
+        else:
+            # Si hay meses sin fila entre el último guardado y 'desde', se rellenan también
+            desde = _periodo(previo.anio, previo.mes) + 1
+            acumulado = float(previo.acumulado or 0)
+
+    resultados = (
+        db.query(ResultadoLoteria)
+        .filter(
+            ResultadoLoteria.slug == POLLA_SLUG,
+            ResultadoLoteria.date >= _inicio_mes(desde),
+            ResultadoLoteria.date < _inicio_mes(fin + 1),
+        )
+        .all()
+    )
+    res_por_periodo = {_periodo(r.date.year, r.date.month): r for r in resultados}
+
+    # Solo hace falta cargar números de polla si hubo sorteo en el rango
+    usuarios = db.query(Usuario.id, Usuario.polla).filter(Usuario.polla != None).all() if resultados else []
+
+    anio_desde, mes_desde = _desde_periodo(desde)
+    filas = {
+        _periodo(f.anio, f.mes): f
+        for f in db.query(PozoPolla).filter(or_(
+            PozoPolla.anio > anio_desde,
+            and_(PozoPolla.anio == anio_desde, PozoPolla.mes >= mes_desde),
+        )).all()
+    }
+
+    recaudado_por_periodo = _recaudado_por_periodo(db, desde, fin)
+
+    for periodo in range(desde, fin + 1):
+        anio, mes = _desde_periodo(periodo)
+        recaudado = recaudado_por_periodo.get(periodo, 0)
+        acumulado += recaudado
+
+        resultado_2 = None
+        ganador_id = None
+        draw = res_por_periodo.get(periodo)
+        if draw and draw.result:
+            resultado_2 = str(draw.result)[-2:].zfill(2)
+            ganador_id = next(
+                (u_id for u_id, polla in usuarios if str(polla)[-2:].zfill(2) == resultado_2),
+                None
+            )
+
+        # Si alguien ganó, se lleva el acumulado de ese momento y se reinicia
+        if ganador_id is not None:
+            acumulado = 0.0
+
+        fila = filas.get(periodo)
+        if fila is None:
+            fila = PozoPolla(anio=anio, mes=mes)
+            db.add(fila)
+        fila.recaudado = recaudado
+        fila.acumulado = acumulado
+        fila.resultado_2 = resultado_2
+        fila.ganador_usuario_id = ganador_id
+        fila.reiniciado = ganador_id is not None
+        fila.actualizado = datetime.now()
+
+    return acumulado if acumulado >= 0 else 0.0
+
+
+def obtener_pozo_actual(db: Session) -> float:
+    """
+    Lee el pozo del mes actual del libro. Si el mes cambió y aún no tiene fila,
+    la completa a partir del último mes guardado (una sola vez por mes).
+    No hace commit: lo hace quien llama.
+    """
+    hoy = datetime.now()
+    if _periodo(hoy.year, hoy.month) < _periodo(*POLLA_INICIO):
+        return 0.0
+
+    fila = db.query(PozoPolla).filter(PozoPolla.anio == hoy.year, PozoPolla.mes == hoy.month).first()
+    if fila:
+        return max(0.0, float(fila.acumulado or 0))
+
+    return recalcular_pozo_polla(db, hoy.year, hoy.month)
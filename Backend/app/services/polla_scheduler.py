@@ -1,11 +1,12 @@
 # app/services/polla_scheduler.py
-from datetime import date, datetime, timedelta
-import requests
+from datetime import date, datetime, time, timedelta
 from sqlalchemy.orm import Session
 
 from app.models.models import ResultadoLoteria
-
-API_EXTERNA = "https://api-resultadosloterias.com/api/results"
+from app.services.polla_pozo import recalcular_pozo_polla, POLLA_SLUG
+from app.services.dashboard_service import refrescar_estadisticas_globales
+from app.services.resultados_cache import invalidar_resultados
+from app.services.loteria_client import cliente_loteria
 
 
 def last_friday_of_month(year: int, month: int) -> date:
@@ -36,43 +37,88 @@ def get_most_recent_last_friday(today: date) -> date:
 
 
 
-def fetch_medellin_result(draw_date: date) -> dict:
-    url = f"{API_EXTERNA}/{draw_date.isoformat()}"
-    r = requests.get(url, timeout=20)
-    r.raise_for_status()
+def _fila_resultado(item: dict, draw_date: date) -> dict | None:
+    # Normaliza una entrada de la API a columnas de ResultadoLoteria (None si viene incompleta)
+    lottery = str(item.get("lottery") or "").strip()
+    slug = str(item.get("slug") or lottery.lower().replace(" ", "-")).strip()
+    result = str(item.get("result") or "").strip()
+    if not slug or not result:
+        return None
+    return {
+        "slug": slug,
+        "lottery": lottery or slug.upper(),
+        "date": datetime.combine(draw_date, time.min),
+        "result": result,
+        "series": str(item.get("series")) if item.get("series") is not None else None,
+        "fetched_at": datetime.now(),
+    }
 
-    res_json = r.json()
-    if isinstance(res_json, dict):
-        data = res_json.get("data", [])
-    else:
-        data = res_json
 
-    if not isinstance(data, list):
-        raise RuntimeError("Respuesta inesperada de API externa")
+def fetch_resultados_dia(draw_date: date) -> list[dict]:
+    """Una sola llamada a la API: los resultados de todas las loterías de esa fecha."""
+    # Cliente compartido: keep-alive, reintentos con backoff y circuit breaker
+    data = cliente_loteria.resultados_del_dia(draw_date)
+    filas = {}
+    for item in data:
+        fila = _fila_resultado(item, draw_date) if isinstance(item, dict) else None
+        if fila:
+            filas[fila["slug"]] = fila  # un slug repetido no puede ir dos veces en el mismo upsert
+    return list(filas.values())
+
+
+def guardar_resultados(db: Session, filas: list[dict]) -> int:
+    """
+    Inserta o actualiza (por uq_slug_date) todas las filas en una sola sentencia.
+    No hace commit. Devuelve cuántas filas se enviaron.
+    """
+    if not filas:
+        return 0
+
+    dialecto = db.get_bind().dialect.name
+    if dialecto == "postgresql":
+        from sqlalchemy.dialects.postgresql import insert
+    elif dialecto == "sqlite":
+        from sqlalchemy.dialects.sqlite import insert
+    else:
+        raise RuntimeError(f"Upsert de resultados no soportado para {dialecto}")
+
+    stmt = insert(ResultadoLoteria).values(filas)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[ResultadoLoteria.slug, ResultadoLoteria.date],
+        set_={
+            "lottery": stmt.excluded.lottery,
+            "result": stmt.excluded.result,
+            "series": stmt.excluded.series,
+            "fetched_at": stmt.excluded.fetched_at,
+        },
+    )
+    db.execute(stmt)
+    return len(filas)
 
-    med = next((x for x in data if x.get("slug") == "medellin" or x.get("lottery") == "MEDELLIN"), None)
-    if not med:
-        raise RuntimeError(f"No hay resultado MEDELLIN para {draw_date.isoformat()}")
 
-    return {
-        "lottery": med.get("lottery") or "MEDELLIN",
-        "slug": med.get("slug") or "medellin",
-        "date": med.get("date"),
-        "result": str(med.get("result") or ""),
-        "series": str(med.get("series") or "") if med.get("series") is not None else None,
-    }
+def fetch_medellin_result(draw_date: date) -> dict:
+    # Resultado de la lotería de la polla (POLLA_SLUG) para esa fecha, sin guardarlo
+    propio = next((f for f in fetch_resultados_dia(draw_date) if f["slug"] == POLLA_SLUG), None)
+    if not propio:
+        raise RuntimeError(f"No hay resultado {POLLA_SLUG} para {draw_date.isoformat()}")
+    return propio
 
 
 
 def sync_medellin_if_last_friday(db: Session) -> dict:
+    """
+    Sincroniza el sorteo del último viernes para la lotería de la polla (POLLA_SLUG).
+    De paso guarda los resultados de todas las loterías de ese día (una sola llamada).
+    """
     today = date.today()
     draw_date = get_most_recent_last_friday(today)
+    draw_dt = datetime.combine(draw_date, time.min)
 
     exists = (
         db.query(ResultadoLoteria)
         .filter(
-            ResultadoLoteria.slug == "medellin",
-            ResultadoLoteria.date == draw_date
+            ResultadoLoteria.slug == POLLA_SLUG,
+            ResultadoLoteria.date == draw_dt
         )
         .first()
     )
@@ -86,31 +132,30 @@ def sync_medellin_if_last_friday(db: Session) -> dict:
         }
 
     try:
-        med = fetch_medellin_result(draw_date)
-        if med and med.get("result"):
-            nuevo = ResultadoLoteria(
-                slug="medellin",
-                lottery="MEDELLIN",
-                date=draw_date,
-                result=med["result"],
-                series=med.get("series"),
-                fetched_at=datetime.now(),
-            )
-            db.add(nuevo)
-            db.commit()
-            db.refresh(nuevo)
+        filas = fetch_resultados_dia(draw_date)
+        guardar_resultados(db, filas)
+
+        propio = next((f for f in filas if f["slug"] == POLLA_SLUG), None)
+        if propio:
+            # Un sorteo nuevo puede tener ganador: el pozo cambia desde ese mes
+            recalcular_pozo_polla(db, draw_date.year, draw_date.month)
+            refrescar_estadisticas_globales(db)
+        db.commit()
+        invalidar_resultados()
+
+        if propio:
             return {
                 "ran": True,
                 "mensaje": "Resultado sincronizado correctamente",
-                "date": nuevo.date.isoformat(),
-                "result": nuevo.result
+                "date": propio["date"].isoformat(),
+                "result": propio["result"]
             }
+        print(f"[SyncPolla] La API aún no publica {POLLA_SLUG} para {draw_date.isoformat()} ({len(filas)} loterías guardadas)")
     except Exception as e:
+        db.rollback()
         print(f"[SyncPolla] No se pudo obtener resultado para la fecha del último viernes {draw_date.isoformat()}: {e}")
 
     return {
         "ran": False,
         "mensaje": f"No se pudo sincronizar el resultado con la API externa para la fecha exacta del último viernes ({draw_date.isoformat()})."
     }
-
-
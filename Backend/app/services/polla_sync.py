@@ -0,0 +1,88 @@
+# app/services/polla_sync.py
+import os
+import time
+import threading
+from fastapi import BackgroundTasks
+
+from app.database import SessionLocal
+
+# =========================================================
+# 🔁 SINCRONIZACIÓN DE LA POLLA: UNA SOLA A LA VEZ
+# =========================================================
+# Antes cada visita a la página de la polla agregaba su propia tarea de fondo, cada una
+# con su sesión de BD y su llamada a la API externa. Ahora hay a lo sumo una
+# sincronización en curso por proceso, y después de cada intento se espera un tiempo
+# (más largo si salió bien) antes de volver a intentar desde una petición.
+SYNC_COOLDOWN_OK = int(os.getenv("POLLA_SYNC_COOLDOWN_OK", "900"))        # segundos
+SYNC_COOLDOWN_ERROR = int(os.getenv("POLLA_SYNC_COOLDOWN_ERROR", "120"))
+SYNC_ESPERA_MAX = int(os.getenv("POLLA_SYNC_ESPERA_MAX", "60"))           # para quien se une a una en curso
+# Con el worker aparte (python -m app.worker) las visitas no necesitan disparar la
+# sincronización: POLLA_SYNC_EN_WEB=0 la deja solo en manos del job.
+SYNC_EN_WEB = os.getenv("POLLA_SYNC_EN_WEB", "1").lower() in ("1", "true", "si")
+
+_lock = threading.Lock()
+_en_curso: threading.Event | None = None   # se activa cuando termina la sincronización en curso
+_proximo_intento = 0.0                     # time.monotonic() desde el que se puede volver a intentar
+_ultimo_resultado: dict | None = None
+
+
+def sync_pendiente() -> bool:
+    """Chequeo barato (sin BD ni red): ¿vale la pena lanzar una sincronización ahora?"""
+    with _lock:
+        return _en_curso is None and time.monotonic() >= _proximo_intento
+
+
+def sync_polla_coordinado(forzar: bool = False) -> dict:
+    """
+    Corre sync_medellin_if_last_friday con su propia sesión, sin duplicarla.
+    - Si ya hay una en curso: con forzar=True se espera su resultado; si no, se omite.
+    - Si está en el tiempo de espera tras el último intento: se omite, salvo forzar=True
+      (los jobs del scheduler, que tienen su propio horario).
+    """
+    global _en_curso, _proximo_intento, _ultimo_resultado
+
+    with _lock:
+        en_curso = _en_curso
+        if en_curso is None:
+            if not forzar and time.monotonic() < _proximo_intento:
+                return {"ran": False, "omitido": True, "mensaje": "Sincronización reciente, se omite"}
+            _en_curso = threading.Event()
+
+    if en_curso is not None:
+        if not forzar:
+            return {"ran": False, "omitido": True, "mensaje": "Ya hay una sincronización en curso"}
+        en_curso.wait(SYNC_ESPERA_MAX)
+        with _lock:
+            return _ultimo_resultado or {"ran": False, "mensaje": "La sincronización en curso no terminó a tiempo"}
+
+    resultado = {"ran": False, "mensaje": "Error inesperado sincronizando la polla"}
+    db = SessionLocal()
+    try:
+        # Import diferido: el cliente de la API de loterías solo se carga si se sincroniza
+        from app.services.polla_scheduler import sync_medellin_if_last_friday
+        resultado = sync_medellin_if_last_friday(db)
+    except Exception as e:
+        resultado = {"ran": False, "mensaje": f"Error sincronizando la polla: {e}"}
+    finally:
+        db.close()
+        with _lock:
+            _ultimo_resultado = resultado
+            espera = SYNC_COOLDOWN_OK if resultado.get("ran") else SYNC_COOLDOWN_ERROR
+            _proximo_intento = time.monotonic() + espera
+            evento, _en_curso = _en_curso, None
+        evento.set()
+
+    return resultado
+
+
+def task_sync_polla():
+    # Tarea de fondo de los endpoints de la polla
+    r = sync_polla_coordinado()
+    if not r.get("omitido"):
+        print("[PollaBackgroundTask]", r)
+
+
+def programar_sync_polla(background_tasks: BackgroundTasks | None):
+    """Agrega la tarea de fondo solo si hace falta: abrir la polla cuesta un chequeo en memoria."""
+    if SYNC_EN_WEB and background_tasks is not None and sync_pendiente():
+        background_tasks.add_task(task_sync_polla)
@@ -0,0 +1,171 @@
+# app/services/registro_sql.py
+import os
+import re
+import time
+import hashlib
+import threading
+import contextvars
+from contextlib import contextmanager
+from datetime import datetime
+
+# =========================================================
+# 🔎 REGISTRO DE CONSULTAS SQL (N+1 Y PRESUPUESTO DE CONSULTAS)
+# =========================================================
+# Recibe cada consulta desde los eventos del engine (ver instrumentar_engine en
+# app/services/metricas.py) y la agrupa por "huella": el SQL sin valores, así
+# "WHERE id = 1" y "WHERE id = 2" cuentan como la misma sentencia.
+#   - SQL_DEBUG=1: al terminar cada petición se imprime cuántas consultas hizo, cuánto
+#     tardaron y las sentencias repetidas SQL_N1_MIN veces o más (sospechosas de N+1).
+#   - SQL_LENTA_MS: toda consulta más lenta que eso va al log de consultas lentas
+#     (SQL_LOG_LENTAS, o la consola si no se define). 0 lo apaga.
+#   - limite_consultas(n): para pruebas; falla si el bloque hace más de n consultas.
+SQL_DEBUG = os.getenv("SQL_DEBUG", "0").lower() in ("1", "true", "si")
+SQL_N1_MIN = int(os.getenv("SQL_N1_MIN", "3"))
+SQL_LENTA_MS = float(os.getenv("SQL_LENTA_MS", "500"))
+SQL_LOG_LENTAS = os.getenv("SQL_LOG_LENTAS", "")
+
+_RE_TEXTO = re.compile(r"'(?:[^']|'')*'")
+_RE_PARAMETRO = re.compile(r"%\(\w+\)s|%s|:\w+|\$\d+|\?")
+_RE_NUMERO = re.compile(r"\b\d+(?:\.\d+)?\b")
+_RE_LISTA = re.compile(r"\(\s*\?(?:\s*,\s*\?)+\s*\)")
+_RE_ESPACIOS = re.compile(r"\s+")
+
+
+def huella(sql: str) -> str:
+    """SQL normalizado: sin literales ni nombres de parámetros, listas IN colapsadas."""
+    s = _RE_TEXTO.sub("?", sql)
+    s = _RE_PARAMETRO.sub("?", s)
+    s = _RE_NUMERO.sub("?", s)
+    s = _RE_LISTA.sub("(?)", s)
+    return _RE_ESPACIOS.sub(" ", s).strip()
+
+
+class Grabacion:
+    """Consultas hechas dentro de un bloque, agrupadas por huella."""
+
+    def __init__(self, padre: "Grabacion | None" = None):
+        self.padre = padre   # grabación que estaba activa: también recibe las consultas
+        self._lock = threading.Lock()
+        self.total = 0
+        self.segundos = 0.0
+        self.sentencias = {}   # huella -> [veces, segundos, max segundos]
+
+    def agregar(self, sql: str, segundos: float):
+        clave = huella(sql)
+        with self._lock:
+            self.total += 1
+            self.segundos += segundos
+            s = self.sentencias.setdefault(clave, [0, 0.0, 0.0])
+            s[0] += 1
+            s[1] += segundos
+            s[2] = max(s[2], segundos)
+        if self.padre is not None:
+            self.padre.agregar(sql, segundos)
+
+    def sospechosas_n1(self, minimo: int = SQL_N1_MIN) -> list:
+        """[(veces, huella)] de las sentencias repetidas al menos `minimo` veces."""
+        with self._lock:
+            return sorted(((s[0], h) for h, s in self.sentencias.items() if s[0] >= minimo), reverse=True)
+
+    def resumen(self) -> str:
+        with self._lock:
+            filas = sorted(self.sentencias.items(), key=lambda kv: kv[1][1], reverse=True)
+            lineas = [f"{self.total} consultas, {self.segundos * 1000:.1f} ms"]
+        for clave, (veces, segundos, maximo) in filas:
+            marca = "  N+1?" if veces >= SQL_N1_MIN else ""
+            lineas.append(
+                f"  {veces:>4}x {segundos * 1000:8.1f} ms (máx {maximo * 1000:.1f}) "
+                f"[{hashlib.sha1(clave.encode()).hexdigest()[:8]}] {clave[:160]}{marca}"
+            )
+        return "\n".join(lineas)
+
+
+# Grabación de la petición en curso (SQL_DEBUG) y grabaciones globales (limite_consultas):
+# las de las pruebas son globales porque TestClient corre la app en otro hilo, sin el
+# contexto de quien llama.
+_grabacion_actual: contextvars.ContextVar[Grabacion | None] = contextvars.ContextVar("grabacion_sql", default=None)
+_globales: list = []
+_globales_lock = threading.Lock()
+_log_lock = threading.Lock()
+
+
+def _log_lenta(sql: str, segundos: float):
+    linea = f"{datetime.now().isoformat(timespec='seconds')} {segundos * 1000:.1f} ms {huella(sql)[:500]}"
+    if not SQL_LOG_LENTAS:
+        print("[SQL lenta]", linea)
+        return
+    with _log_lock:
+        with open(SQL_LOG_LENTAS, "a", encoding="utf-8") as f:
+            f.write(linea + "\n")
+
+
+def observar_consulta(sql: str, segundos: float):
+    """Lo llaman los eventos del engine después de cada consulta."""
+    if SQL_LENTA_MS and segundos * 1000 >= SQL_LENTA_MS:
+        _log_lenta(sql, segundos)
+
+    grabacion = _grabacion_actual.get()
+    if grabacion is not None:
+        grabacion.agregar(sql, segundos)
+    if _globales:
+        with _globales_lock:
+            activas = list(_globales)
+        for g in activas:
+            g.agregar(sql, segundos)
+
+
+class LimiteConsultasExcedido(AssertionError):
+    """Un bloque con limite_consultas() hizo más consultas de las permitidas."""
+
+
+@contextmanager
+def grabar_consultas():
+    """Graba las consultas del contexto actual (la petición en curso) mientras dura el bloque."""
+    grabacion = Grabacion(padre=_grabacion_actual.get())
+    token = _grabacion_actual.set(grabacion)
+    try:
+        yield grabacion
+    finally:
+        _grabacion_actual.reset(token)
+
+
+@contextmanager
+def limite_consultas(maximo: int, nombre: str = "bloque"):
+    """
+    Cuenta las consultas de todo el proceso mientras dura el bloque y falla si pasan de
+    `maximo`. Pensado para pruebas (una petición a la vez):
+
+        with limite_consultas(2, "dashboard"):
+            client.get("/api/dashboard/1")
+    """
+    grabacion = Grabacion()
+    with _globales_lock:
+        _globales.append(grabacion)
+    try:
+        yield grabacion
+    finally:
+        with _globales_lock:
+            _globales.remove(grabacion)
+    if grabacion.total > maximo:
+        raise LimiteConsultasExcedido(f"{nombre}: {grabacion.total} consultas (máximo {maximo})\n{grabacion.resumen()}")
+
+
+class RegistroSQLMiddleware:
+    """Con SQL_DEBUG=1: imprime el resumen de consultas de cada petición y las sospechosas de N+1."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        inicio = time.perf_counter()
+        with grabar_consultas() as grabacion:
+            await self.app(scope, receive, send)
+        if grabacion.total:
+            duracion = (time.perf_counter() - inicio) * 1000
+            print(f"[SQL] {scope['method']} {scope['path']} ({duracion:.1f} ms): {grabacion.resumen()}")
+            for veces, clave in grabacion.sospechosas_n1():
+                print(f"[SQL][N+1?] {scope['method']} {scope['path']}: {veces}x {clave[:200]}")
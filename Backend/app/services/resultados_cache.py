@@ -0,0 +1,94 @@
+# app/services/resultados_cache.py
+import os
+import time
+import threading
+from sqlalchemy.orm import Session
+
+from app.models.models import ResultadoLoteria
+from app.services.polla_pozo import POLLA_SLUG
+from app.services.paginacion import paginar, pagina, LIMITE_MAX
+
+# =========================================================
+# 🧠 CACHÉ EN MEMORIA DE RESULTADOS DE LOTERÍA
+# =========================================================
+# Los resultados cambian a lo sumo una vez al mes, así que los endpoints de la polla
+# los leen de memoria. La caché se invalida cuando este proceso guarda un resultado
+# nuevo (sync o backfill); el TTL cubre los resultados guardados por otro worker/proceso.
+CACHE_TTL = int(os.getenv("POLLA_CACHE_TTL", "300"))  # segundos
+LIMITE_HISTORIAL = 24  # dos años de sorteos por página
+
+_lock = threading.Lock()
+_generacion = 0        # sube con cada invalidación; evita guardar datos leídos antes de ella
+_entradas: dict = {}   # clave -> (expira_monotonic, valor)
+
+
+def _ultimo_desde_bd(db: Session) -> dict | None:
+    r = (
+        db.query(ResultadoLoteria)
+        .filter(ResultadoLoteria.slug == POLLA_SLUG)
+        .order_by(ResultadoLoteria.date.desc())
+        .first()
+    )
+    if r is None:
+        return None
+    return {"date": r.date, "result": r.result, "series": r.series}
+
+
+def _historial_desde_bd(db: Session, cursor: str | None, limit: int) -> dict:
+    # Solo la lotería de la polla: ahora se guardan todas las loterías de cada sorteo
+    resultados, next_cursor, has_more = paginar(
+        db.query(ResultadoLoteria).filter(ResultadoLoteria.slug == POLLA_SLUG),
+        (ResultadoLoteria.date, ResultadoLoteria.id),
+        cursor,
+        limit,
+    )
+    return pagina([
+        {
+            "id": r.id,
+            "lottery": r.lottery,
+            "date": r.date.isoformat(),
+            "result": r.result,
+            "series": r.series,
+            "ganador": str(r.result)[-2:].zfill(2) if r.result else ""
+        }
+        for r in resultados
+    ], next_cursor, has_more)
+
+
+def _obtener(clave: str, cargar, db: Session):
+    with _lock:
+        entrada = _entradas.get(clave)
+        if entrada and entrada[0] > time.monotonic():
+            return entrada[1]
+        generacion = _generacion
+
+    valor = cargar(db)
+
+    with _lock:
+        if generacion == _generacion:
+            _entradas[clave] = (time.monotonic() + CACHE_TTL, valor)
+    return valor
+
+
+def ultimo_resultado(db: Session) -> dict | None:
+    """Último resultado de la lotería de la polla como dict (date, result, series), o None si no hay."""
+    return _obtener("ultimo", _ultimo_desde_bd, db)
+
+
+def historial_resultados(db: Session, cursor: str | None = None, limit: int = LIMITE_HISTORIAL) -> dict:
+    """
+    Una página de resultados de la lotería de la polla, del más reciente al más antiguo
+    (listos para JSON). Solo la primera página va a la caché: es la que se ve siempre.
+    """
+    if cursor:
+        return _historial_desde_bd(db, cursor, limit)
+    limit = max(1, min(limit, LIMITE_MAX))
+    return _obtener(f"historial:{limit}", lambda db: _historial_desde_bd(db, None, limit), db)
+
+
+def invalidar_resultados():
+    """Llamar después del commit que guarda un resultado nuevo."""
+    global _generacion
+    with _lock:
+        _generacion += 1
+        _entradas.clear()
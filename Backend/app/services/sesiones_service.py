@@ -0,0 +1,102 @@
+# app/services/sesiones_service.py
+import secrets
+from datetime import datetime, timedelta
+from sqlalchemy.orm import Session
+
+from app.database import SessionLocal
+from app.models.models import RefreshToken, Usuario
+from app.security.security import generar_refresh_token, hash_refresh_token, REFRESH_TOKEN_EXPIRE_DAYS
+
+
+def emitir_refresh_token(db: Session, usuario_id: int, familia: str | None = None) -> str:
+    """
+    Crea un refresh token para el usuario y devuelve el token en claro (solo se
+    guarda su hash). Sin familia se abre una nueva (login). No hace commit.
+    """
+    token = generar_refresh_token()
+    ahora = datetime.now()
+    db.add(RefreshToken(
+        usuario_id=usuario_id,
+        token_hash=hash_refresh_token(token),
+        familia=familia or secrets.token_hex(16),
+        creado=ahora,
+        expira=ahora + timedelta(days=REFRESH_TOKEN_EXPIRE_DAYS),
+    ))
+    return token
+
+
+def revocar_familia(db: Session, familia: str):
+    db.query(RefreshToken).filter(RefreshToken.familia == familia).update(
+        {RefreshToken.revocado: True}, synchronize_session=False
+    )
+
+
+def revocar_tokens_usuario(db: Session, usuario_id: int):
+    # Cierra todas las sesiones del usuario (p. ej. al cambiar la contraseña). No hace commit.
+    db.query(RefreshToken).filter(RefreshToken.usuario_id == usuario_id).update(
+        {RefreshToken.revocado: True}, synchronize_session=False
+    )
+
+
+def rotar_refresh_token(db: Session, token: str) -> tuple[Usuario, str] | None:
+    """
+    Cambia un refresh token válido por uno nuevo de la misma familia y devuelve
+    (usuario, nuevo_token). Devuelve None si el token no sirve. Si el token ya había
+    sido usado, se revoca toda la familia: alguien más lo tiene. No hace commit.
+    """
+    registro = (
+        db.query(RefreshToken)
+        .filter(RefreshToken.token_hash == hash_refresh_token(token))
+        .with_for_update()
+        .first()
+    )
+    if registro is None or registro.revocado:
+        return None
+
+    if registro.usado is not None:
+        revocar_familia(db, registro.familia)
+        return None
+
+    ahora = datetime.now()
+    if registro.expira <= ahora:
+        return None
+
+    usuario = db.get(Usuario, registro.usuario_id)
+    if usuario is None or not usuario.activo:
+        revocar_familia(db, registro.familia)
+        return None
+
+    registro.usado = ahora
+    return usuario, emitir_refresh_token(db, usuario.id, registro.familia)
+
+
+def limpiar_refresh_tokens_vencidos():
+    """
+    Job diario: borra los refresh tokens ya vencidos. Los usados se conservan hasta que
+    vencen porque sirven para detectar que alguien reusa un token robado; pasado eso ya
+    no los acepta nadie. Sin esto la tabla crece con cada renovación.
+    """
+    db = SessionLocal()
+    try:
+        borrados = (
+            db.query(RefreshToken)
+            .filter(RefreshToken.expira <= datetime.now())
+            .delete(synchronize_session=False)
+        )
+        db.commit()
+        if borrados:
+            print(f"[Sesiones] {borrados} refresh tokens vencidos borrados")
+    except Exception as e:
+        db.rollback()
+        print("[Sesiones][ERROR] No se pudieron borrar los refresh tokens vencidos:", str(e))
+    finally:
+        db.close()
+
+
+def cerrar_sesion(db: Session, token: str) -> bool:
+    # Revoca la familia del token (el dispositivo). No hace commit.
+    registro = db.query(RefreshToken).filter(RefreshToken.token_hash == hash_refresh_token(token)).first()
+    if registro is None:
+        return False
+    revocar_familia(db, registro.familia)
+    return True
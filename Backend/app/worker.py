@@ -0,0 +1,42 @@
+# app/worker.py
+"""
+Proceso aparte para los jobs programados (interés mensual y sincronización de la polla):
+
+    python -m app.worker
+
+La API puede correr entonces sin scheduler (WEB_SCHEDULER=0), sin cargar APScheduler
+ni el cliente de la API de loterías. Se pueden levantar varios workers: solo el líder
+corre los jobs.
+"""
+import signal
+import threading
+
+from app.database import engine, Base
+from app.scheduler import SchedulerConLider
+
+
+def main():
+    # El worker es quien crea las tablas que falten (la API puede omitirlo con DB_CREATE_ALL=0)
+    Base.metadata.create_all(bind=engine)
+
+    parar = threading.Event()
+
+    def _senal(signum, frame):
+        print(f"Señal {signum} recibida, deteniendo el worker...")
+        parar.set()
+
+    signal.signal(signal.SIGINT, _senal)
+    signal.signal(signal.SIGTERM, _senal)
+
+    jobs = SchedulerConLider(nombre="worker")
+    jobs.iniciar()
+    try:
+        while not parar.wait(1):
+            pass
+    finally:
+        jobs.detener()
+        engine.dispose()
+
+
+if __name__ == "__main__":
+    main()
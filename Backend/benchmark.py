@@ -0,0 +1,248 @@
+"""
+Benchmarks de los caminos más usados de la API, en este mismo proceso y sobre datos
+sintéticos (ver datos_sinteticos.py): dashboard, matriz de pagos, préstamos, cálculo del
+interés mensual, estado e historial de la polla y login. El resultado es JSON para
+guardarlo y compararlo entre commits:
+
+    python benchmark.py --salida base.json                       # SQLite temporal, 200 socios
+    python benchmark.py --comparar base.json                     # falla si algo empeoró > 20 %
+    python benchmark.py --db postgresql://u:c@localhost/bench    # base vacía, o con --reusar
+    python benchmark.py --casos dashboard,login --repeticiones 50
+
+Cada caso se calienta antes de medir; los tiempos son de la petición completa vía
+TestClient (routing, validación, serialización y base de datos). El login incluye argon2
+con los costos de ARGON2_* del entorno.
+"""
+import sys
+import json
+import time
+import argparse
+import platform
+import subprocess
+import statistics
+from datetime import datetime
+
+import datos_sinteticos
+
+
+def _percentil(valores: list, p: float) -> float:
+    ordenados = sorted(valores)
+    return ordenados[min(len(ordenados) - 1, int(round(p / 100 * (len(ordenados) - 1))))]
+
+
+def _commit() -> dict:
+    try:
+        sha = subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True).stdout.strip()
+        sucio = bool(subprocess.run(["git", "status", "--porcelain", "--untracked-files=no"],
+                                    capture_output=True, text=True).stdout.strip())
+        return {"commit": sha, "cambios_sin_commit": sucio}
+    except (OSError, subprocess.CalledProcessError):
+        return {"commit": None, "cambios_sin_commit": None}
+
+
+LIMITE_PAGINA2 = 4
+
+
+def crear_casos(c, datos: dict, SessionLocal) -> dict:
+    """nombre -> (preparar(i) o None, ejecutar(i)). `i` es el número de repetición."""
+    from app.routers.Finanzas import calcular_interes_mes
+    from app.models.models import Prestamo
+    from app.services.dashboard_service import invalidar_dashboards
+
+    socios = [s["id"] for s in datos["socios"]][:50]
+    socio = lambda i: socios[i % len(socios)]
+    anio, mes = datos["mes_sin_interes"]
+    db_prestamos = SessionLocal()
+    try:
+        con_prestamo = sorted({uid for (uid,) in db_prestamos.query(Prestamo.usuario_id)})[:50] or socios
+    finally:
+        db_prestamos.close()
+    # Página chica para que siempre haya una segunda (no cacheada) aun con pocos sorteos
+    pagina2 = c.get("/api/polla/historial", params={"limit": LIMITE_PAGINA2}).json()["next_cursor"]
+    if pagina2 is None:
+        raise RuntimeError(f"El historial de la polla tiene {LIMITE_PAGINA2} sorteos o menos: no hay segunda página que medir")
+
+    def ok(r):
+        if r.status_code >= 400:
+            raise RuntimeError(f"{r.request.method} {r.request.url.path} -> {r.status_code}: {r.text[:200]}")
+
+    def sin_cache(i):
+        db = SessionLocal()
+        try:
+            invalidar_dashboards(db, socio(i))
+            db.commit()
+        finally:
+            db.close()
+
+    def interes(i):
+        # Se mide el cálculo y se deshace, así todas las repeticiones hacen el mismo trabajo
+        db = SessionLocal()
+        try:
+            if not calcular_interes_mes(db, anio, mes):
+                raise RuntimeError(f"calcular_interes_mes({anio}, {mes}) no aplicó interés a nadie")
+        finally:
+            db.rollback()
+            db.close()
+
+    return {
+        "dashboard": (None, lambda i: ok(c.get(f"/api/dashboard/{socio(i)}"))),
+        "dashboard_sin_cache": (sin_cache, lambda i: ok(c.get(f"/api/dashboard/{socio(i)}"))),
+        "movimientos": (None, lambda i: ok(c.get(f"/api/movimientos/{socio(i)}?limit=200"))),
+        "matriz_pagos": (None, lambda i: ok(c.get(f"/api/admin/matriz_pagos?anio={anio}"))),
+        "listar_prestamos": (None, lambda i: ok(c.get(f"/api/prestamos/{con_prestamo[i % len(con_prestamo)]}"))),
+        "calcular_interes_mes": (None, interes),
+        "polla_estado": (None, lambda i: ok(c.get(f"/api/polla/estado/{socio(i)}"))),
+        "polla_historial": (None, lambda i: ok(c.get("/api/polla/historial"))),
+        "polla_historial_pagina2": (None, lambda i: ok(c.get("/api/polla/historial", params={"cursor": pagina2, "limit": LIMITE_PAGINA2}))),
+        "login": (None, lambda i: ok(c.post("/api/login", json={
+            "usuario": datos["socios"][i % len(socios)]["usuario"], "password": datos["password"]}))),
+    }
+
+
+# El login es caro a propósito (argon2): menos repeticiones
+REPETICIONES_CASO = {"login": 0.2, "calcular_interes_mes": 0.5}
+
+
+def medir(nombre: str, preparar, ejecutar, repeticiones: int, calentamiento: int) -> dict:
+    from app.services.registro_sql import limite_consultas
+
+    repeticiones = max(3, int(repeticiones * REPETICIONES_CASO.get(nombre, 1)))
+    for i in range(calentamiento):
+        if preparar:
+            preparar(i)
+        ejecutar(i)
+
+    tiempos = []
+    for i in range(repeticiones):
+        if preparar:
+            preparar(i)
+        inicio = time.perf_counter()
+        ejecutar(i)
+        tiempos.append((time.perf_counter() - inicio) * 1000)
+
+    # Consultas SQL por llamada, en una llamada aparte para no sumar el costo de grabarlas
+    if preparar:
+        preparar(0)
+    with limite_consultas(10 ** 9, nombre) as grabacion:
+        ejecutar(0)
+
+    return {
+        "repeticiones": repeticiones,
+        "min_ms": round(min(tiempos), 3),
+        "mediana_ms": round(statistics.median(tiempos), 3),
+        "p95_ms": round(_percentil(tiempos, 95), 3),
+        "media_ms": round(statistics.fmean(tiempos), 3),
+        "max_ms": round(max(tiempos), 3),
+        "consultas": grabacion.total,
+    }
+
+
+def comparar(actual: dict, base: dict, umbral: float) -> list:
+    """Imprime la diferencia de medianas y devuelve los casos que empeoraron más que `umbral`."""
+    peores = []
+    print(f"\n{'caso':<26}{'base ms':>10}{'actual ms':>11}{'cambio':>9}{'consultas':>12}", file=sys.stderr)
+    for nombre, r in actual["casos"].items():
+        b = base.get("casos", {}).get(nombre)
+        if not b:
+            print(f"{nombre:<26}{'-':>10}{r['mediana_ms']:>11.2f}{'nuevo':>9}{r['consultas']:>12}", file=sys.stderr)
+            continue
+        cambio = r["mediana_ms"] / b["mediana_ms"] - 1 if b["mediana_ms"] else 0.0
+        consultas = f"{b['consultas']}->{r['consultas']}" if b["consultas"] != r["consultas"] else str(r["consultas"])
+        marca = "  <-- peor" if cambio > umbral or r["consultas"] > b["consultas"] else ""
+        print(f"{nombre:<26}{b['mediana_ms']:>10.2f}{r['mediana_ms']:>11.2f}{cambio:>+9.0%}{consultas:>12}{marca}", file=sys.stderr)
+        if marca:
+            peores.append(nombre)
+    return peores
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmarks de la API sobre datos sintéticos")
+    parser.add_argument("--db", help="URL de la base; por defecto un SQLite temporal")
+    parser.add_argument("--reusar", action="store_true", help="Usar los datos sintéticos que ya tenga --db")
+    parser.add_argument("--socios", type=int, default=200)
+    parser.add_argument("--anios", type=int, default=3)
+    parser.add_argument("--semilla", type=int, default=1)
+    parser.add_argument("--hasta", type=datos_sinteticos.fecha_hasta, default=datos_sinteticos.HASTA,
+                        help="Fecha de corte de los datos AAAA-MM-DD (fija por defecto)")
+    parser.add_argument("--repeticiones", type=int, default=30)
+    parser.add_argument("--calentamiento", type=int, default=3)
+    parser.add_argument("--casos", help="Solo estos casos, separados por coma")
+    parser.add_argument("--salida", help="Guardar el resultado JSON en este archivo (si no, se imprime)")
+    parser.add_argument("--comparar", help="JSON de una corrida anterior: sale con código 1 si algo empeoró")
+    parser.add_argument("--umbral", type=float, default=0.2, help="Empeoramiento tolerado de la mediana (0.2 = 20 %%)")
+    args = parser.parse_args()
+
+    datos_sinteticos.usar_base(args.db)
+
+    from fastapi.testclient import TestClient
+    import sqlalchemy
+
+    from app.main import app
+    from app.database import SessionLocal, engine, ASYNC_DB
+
+    inicio = time.perf_counter()
+    db = SessionLocal()
+    try:
+        if args.reusar:
+            datos = datos_sinteticos.describir(db)
+        else:
+            datos = datos_sinteticos.generar(db, args.socios, args.anios, args.semilla, args.hasta)
+    finally:
+        db.close()
+    print(f"Datos: {len(datos['socios'])} socios, {datos['movimientos']} movimientos "
+          f"({time.perf_counter() - inicio:.1f} s)", file=sys.stderr)
+
+    c = TestClient(app)
+    casos = crear_casos(c, datos, SessionLocal)
+    if args.casos:
+        elegidos = [n.strip() for n in args.casos.split(",")]
+        desconocidos = [n for n in elegidos if n not in casos]
+        if desconocidos:
+            parser.error(f"casos desconocidos: {', '.join(desconocidos)} (hay: {', '.join(casos)})")
+        casos = {n: casos[n] for n in elegidos}
+
+    resultado = {
+        "meta": {
+            **_commit(),
+            "fecha": datetime.now().isoformat(timespec="seconds"),
+            "python": platform.python_version(),
+            "plataforma": platform.platform(),
+            "sqlalchemy": sqlalchemy.__version__,
+            "base": engine.dialect.name,
+            "async_db": ASYNC_DB,
+            "socios": len(datos["socios"]),
+            "movimientos": datos["movimientos"],
+            "semilla": None if args.reusar else args.semilla,
+            "hasta": None if args.reusar else args.hasta.date().isoformat(),
+            "repeticiones": args.repeticiones,
+        },
+        "casos": {},
+    }
+    for nombre, (preparar, ejecutar) in casos.items():
+        r = medir(nombre, preparar, ejecutar, args.repeticiones, args.calentamiento)
+        resultado["casos"][nombre] = r
+        print(f"{nombre:<26} mediana {r['mediana_ms']:8.2f} ms  p95 {r['p95_ms']:8.2f} ms  "
+              f"{r['consultas']} consultas", file=sys.stderr)
+
+    texto = json.dumps(resultado, ensure_ascii=False, indent=2)
+    if args.salida:
+        with open(args.salida, "w", encoding="utf-8") as f:
+            f.write(texto + "\n")
+    else:
+        print(texto)
+
+    if args.comparar:
+        with open(args.comparar, encoding="utf-8") as f:
+            base = json.load(f)
+        if base.get("meta", {}).get("base") != resultado["meta"]["base"]:
+            print(f"Ojo: la base comparada es {base.get('meta', {}).get('base')}, "
+                  f"esta corrida es {resultado['meta']['base']}", file=sys.stderr)
+        peores = comparar(resultado, base, args.umbral)
+        if peores:
+            print(f"\nEmpeoraron: {', '.join(peores)}", file=sys.stderr)
+            sys.exit(1)
+        print("\nSin regresiones.", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
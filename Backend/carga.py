@@ -0,0 +1,267 @@
+"""
+Prueba de carga: cuántos usuarios simultáneos aguanta un worker. Simula sesiones reales
+sobre los datos sintéticos de datos_sinteticos.py (sin red ni la base de .env):
+  - socios: login, dashboard, estado de la polla, movimientos (limit=200), historial
+  - admins: login, matriz de pagos, modificar_pago_mes y pagos de préstamos
+Al final muestra, por endpoint: peticiones/s, p50/p95/p99 y tasa de errores.
+
+    python carga.py                                  # app en este proceso, SQLite temporal
+    python carga.py --usuarios 100 --duracion 60 --salida carga.json
+    python carga.py --url http://127.0.0.1:8000 --db sqlite:////tmp/bench.db
+
+Con --url la carga va contra un uvicorn ya levantado; --db debe ser la misma base que
+usa ese servidor, generada antes con `python datos_sinteticos.py --db ...`. Sin --url la
+app corre dentro de este proceso (httpx.ASGITransport, un solo event loop: equivale a un
+worker de uvicorn).
+"""
+import sys
+import json
+import time
+import random
+import os
+import asyncio
+import argparse
+import statistics
+from datetime import datetime
+
+import httpx
+
+import datos_sinteticos
+from app.services.periodos import MESES_ES   # no importa la base: se puede antes de usar_base()
+
+
+class Resultados:
+    """Latencias y errores por endpoint (nombre de la ruta, no la URL con ids)."""
+
+    def __init__(self):
+        self.latencias = {}   # endpoint -> [ms]
+        self.errores = {}     # endpoint -> {estado o excepción: veces}
+        self.sesiones = {"socio": 0, "admin": 0}
+
+    def registrar(self, endpoint: str, ms: float, error: str | None):
+        self.latencias.setdefault(endpoint, []).append(ms)
+        if error:
+            por_tipo = self.errores.setdefault(endpoint, {})
+            por_tipo[error] = por_tipo.get(error, 0) + 1
+
+    def resumen(self, segundos: float) -> dict:
+        endpoints = {}
+        for endpoint, tiempos in sorted(self.latencias.items()):
+            cortes = statistics.quantiles(tiempos, n=100, method="inclusive") if len(tiempos) > 1 else tiempos * 99
+            errores = sum(self.errores.get(endpoint, {}).values())
+            endpoints[endpoint] = {
+                "peticiones": len(tiempos),
+                "por_segundo": round(len(tiempos) / segundos, 2),
+                "p50_ms": round(cortes[49], 2),
+                "p95_ms": round(cortes[94], 2),
+                "p99_ms": round(cortes[98], 2),
+                "max_ms": round(max(tiempos), 2),
+                "errores": errores,
+                "tasa_error": round(errores / len(tiempos), 4),
+                "detalle_errores": self.errores.get(endpoint, {}),
+            }
+        total = sum(e["peticiones"] for e in endpoints.values())
+        errores = sum(e["errores"] for e in endpoints.values())
+        return {
+            "total": {
+                "peticiones": total,
+                "por_segundo": round(total / segundos, 2),
+                "errores": errores,
+                "tasa_error": round(errores / total, 4) if total else 0.0,
+                "sesiones": self.sesiones,
+            },
+            "endpoints": endpoints,
+        }
+
+
+class UsuarioVirtual:
+    """Un usuario virtual: repite sesiones de su rol hasta que se acaba el tiempo."""
+
+    def __init__(self, cliente: httpx.AsyncClient, resultados: Resultados, datos: dict,
+                 rnd: random.Random, pausa: float, fin: float):
+        self.cliente = cliente
+        self.resultados = resultados
+        self.datos = datos
+        self.rnd = rnd
+        self.pausa = pausa
+        self.fin = fin
+        self.headers = {}
+
+    def vivo(self) -> bool:
+        return time.monotonic() < self.fin
+
+    async def pensar(self):
+        # Tiempo entre clics: exponencial con media `pausa`
+        if self.pausa > 0:
+            await asyncio.sleep(min(self.rnd.expovariate(1 / self.pausa), self.pausa * 5))
+
+    async def pedir(self, endpoint: str, metodo: str, url: str, **kwargs) -> httpx.Response | None:
+        inicio = time.perf_counter()
+        error = None
+        r = None
+        try:
+            r = await self.cliente.request(metodo, url, headers=self.headers, **kwargs)
+            if r.status_code >= 400:
+                error = str(r.status_code)
+        except httpx.HTTPError as e:
+            error = type(e).__name__
+        self.resultados.registrar(endpoint, (time.perf_counter() - inicio) * 1000, error)
+        return r
+
+    async def login(self, usuario: str) -> bool:
+        r = await self.pedir("POST /api/login", "POST", "/api/login",
+                             json={"usuario": usuario, "password": self.datos["password"]})
+        if r is None or r.status_code != 200:
+            return False
+        self.headers = {"Authorization": f"Bearer {r.json()['access_token']}"}
+        return True
+
+    async def sesion_socio(self):
+        socio = self.rnd.choice(self.datos["socios"])
+        uid = socio["id"]
+        if not await self.login(socio["usuario"]):
+            return
+        await self.pedir("GET /api/dashboard/{usuario_id}", "GET", f"/api/dashboard/{uid}")
+        paginas = [
+            ("GET /api/dashboard/{usuario_id}", f"/api/dashboard/{uid}", {}),
+            ("GET /api/polla/estado/{usuario_id}", f"/api/polla/estado/{uid}", {}),
+            ("GET /api/movimientos/{usuario_id}", f"/api/movimientos/{uid}", {"limit": 200}),
+            ("GET /api/polla/historial", "/api/polla/historial", {}),
+        ]
+        for _ in range(self.rnd.randint(2, 5)):
+            if not self.vivo():
+                return
+            await self.pensar()
+            endpoint, url, params = self.rnd.choices(paginas, weights=[3, 3, 3, 1])[0]
+            await self.pedir(endpoint, "GET", url, params=params)
+        self.resultados.sesiones["socio"] += 1
+
+    async def sesion_admin(self):
+        if not await self.login(self.datos["admin"]["usuario"]):
+            return
+        anio, _ = self.datos["hasta"]
+        await self.pedir("GET /api/admin/matriz_pagos", "GET", "/api/admin/matriz_pagos", params={"anio": anio})
+        for _ in range(self.rnd.randint(2, 4)):
+            if not self.vivo():
+                return
+            await self.pensar()
+            pagar = self.datos["pagos_reversibles"] and (self.rnd.random() < 0.6 or not self.datos["prestamos_pendientes"])
+            if pagar:
+                # Quita y vuelve a poner un pago que existe y que "registrar" recrea con el mismo
+                # monto (ver datos_sinteticos._pagos_reversibles): los montos quedan como estaban
+                pago = dict(self.rnd.choice(self.datos["pagos_reversibles"]))
+                pago["mes"] = MESES_ES[pago["mes"] - 1]
+                for accion in ("eliminar", "registrar"):
+                    await self.pedir("POST /api/admin/modificar_pago_mes", "POST", "/api/admin/modificar_pago_mes",
+                                     json={**pago, "accion": accion})
+            elif self.datos["prestamos_pendientes"]:
+                # Abonos pequeños para que los préstamos no se terminen de pagar durante la prueba
+                prestamo_id = self.rnd.choice(self.datos["prestamos_pendientes"])
+                await self.pedir("POST /api/prestamos/{prestamo_id}/registrar_pago", "POST",
+                                 f"/api/prestamos/{prestamo_id}/registrar_pago", params={"monto": 1000})
+            await self.pensar()
+            await self.pedir("GET /api/admin/matriz_pagos", "GET", "/api/admin/matriz_pagos", params={"anio": anio})
+        self.resultados.sesiones["admin"] += 1
+
+    async def correr(self, admin: bool, retraso: float):
+        await asyncio.sleep(retraso)
+        while self.vivo():
+            await (self.sesion_admin() if admin else self.sesion_socio())
+            self.headers = {}
+            await self.pensar()
+
+
+async def correr_carga(cliente: httpx.AsyncClient, datos: dict, args) -> dict:
+    resultados = Resultados()
+    rnd = random.Random(args.semilla)
+    inicio = time.monotonic()
+    fin = inicio + args.rampa + args.duracion
+    admins = max(1, round(args.usuarios * args.admins)) if args.admins > 0 else 0
+
+    tareas = []
+    for i in range(args.usuarios):
+        usuario = UsuarioVirtual(cliente, resultados, datos, random.Random(rnd.random()), args.pausa, fin)
+        # Rampa: los usuarios entran repartidos en los primeros `rampa` segundos
+        retraso = args.rampa * i / args.usuarios
+        tareas.append(asyncio.create_task(usuario.correr(i < admins, retraso)))
+    await asyncio.gather(*tareas)
+    return resultados.resumen(time.monotonic() - inicio)
+
+
+def imprimir(resumen: dict):
+    print(f"\n{'endpoint':<50}{'req':>7}{'req/s':>8}{'p50':>9}{'p95':>9}{'p99':>9}{'error':>8}")
+    for endpoint, e in resumen["endpoints"].items():
+        print(f"{endpoint:<50}{e['peticiones']:>7}{e['por_segundo']:>8.1f}{e['p50_ms']:>9.1f}"
+              f"{e['p95_ms']:>9.1f}{e['p99_ms']:>9.1f}{e['tasa_error']:>8.1%}")
+    t = resumen["total"]
+    print(f"\nTotal: {t['peticiones']} peticiones, {t['por_segundo']} req/s, {t['tasa_error']:.1%} errores, "
+          f"sesiones {t['sesiones']['socio']} de socio y {t['sesiones']['admin']} de admin")
+    for endpoint, e in resumen["endpoints"].items():
+        if e["detalle_errores"]:
+            print(f"  errores {endpoint}: {e['detalle_errores']}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Prueba de carga con sesiones de socios y admins")
+    parser.add_argument("--url", help="Servidor ya levantado (uvicorn); si no, la app corre en este proceso")
+    parser.add_argument("--db", help="Base con datos sintéticos; sin --url, por defecto un SQLite temporal nuevo")
+    parser.add_argument("--socios", type=int, default=200, help="Socios a generar (solo sin --db)")
+    parser.add_argument("--anios", type=int, default=2, help="Años de historia a generar (solo sin --db)")
+    parser.add_argument("--usuarios", type=int, default=20, help="Usuarios simultáneos")
+    parser.add_argument("--admins", type=float, default=0.1, help="Fracción de usuarios que son admins")
+    parser.add_argument("--duracion", type=float, default=30, help="Segundos de carga después de la rampa")
+    parser.add_argument("--rampa", type=float, default=5, help="Segundos en los que van entrando los usuarios")
+    parser.add_argument("--pausa", type=float, default=1.0, help="Pausa media entre clics de un usuario (s)")
+    parser.add_argument("--semilla", type=int, default=1)
+    parser.add_argument("--hasta", type=datos_sinteticos.fecha_hasta, default=datos_sinteticos.HASTA,
+                        help="Fecha de corte de los datos a generar AAAA-MM-DD (solo sin --db)")
+    parser.add_argument("--salida", help="Guardar el resumen JSON en este archivo")
+    args = parser.parse_args()
+
+    if args.url and not args.db:
+        parser.error("con --url hace falta --db: la misma base de datos sintéticos que usa el servidor")
+
+    datos_sinteticos.usar_base(args.db)
+    # Bajo carga las consultas esperan el GIL y el pool: el log de lentas solo haría ruido
+    os.environ.setdefault("SQL_LENTA_MS", "0")
+    from app.database import SessionLocal
+
+    db = SessionLocal()
+    try:
+        if args.db:
+            datos = datos_sinteticos.describir(db)
+        else:
+            datos = datos_sinteticos.generar(db, args.socios, args.anios, args.semilla, args.hasta)
+    finally:
+        db.close()
+
+    if args.url:
+        transporte = None
+        base_url = args.url.rstrip("/")
+    else:
+        from app.main import app
+        transporte = httpx.ASGITransport(app=app)
+        base_url = "http://carga"
+
+    async def correr():
+        limites = httpx.Limits(max_connections=args.usuarios, max_keepalive_connections=args.usuarios)
+        async with httpx.AsyncClient(transport=transporte, base_url=base_url, limits=limites, timeout=60) as cliente:
+            return await correr_carga(cliente, datos, args)
+
+    print(f"{args.usuarios} usuarios ({args.admins:.0%} admins), {args.rampa:g} s de rampa + {args.duracion:g} s "
+          f"contra {args.url or 'la app en este proceso'}; {len(datos['socios'])} socios", file=sys.stderr)
+    resumen = asyncio.run(correr())
+    imprimir(resumen)
+
+    if args.salida:
+        resumen["meta"] = {
+            "fecha": datetime.now().isoformat(timespec="seconds"),
+            "destino": args.url or "asgi",
+            **{k: getattr(args, k) for k in ("usuarios", "admins", "duracion", "rampa", "pausa", "semilla")},
+        }
+        with open(args.salida, "w", encoding="utf-8") as f:
+            json.dump(resumen, f, ensure_ascii=False, indent=2)
+
+
+if __name__ == "__main__":
+    main()
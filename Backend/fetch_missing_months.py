@@ -1,50 +1,55 @@
-from datetime import date, datetime, timedelta
-import requests
+"""
+Backfill de resultados de lotería: trae los sorteos (último viernes de cada mes) que
+faltan en resultados_loteria para un rango de meses, en paralelo, y los guarda con un
+solo upsert. Guarda todas las loterías de cada fecha; la polla usa POLLA_SLUG.
+
+    python fetch_missing_months.py                          # desde el inicio de la polla hasta hoy
+    python fetch_missing_months.py --desde 2020-01 --hasta 2025-12 --paralelo 8
+    python fetch_missing_months.py --desde 2026-01 --solo-listar
+"""
+import argparse
+import json
+from datetime import date
+
 from app.database import SessionLocal
-from app.models.models import ResultadoLoteria
-from app.services.polla_scheduler import last_friday_of_month, fetch_medellin_result
+from app.services.polla_pozo import POLLA_INICIO
+from app.services.backfill_resultados import backfill_resultados, fechas_faltantes
+
+
+def _mes(texto: str) -> tuple[int, int]:
+    # "2026-03" -> (2026, 3)
+    try:
+        anio, mes = texto.split("-")
+        anio, mes = int(anio), int(mes)
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"Mes inválido: {texto} (use AAAA-MM)")
+    if not 1 <= mes <= 12:
+        raise argparse.ArgumentTypeError(f"Mes inválido: {texto} (use AAAA-MM)")
+    return anio, mes
 
-db = SessionLocal()
 
-# We need to sync results for January (month 1), March (month 3), and May (month 5) of 2026.
-months_to_sync = [1, 3, 5]
-year = 2026
+if __name__ == "__main__":
+    hoy = date.today()
+    parser = argparse.ArgumentParser(description="Backfill de resultados de lotería")
+    parser.add_argument("--desde", type=_mes, default=POLLA_INICIO, help="AAAA-MM (por defecto, inicio de la polla)")
+    parser.add_argument("--hasta", type=_mes, default=(hoy.year, hoy.month), help="AAAA-MM (por defecto, mes actual)")
+    parser.add_argument("--paralelo", type=int, default=4, help="llamadas simultáneas a la API")
+    parser.add_argument("--solo-listar", action="store_true", help="solo muestra las fechas faltantes")
+    args = parser.parse_args()
 
-try:
-    for m in months_to_sync:
-        draw_date = last_friday_of_month(year, m)
-        print(f"Syncing month {m} ({draw_date})...")
-        
-        # Check if already exists
-        exists = db.query(ResultadoLoteria).filter(
-            ResultadoLoteria.slug == "medellin",
-            ResultadoLoteria.date == draw_date
-        ).first()
-        
-        if exists:
-            print(f"Result for {draw_date} already exists: {exists.result}")
-            continue
-            
-        try:
-            res = fetch_medellin_result(draw_date)
-            print(f"Fetched result for {draw_date}: {res}")
-            
-            nuevo = ResultadoLoteria(
-                slug="medellin",
-                lottery="MEDELLIN",
-                date=draw_date,
-                result=res["result"],
-                series=res.get("series"),
-                fetched_at=datetime.now()
-            )
-            db.add(nuevo)
-            db.commit()
-            print(f"Successfully saved {draw_date} result: {res['result']}")
-        except Exception as ex:
-            db.rollback()
-            print(f"Error fetching/saving result for {draw_date}: {ex}")
-            
-except Exception as e:
-    print(f"An error occurred: {e}")
-finally:
-    db.close()
+    db = SessionLocal()
+    try:
+        if args.solo_listar:
+            faltantes = fechas_faltantes(db, args.desde, args.hasta)
+            print(f"{len(faltantes)} sorteos faltantes:")
+            for f in faltantes:
+                print("   ", f.isoformat())
+        else:
+            reporte = backfill_resultados(db, args.desde, args.hasta, paralelo=args.paralelo)
+            print(json.dumps(reporte, indent=2, ensure_ascii=False))
+    except Exception:
+        db.rollback()
+        import traceback
+        traceback.print_exc()
+    finally:
+        db.close()
@@ -0,0 +1,144 @@
+"""
+Migraciones manuales de la base de datos.
+
+Base.metadata.create_all solo crea tablas nuevas: no agrega columnas ni índices a
+tablas que ya existen. Cada paso de este script es idempotente, así que se puede
+correr varias veces sin problema:
+
+    python migraciones.py
+"""
+import re
+from sqlalchemy import inspect, text, select, update, func
+
+from app.database import SessionLocal, engine, Base
+from app.models.models import Movimiento, Prestamo, Usuario, ResultadoLoteria
+from app.services.periodos import parse_mes_desde_descripcion
+
+LOTE = 1000
+
+
+def _columnas(tabla: str) -> set:
+    return {c["name"] for c in inspect(engine).get_columns(tabla)}
+
+
+def _agregar_columna(db, tabla: str, columna: str, tipo: str):
+    if columna not in _columnas(tabla):
+        db.execute(text(f"ALTER TABLE {tabla} ADD COLUMN {columna} {tipo}"))
+        db.commit()
+        print(f"Columna {tabla}.{columna} agregada.")
+
+
+def _crear_indices(modelo, *nombres: str):
+    # Solo los índices pedidos: los demás pueden depender de columnas de pasos posteriores
+    for indice in modelo.__table__.indexes:
+        if indice.name in nombres:
+            indice.create(bind=engine, checkfirst=True)
+
+
+def migrar_periodos(db):
+    """
+    Agrega movimientos.periodo_anio / periodo_mes y los llena una sola vez a partir
+    del texto "(Marzo 2026)" de la descripción.
+    """
+    _agregar_columna(db, "movimientos", "periodo_anio", "INTEGER")
+    _agregar_columna(db, "movimientos", "periodo_mes", "INTEGER")
+    _crear_indices(Movimiento, "ix_movimientos_usuario_periodo", "ix_movimientos_periodo_tipo")
+
+    pendientes = db.execute(
+        select(Movimiento.id, Movimiento.descripcion)
+        .where(Movimiento.periodo_anio == None, Movimiento.descripcion != None)
+    ).all()
+
+    cambios = []
+    for mov_id, descripcion in pendientes:
+        parsed = parse_mes_desde_descripcion(descripcion)
+        if parsed:
+            mes_index, anio = parsed
+            cambios.append({"id": mov_id, "periodo_anio": anio, "periodo_mes": mes_index + 1})
+
+    for i in range(0, len(cambios), LOTE):
+        db.execute(update(Movimiento), cambios[i:i + LOTE])
+    db.commit()
+    print(f"Periodos: {len(cambios)} movimientos actualizados ({len(pendientes) - len(cambios)} sin mes en la descripción).")
+
+
+def migrar_prestamo_id(db):
+    """
+    Agrega movimientos.prestamo_id (FK a prestamos) y lo llena una sola vez a partir
+    del tag "[prestamo_id:N]" que llevan los pagos en la descripción.
+    """
+    _agregar_columna(db, "movimientos", "prestamo_id", "INTEGER REFERENCES prestamos(id)")
+    _crear_indices(Movimiento, "ix_movimientos_prestamo_tipo_fecha")
+
+    pendientes = db.execute(
+        select(Movimiento.id, Movimiento.descripcion)
+        .where(Movimiento.prestamo_id == None, Movimiento.descripcion.like("%[prestamo_id:%"))
+    ).all()
+    existentes = set(db.execute(select(Prestamo.id)).scalars())
+
+    cambios = []
+    for mov_id, descripcion in pendientes:
+        m = re.search(r"\[prestamo_id:(\d+)\]", descripcion or "")
+        if m and int(m.group(1)) in existentes:
+            cambios.append({"id": mov_id, "prestamo_id": int(m.group(1))})
+
+    for i in range(0, len(cambios), LOTE):
+        db.execute(update(Movimiento), cambios[i:i + LOTE])
+    db.commit()
+    print(f"Préstamos: {len(cambios)} pagos enlazados ({len(pendientes) - len(cambios)} con préstamo inexistente).")
+
+
+def crear_indice_interes_unico(db):
+    """
+    Crea el índice único parcial que impide dos "Interés Mensual" del mismo socio y mes.
+    Si ya hay duplicados no se crea: se listan para corregirlos a mano.
+    """
+    duplicados = db.execute(
+        select(Movimiento.usuario_id, Movimiento.periodo_anio, Movimiento.periodo_mes, func.count())
+        .where(Movimiento.tipo == "Interés Mensual", Movimiento.periodo_anio != None)
+        .group_by(Movimiento.usuario_id, Movimiento.periodo_anio, Movimiento.periodo_mes)
+        .having(func.count() > 1)
+    ).all()
+
+    if duplicados:
+        print("No se creó uq_movimientos_interes_periodo; hay intereses duplicados (usuario, año, mes, cantidad):")
+        for fila in duplicados:
+            print("   ", tuple(fila))
+        return
+
+    _crear_indices(Movimiento, "uq_movimientos_interes_periodo")
+    print("Índice uq_movimientos_interes_periodo listo.")
+
+
+def crear_indices_paginacion(db):
+    """Índices compuestos de la paginación por cursor (movimientos, usuarios, resultados)."""
+    _crear_indices(Movimiento, "ix_movimientos_usuario_fecha_id")
+    _crear_indices(Usuario, "ix_usuarios_nombre_id")
+    _crear_indices(ResultadoLoteria, "ix_resultados_slug_date_id")
+    print("Índices de paginación listos.")
+
+
+PASOS = [
+    migrar_periodos,
+    migrar_prestamo_id,
+    crear_indice_interes_unico,
+    crear_indices_paginacion,
+]
+
+
+if __name__ == "__main__":
+    Base.metadata.create_all(bind=engine)
+
+    db = SessionLocal()
+    try:
+        for paso in PASOS:
+            print(f"== {paso.__name__}")
+            paso(db)
+        print("Migraciones aplicadas correctamente.")
+    except Exception:
+        # Se relanza para salir con código != 0: un deploy no debe seguir con la base a medio migrar
+        db.rollback()
+        print("[ERROR] Migraciones interrumpidas; ver el traceback.")
+        raise
+    finally:
+        db.close()
@@ -0,0 +1,71 @@
+"""
+Servidor de prueba que imita la API de loterías, para probar el cliente
+(app/services/loteria_client.py) sin depender del proveedor real:
+
+    python stub_api_loteria.py --puerto 8765 --fallas 2 --demora 0.5
+    LOTERIA_API_URL=http://127.0.0.1:8765/api/results python test_sync.py
+
+--fallas N   las primeras N peticiones responden 503 (para ver reintentos / breaker)
+--demora S   cada respuesta tarda S segundos (para ver timeouts)
+--caido      todas las peticiones responden 503
+"""
+import argparse
+import json
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+_lock = threading.Lock()
+_peticiones = 0
+
+
+def crear_handler(args):
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            global _peticiones
+            with _lock:
+                _peticiones += 1
+                n = _peticiones
+
+            time.sleep(args.demora)
+
+            if args.caido or n <= args.fallas:
+                self.send_response(503)
+                self.end_headers()
+                return
+
+            fecha = self.path.rstrip("/").rsplit("/", 1)[-1]
+            cuerpo = json.dumps({"data": [
+                {"lottery": "MEDELLIN", "slug": "medellin", "date": fecha,
+                 "result": f"{random.randint(0, 9999):04d}", "series": str(random.randint(1, 200))},
+                {"lottery": "BOGOTA", "slug": "bogota", "date": fecha,
+                 "result": f"{random.randint(0, 9999):04d}", "series": str(random.randint(1, 200))},
+            ]}).encode("utf-8")
+
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(cuerpo)))
+            self.end_headers()
+            self.wfile.write(cuerpo)
+
+        def log_message(self, formato, *valores):
+            print(f"[stub] {self.address_string()} {formato % valores}")
+
+    return Handler
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Stub local de la API de loterías")
+    parser.add_argument("--puerto", type=int, default=8765)
+    parser.add_argument("--fallas", type=int, default=0)
+    parser.add_argument("--demora", type=float, default=0.0)
+    parser.add_argument("--caido", action="store_true")
+    args = parser.parse_args()
+
+    servidor = ThreadingHTTPServer(("127.0.0.1", args.puerto), crear_handler(args))
+    print(f"Stub de loterías en http://127.0.0.1:{args.puerto}/api/results/AAAA-MM-DD")
+    try:
+        servidor.serve_forever()
+    except KeyboardInterrupt:
+        pass
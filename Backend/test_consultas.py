@@ -0,0 +1,128 @@
+"""
+Presupuesto de consultas SQL por endpoint: falla si alguno hace más consultas de las
+permitidas (típicamente un N+1 nuevo: consultas dentro de un for por socio/préstamo).
+Corre la app en este mismo proceso contra una base SQLite temporal, nunca contra la
+de .env:
+
+    python test_consultas.py           # sale con código 1 si algún endpoint se pasa
+    python test_consultas.py --medir   # solo muestra cuántas consultas hace cada uno
+
+Los datos de prueba tienen SOCIOS socios: un presupuesto fijo que se cumple con 10
+socios sigue cumpliéndose con 1000.
+"""
+import os
+import sys
+import argparse
+import tempfile
+from datetime import datetime, timedelta
+
+_tmp = tempfile.mkdtemp(prefix="natillera-consultas-")
+os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(_tmp, 'consultas.db')}"
+os.environ["WEB_SCHEDULER"] = "0"
+os.environ["POLLA_SYNC_EN_WEB"] = "0"   # sin llamadas a la API de loterías
+os.environ.setdefault("ARGON2_TIME_COST", "1")
+
+from fastapi.testclient import TestClient
+
+from app.main import app
+from app.database import SessionLocal
+from app.models.models import ResultadoLoteria
+from app.routers.Finanzas import calcular_interes_mes
+from app.services.registro_sql import limite_consultas, LimiteConsultasExcedido
+
+SOCIOS = 10
+MESES = ["Enero", "Febrero", "Marzo"]
+
+# (método, ruta, máximo de consultas)
+PRESUPUESTOS = [
+    ("GET", "/api/dashboard/{uid}", 3),
+    ("GET", "/api/movimientos/{uid}", 3),
+    ("GET", "/api/usuarios", 2),
+    ("GET", "/api/ahorros/{uid}", 3),
+    ("GET", "/api/prestamos/{uid}", 4),
+    ("GET", "/api/admin/matriz_pagos?anio=2026", 5),
+    ("GET", "/api/polla/estado/{uid}", 2),
+    ("GET", "/api/polla/historial", 1),
+    ("POST", "/api/ahorros/{uid}/registrar_aporte", 10),
+    ("POST", "/api/login", 4),
+]
+
+
+def sembrar(c: TestClient) -> list:
+    ids = []
+    for i in range(SOCIOS):
+        r = c.post("/api/crear_usuario", json={
+            "usuario": f"socio{i}", "nombre": f"Socio {i:02d}", "telefono": f"300{i:07d}",
+            "polla": i, "password": "clave", "rol": "socio", "ahorro_mensual": 50000,
+        })
+        r.raise_for_status()
+        uid = r.json()["usuario"]["id"]
+        ids.append(uid)
+        for mes in MESES:
+            c.post(f"/api/ahorros/{uid}/registrar_aporte", json={"mes": mes, "anio": 2026}).raise_for_status()
+            c.post(f"/api/ahorros/{uid}/registrar_polla", json={"mes": mes, "anio": 2026}).raise_for_status()
+        r = c.post("/api/crear_prestamo", json={
+            "usuario_id": uid, "monto": 100000, "fecha_vencimiento": (datetime.now() + timedelta(days=180)).isoformat(),
+            "intereses": 12000, "total": 112000, "estado": "pendiente", "plazo": 6,
+        })
+        r.raise_for_status()
+
+    db = SessionLocal()
+    try:
+        for mes in range(1, 4):
+            db.add(ResultadoLoteria(slug="medellin", lottery="MEDELLIN", date=datetime(2026, mes, 27), result=f"{mes:04d}"))
+        db.commit()
+    finally:
+        db.close()
+    return ids
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Presupuesto de consultas SQL por endpoint")
+    parser.add_argument("--medir", action="store_true", help="Solo mostrar cuántas consultas hace cada endpoint")
+    args = parser.parse_args()
+
+    c = TestClient(app)
+    ids = sembrar(c)
+    uid = ids[SOCIOS // 2]
+    fallas = []
+
+    def revisar(nombre: str, maximo: int, fn):
+        try:
+            with limite_consultas(10 ** 9 if args.medir else maximo, nombre) as grabacion:
+                fn()
+        except LimiteConsultasExcedido as e:
+            fallas.append(str(e))
+            print(f"FALLA {nombre}")
+            return
+        sospechas = grabacion.sospechosas_n1()
+        print(f"{'ok   ' if not args.medir else ''}{nombre}: {grabacion.total} consultas (máx {maximo})"
+              + (f"  N+1? {sospechas[0][0]}x {sospechas[0][1][:80]}" if sospechas else ""))
+
+    for metodo, ruta, maximo in PRESUPUESTOS:
+        ruta = ruta.format(uid=uid)
+        if metodo == "GET":
+            peticion = lambda: c.get(ruta).raise_for_status()
+        elif ruta == "/api/login":
+            peticion = lambda: c.post(ruta, json={"usuario": f"socio{SOCIOS // 2}", "password": "clave"}).raise_for_status()
+        else:
+            peticion = lambda: c.post(ruta, json={"mes": "Abril", "anio": 2026}).raise_for_status()
+        revisar(f"{metodo} {ruta}", maximo, peticion)
+
+    def interes():
+        db = SessionLocal()
+        try:
+            calcular_interes_mes(db, 2026, 3)
+            db.commit()
+        finally:
+            db.close()
+    revisar("calcular_interes_mes", 4, interes)
+
+    if fallas:
+        print("\n" + "\n\n".join(fallas))
+        sys.exit(1)
+    print("\nTodos los endpoints dentro del presupuesto de consultas.")
+
+
+if __name__ == "__main__":
+    main()
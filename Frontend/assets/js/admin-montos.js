@@ -1,5 +1,4 @@
-const isLocal = window.location.hostname === "localhost" || window.location.hostname === "127.0.0.1";
-const API = window.API_BASE || localStorage.getItem("API_BASE") || (isLocal ? "http://127.0.0.1:8000" : "https://natillera.onrender.com");
+const API = window.API_BASE;   // lo define config.js
 
 // Anti-recarga por submits accidentales
 window.addEventListener("submit", (e) => e.preventDefault(), true);
@@ -263,7 +262,7 @@ let listaUsuariosGlobal = [];
 
 async function cargarUsuarios() {
     const select = document.getElementById("selectUsuario");
-    listaUsuariosGlobal = await apiFetch("/api/usuarios");
+    listaUsuariosGlobal = await apiFetchTodos("/api/usuarios");
 
     if (window.choicesInstances?.usuario) {
         try { window.choicesInstances.usuario.destroy(); } catch(e){}
@@ -562,10 +561,11 @@ async function cargarMatrizPagos() {
 }
 
 async function cargarUsuario(usuarioId) {
-    const [ahorro, movs] = await Promise.all([
+    const [ahorro, paginaMovs] = await Promise.all([
         apiFetch(`/api/ahorros/${usuarioId}`),
         apiFetch(`/api/movimientos/${usuarioId}?limit=200`)
     ]);
+    const movs = paginaMovs.items;
 
     // Actualizar campo de observaciones
     const userFound = listaUsuariosGlobal.find(u => u.id === usuarioId);
@@ -1,5 +1,4 @@
-const isLocal = window.location.hostname === "localhost" || window.location.hostname === "127.0.0.1";
-const API = window.API_BASE || localStorage.getItem("API_BASE") || (isLocal ? "http://127.0.0.1:8000" : "https://natillera.onrender.com");
+const API = window.API_BASE;   // lo define config.js
 
 function authHeaders() {
     const token = localStorage.getItem("access_token");
@@ -109,7 +108,7 @@ function clasePrestamo(estado) {
 
 async function cargarUsuarios() {
     const select = document.getElementById("selectUsuario");
-    const usuarios = await apiFetch("/api/usuarios");
+    const usuarios = await apiFetchTodos("/api/usuarios");
 
     select.innerHTML = "";
     usuarios.forEach(u => {
@@ -1,2 +1,20 @@
-const isLocal = window.location.hostname === "localhost" || window.location.hostname === "127.0.0.1";
-window.API_BASE = window.API_BASE || localStorage.getItem("API_BASE") || (isLocal ? "http://127.0.0.1:8000" : "https://natillera.onrender.com");
+// Se carga antes del script de cada página: no declarar aquí const/let globales (chocan con los de la página)
+window.API_BASE = window.API_BASE || localStorage.getItem("API_BASE") || ((window.location.hostname === "localhost" || window.location.hostname === "127.0.0.1") ? "http://127.0.0.1:8000" : "https://natillera.onrender.com");
+
+// Las listas del API vienen por páginas ({ items, next_cursor, has_more }): trae todas
+async function apiFetchTodos(path) {
+    const token = localStorage.getItem("access_token");
+    const headers = token ? { Authorization: `Bearer ${token}` } : {};
+    const sep = path.includes("?") ? "&" : "?";
+    let items = [];
+    let cursor = null;
+    do {
+        const res = await fetch(`${window.API_BASE}${path}${sep}limit=500${cursor ? `&cursor=${encodeURIComponent(cursor)}` : ""}`, { headers });
+        let pagina = null;
+        try { pagina = await res.json(); } catch { }
+        if (!res.ok) throw new Error(pagina?.detail || pagina?.mensaje || `Error HTTP ${res.status}`);
+        items = items.concat(pagina.items);
+        cursor = pagina.has_more ? pagina.next_cursor : null;
+    } while (cursor);
+    return items;
+}
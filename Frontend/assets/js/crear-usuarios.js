@@ -1,5 +1,4 @@
-const isLocal = window.location.hostname === "localhost" || window.location.hostname === "127.0.0.1";
-const API = window.API_BASE || localStorage.getItem("API_BASE") || (isLocal ? "http://127.0.0.1:8000" : "https://natillera.onrender.com");
+const API = window.API_BASE;   // lo define config.js
 
 /* ------------------ Modal ------------------ */
 function setupModal() {
@@ -98,10 +97,7 @@ async function cargarTablaUsuarios() {
     if (!body) return;
 
     try {
-        const token = localStorage.getItem("access_token");
-        const headers = token ? { "Authorization": `Bearer ${token}` } : {};
-        const res = await fetch(`${API}/api/usuarios`, { headers });
-        const usuarios = await res.json();
+        const usuarios = await apiFetchTodos("/api/usuarios");
 
         if (!Array.isArray(usuarios) || usuarios.length === 0) {
             body.innerHTML = `<tr><td colspan="6" style="padding: 15px; text-align: center; color: var(--text-muted);">No hay socios registrados.</td></tr>`;
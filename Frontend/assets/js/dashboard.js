@@ -30,9 +30,44 @@ function mostrarNombreUsuario(nombre) {
     if (titulo) titulo.textContent = `¡Hola ${nombre}! Esta es tu información de la natillera`;
 }
 
+// Cambia el refresh token por un access token nuevo (y un refresh token nuevo: rotación)
+async function renovarToken() {
+    const refreshToken = localStorage.getItem("refresh_token");
+    if (!refreshToken) return false;
+
+    const res = await fetch(`${API}/api/token/refresh`, {
+        method: "POST",
+        headers: { "Content-Type": "application/json" },
+        body: JSON.stringify({ refresh_token: refreshToken }),
+    });
+
+    if (!res.ok) {
+        // Refresh token vencido o revocado: toca volver a iniciar sesión
+        if (res.status === 401) cerrarSesion();
+        return false;
+    }
+
+    const data = await res.json();
+    localStorage.setItem("access_token", data.access_token);
+    localStorage.setItem("refresh_token", data.refresh_token);
+    return true;
+}
+
 function cerrarSesion() {
+    const refreshToken = localStorage.getItem("refresh_token");
+    if (refreshToken) {
+        // Revoca la sesión en el back; keepalive para que salga aunque cambie la página
+        fetch(`${API}/api/logout`, {
+            method: "POST",
+            headers: { "Content-Type": "application/json" },
+            body: JSON.stringify({ refresh_token: refreshToken }),
+            keepalive: true,
+        }).catch(() => {});
+    }
+
     localStorage.removeItem("sesionActiva");
     localStorage.removeItem("access_token");
+    localStorage.removeItem("refresh_token");
     localStorage.removeItem("rolUsuario");
     localStorage.removeItem("usuario");
     window.location.href = "../index.html";
@@ -452,7 +487,7 @@ async function init() {
         }
 
         if (movRes.status === "fulfilled" && movRes.value.ok) {
-            const movData = await movRes.value.json();
+            const movData = (await movRes.value.json()).items;
             const totalAhorradoSocio = data.status === "fulfilled" ? (data.value.total_ahorrado || 0) : 0;
             renderDashboardCharts(movData, totalAhorradoSocio);
         }
@@ -466,6 +501,9 @@ async function init() {
 
     const btnCerrarSesion = document.getElementById("btnCerrarSesion");
     if (btnCerrarSesion) btnCerrarSesion.addEventListener("click", cerrarSesion);
+
+    // El access token dura 60 minutos: se renueva antes de que venza mientras el dashboard esté abierto
+    setInterval(() => renovarToken().catch(console.error), 50 * 60 * 1000);
 }
 
 init();
@@ -23,6 +23,8 @@ async function hacerLogin(usuario, password) {
 
     // ✅ NUEVO: token + sesión “vieja” (para que el dashboard no rebote)
     localStorage.setItem("access_token", data.access_token);
+    // Con el refresh token se renueva el access token sin volver a pedir la contraseña
+    localStorage.setItem("refresh_token", data.refresh_token);
 
     localStorage.setItem("sesionActiva", "true"); // tu dashboard espera esto
     localStorage.setItem("usuarioActivo", data.usuario.usuario); // o el username
@@ -1,4 +1,4 @@
-const API = window.API_BASE || localStorage.getItem("API_BASE") || ((window.location.hostname === "localhost" || window.location.hostname === "127.0.0.1") ? "http://127.0.0.1:8000" : "https://natillera.onrender.com");
+const API = window.API_BASE;   // lo define config.js
 
 async function apiFetch(path, options = {}) {
     const token = localStorage.getItem("access_token");
@@ -37,6 +37,25 @@ function renderSocios(usuarios) {
     `}).join("");
 }
 
+// Historial por páginas: "Ver más" pide la siguiente con el cursor de la anterior
+let historialPolla = [];
+let historialCursor = null;
+let sociosPolla = [];
+
+async function cargarMasHistorial() {
+    const btn = document.getElementById("btnMasHistorial");
+    if (btn) btn.disabled = true;
+    try {
+        const pagina = await apiFetch(`/api/polla/historial?cursor=${encodeURIComponent(historialCursor)}`);
+        historialPolla = historialPolla.concat(pagina.items);
+        historialCursor = pagina.has_more ? pagina.next_cursor : null;
+        renderHistorial(historialPolla, sociosPolla);
+    } catch (err) {
+        console.error(err);
+        if (btn) btn.disabled = false;
+    }
+}
+
 function renderHistorial(historial, usuarios) {
     const contenedor = document.getElementById("historialPolla");
     if (!historial || historial.length === 0) {
@@ -72,18 +91,23 @@ function renderHistorial(historial, usuarios) {
                 ${ganadorBadge}
             </div>
         </div>
-    `}).join("");
+    `}).join("") + (historialCursor
+        ? `<button id="btnMasHistorial" class="btn-secundario" onclick="cargarMasHistorial()" style="margin-top: 12px; width: 100%;">Ver más</button>`
+        : "");
 }
 
 async function cargarDatos() {
     try {
         const [usuarios, historial] = await Promise.all([
-            apiFetch("/api/usuarios"),
+            apiFetchTodos("/api/usuarios"),
             apiFetch("/api/polla/historial")
         ]);
-        
+
+        sociosPolla = usuarios;
+        historialPolla = historial.items;
+        historialCursor = historial.has_more ? historial.next_cursor : null;
         renderSocios(usuarios);
-        renderHistorial(historial, usuarios);
+        renderHistorial(historialPolla, usuarios);
     } catch (err) {
         console.error(err);
         const contS = document.getElementById("listaSocios");
@@ -230,12 +230,23 @@ async function cargarDatosPrestamosDesdeDB() {
 }
 
 function cerrarSesion() {
+    const refreshToken = localStorage.getItem("refresh_token");
+    if (refreshToken) {
+        fetch(`${API}/api/logout`, {
+            method: "POST",
+            headers: { "Content-Type": "application/json" },
+            body: JSON.stringify({ refresh_token: refreshToken }),
+            keepalive: true,
+        }).catch(() => {});
+    }
+
     localStorage.removeItem("sesionActiva");
     localStorage.removeItem("usuarioActivo");
     localStorage.removeItem("nombreUsuario");
     localStorage.removeItem("rolUsuario");
     localStorage.removeItem("usuario");
     localStorage.removeItem("access_token");
+    localStorage.removeItem("refresh_token");
     window.location.href = "../index.html";
 }
 
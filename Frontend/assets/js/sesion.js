@@ -1,7 +1,19 @@
 function cerrarSesion() {
+    // API lo define el script de cada página (admin-montos.js, admin-prestamos.js, prestamos.js)
+    const refreshToken = localStorage.getItem("refresh_token");
+    if (refreshToken) {
+        fetch(`${API}/api/logout`, {
+            method: "POST",
+            headers: { "Content-Type": "application/json" },
+            body: JSON.stringify({ refresh_token: refreshToken }),
+            keepalive: true,
+        }).catch(() => {});
+    }
+
     localStorage.removeItem("sesionActiva");
     localStorage.removeItem("usuario");
     localStorage.removeItem("access_token");
+    localStorage.removeItem("refresh_token");
     window.location.href = "../index.html";
 }
 